@@ -0,0 +1,181 @@
+"""
+Compact storage codec for analysis documents.
+
+Layout: one format-version byte, then zlib-compressed compact JSON. The
+compressor is primed with a preset dictionary of the keys and values every
+analysis repeats, so even small documents compress well. Card image URLs
+that follow the pokemontcg.io pattern are dropped at write time and
+rebuilt from set ID and card number on read, as are other fields that
+are copies of stored ones.
+
+The dictionary is part of the format: changing it means a new version
+byte, with the old dictionary kept for decoding. To regenerate it after
+the analysis schema changes, save a few current /analyze responses, copy
+the compact JSON of strip_derivable() for one of them, keep the key
+names, fixed strings and structure but drop the per-run numbers, order
+the pieces so the most repeated come last, and add it under the next
+version. `python analysis_codec.py response.json ...` prints the encoded
+size under every version, so the new dictionary can be checked against
+the old one before FORMAT_VERSION moves.
+"""
+
+import json
+import sys
+import zlib
+
+FORMAT_VERSION = 2
+
+IMAGE_BASE = 'https://images.pokemontcg.io'
+HIRES_MARKER = '~hires'
+
+# Most frequent strings last - zlib reaches the end of the dictionary cheapest
+_DICTIONARIES = {
+    1: ''.join([
+        '"api_sources":["pokemontcg.io for card data","TCGPlayer market prices from Pokemon TCG SDK"]',
+        '"assumptions":{"product_type":"Booster Box","packs_per_box":36,"guaranteed_extras_value":',
+        '"pull_rates":"Community averages (see documentation)","min_card_value":0.4,',
+        '"hold_period":"6 months","appreciation_estimate":"15% for sealed (no price history)"',
+        '"simulation":{"boxes_simulated":100000,"seed":"packs_per_box":"mean":"std":',
+        '"box_distribution":{"method":"exact","snapshot":"percentiles":{"p5":"p25":"p50":"p75":"p95":',
+        '"prob_loss":"chase_cards":[{"hit_probability":',
+        '"confidence":{"score":"ev_interval_90":{"low":"median":"high":"ev_std":',
+        '"relative_spread":"bootstrap_samples":2000,"prob_open_beats_sealed":',
+        '"set_products":{"Booster Box":"Elite Trainer Box":"Pokemon Center Elite Trainer Box":',
+        '"Booster Bundle":"Build & Battle Box":"Ultra-Premium Collection":"Three-Pack Blister":',
+        '"Sleeved Booster":"Booster Pack":{"product_type":"packs":"packs_ev":"fixed_value":',
+        '"recommendation":"OPEN - Expected value significantly exceeds sealed price"',
+        '"HOLD SEALED","RESELL SEALED NOW","HOLD SEALED (marginal)"',
+        '"roi":{"open":{"amount":"percent":},"hold_6mo":{"amount":"percent":},"resell_now":{"amount":0,"percent":0}}',
+        '"pricing":{"sealed_box_cost":"expected_value_open":"projected_6mo_sealed":',
+        '"product_name":"set_name":"set_id":"sv","timestamp":"2025-',
+        '"ev_breakdown":{"rarity_breakdown":{"count":"total_value":',
+        '"total_cards_analyzed":"valuable_cards_count":"packs":36,"api_source":"pokemontcg.io"',
+        '"Common""Uncommon""Rare""Double Rare""Ultra Rare""Hyper Rare""ACE SPEC Rare"',
+        '"Illustration Rare""Special Illustration Rare""confidence_score":',
+        '"top_cards":[{"name":" ex","rarity":"Special Illustration Rare","price":',
+        '"pull_rate":0.055,"ev_contribution":"set_number":"',
+        '"rarity":"Illustration Rare","price":"pull_rate":0.055,"ev_contribution":"set_number":"',
+        '"rarity":"Double Rare","price":"pull_rate":0.166,"ev_contribution":"set_number":"',
+    ]).encode('utf-8'),
+    # Rebuilt from analyze_product output after the slot-model pull rates
+    2: ''.join([
+        '"api_sources":["pokemontcg.io for card data","TCGPlayer market prices from Pokemon TCG SDK"]',
+        '"assumptions":{"product_type":"Booster Box","packs_per_box":36,"guaranteed_extras_value":0.0,',
+        '"pull_rates":"Community averages (see documentation)","min_card_value":0.4,',
+        '"hold_period":"6 months","appreciation_estimate":"15% for sealed (no price history)"}',
+        '"HOLD SEALED","RESELL SEALED NOW","HOLD SEALED (marginal)"',
+        '"recommendation":"OPEN - Expected value significantly exceeds sealed price","confidence_score":',
+        '"confidence":{"score":,"ev_interval_90":{"low":,"median":,"high":},"ev_std":',
+        ',"relative_spread":,"bootstrap_samples":2000,"prob_open_beats_sealed":',
+        '"set_products":{"Booster Box":{"product_type":"Booster Box","packs":36,"packs_ev":',
+        '"Elite Trainer Box":{"product_type":"Elite Trainer Box","packs":9,"packs_ev":',
+        '"Pokemon Center Elite Trainer Box":{"product_type":"Pokemon Center Elite Trainer Box","packs":11,"packs_ev":',
+        '"Booster Bundle":{"product_type":"Booster Bundle","packs":6,"packs_ev":',
+        '"Build & Battle Box":{"product_type":"Build & Battle Box","packs":4,"packs_ev":',
+        '"Ultra-Premium Collection":{"product_type":"Ultra-Premium Collection","packs":16,"packs_ev":',
+        '"Three-Pack Blister":{"product_type":"Three-Pack Blister","packs":3,"packs_ev":',
+        '"Sleeved Booster":{"product_type":"Sleeved Booster","packs":1,"packs_ev":',
+        '"Booster Pack":{"product_type":"Booster Pack","packs":1,"packs_ev":',
+        '"rarity_breakdown":{"Common":{"count":,"total_value":},"Uncommon":{"count":',
+        '"Rare":{"count":,"total_value":},"Double Rare":{"count":,"ACE SPEC Rare":{"count":',
+        '"Illustration Rare":{"count":,"total_value":},"Ultra Rare":{"count":,"total_value":',
+        '"Special Illustration Rare":{"count":,"total_value":},"Hyper Rare":{"count":,"total_value":',
+        '"total_cards_analyzed":,"valuable_cards_count":,"packs":36,"api_source":"pokemontcg.io",',
+        '"product":{"product_type":"Booster Box","packs":36,"packs_ev":,"fixed_value":0.0,"ev_total":',
+        '"simulation":{"boxes_simulated":,"seed":null,"packs_per_box":36,"mean":,"std":',
+        '"box_distribution":{"method":"exact","bucket_cents":,"mean":,"std":',
+        '"percentiles":{"p5":,"p25":,"p50":,"p75":,"p95":},"prob_loss":',
+        '"chase_cards":[{"name":"Card","rarity":"Special Illustration Rare","price":,"hit_probability":0.',
+        ',"packs_per_box":36,"snapshot":"',
+        '"roi":{"open":{"amount":,"percent":},"hold_6mo":{"amount":,"percent":},',
+        '"resell_now":{"amount":0,"percent":0}},"recommendation":"',
+        '{"product_name":"Booster Box","set_name":"Scarlet & Violet","set_id":"sv","timestamp":"20',
+        '"pricing":{"sealed_box_cost":,"expected_value_open":,"projected_6mo_sealed":',
+        '"ev_breakdown":{"ev_total":,"top_cards":[{"name":"',
+        ' ex","rarity":"Double Rare","price":,"pull_rate":0.0,"ev_contribution":,"set_number":"',
+        '"},{"name":"","rarity":"Ultra Rare","price":,"pull_rate":0.0,"ev_contribution":,"set_number":"',
+        '"},{"name":"","rarity":"Hyper Rare","price":,"pull_rate":0.00,"ev_contribution":,"set_number":"',
+        '"},{"name":"","rarity":"Illustration Rare","price":,"pull_rate":0.00,"ev_contribution":,"set_number":"',
+        '"},{"name":"","rarity":"Special Illustration Rare","price":,"pull_rate":0.00,"ev_contribution":,"set_number":"',
+    ]).encode('utf-8'),
+}
+
+
+def card_image_url(set_id, number, hires=False):
+    """pokemontcg.io image URL of a card"""
+    return f"{IMAGE_BASE}/{set_id}/{number}{'_hires' if hires else ''}.png"
+
+
+def _card_lists(analysis):
+    """Every card entry list in an analysis"""
+    ev = analysis.get('ev_breakdown') or {}
+    lists = [ev.get('top_cards') or []]
+    if ev.get('cards_over_price'):
+        lists.append(ev['cards_over_price'].get('cards') or [])
+    return lists
+
+
+def strip_derivable(analysis):
+    """Copy of an analysis without fields rebuilt on decode"""
+    doc = json.loads(json.dumps(analysis, default=str))
+    set_id = doc.get('set_id')
+
+    for cards in _card_lists(doc):
+        for card in cards:
+            number = card.get('set_number')
+            if card.get('image') == card_image_url(set_id, number):
+                del card['image']
+            elif card.get('image') == card_image_url(set_id, number, hires=True):
+                card['image'] = HIRES_MARKER
+
+    pricing = doc.get('pricing') or {}
+    if pricing.get('market_value_sealed') == pricing.get('sealed_box_cost'):
+        pricing.pop('market_value_sealed', None)
+    return doc
+
+
+def restore_derivable(doc):
+    """Rebuild the fields strip_derivable removed"""
+    set_id = doc.get('set_id')
+
+    for cards in _card_lists(doc):
+        for card in cards:
+            if 'image' not in card:
+                card['image'] = card_image_url(set_id, card.get('set_number'))
+            elif card['image'] == HIRES_MARKER:
+                card['image'] = card_image_url(set_id, card.get('set_number'), hires=True)
+
+    pricing = doc.get('pricing')
+    if pricing is not None and 'market_value_sealed' not in pricing:
+        pricing['market_value_sealed'] = pricing.get('sealed_box_cost')
+    return doc
+
+
+def encode_analysis(analysis):
+    """Analysis dict -> compact versioned bytes"""
+    payload = json.dumps(strip_derivable(analysis), separators=(',', ':')).encode('utf-8')
+    compressor = zlib.compressobj(level=9, zdict=_DICTIONARIES[FORMAT_VERSION])
+    return bytes([FORMAT_VERSION]) + compressor.compress(payload) + compressor.flush()
+
+
+def decode_analysis(blob):
+    """Bytes from encode_analysis (any known version) -> analysis dict"""
+    blob = bytes(blob.value) if hasattr(blob, 'value') else bytes(blob)
+    version = blob[0]
+    if version not in _DICTIONARIES:
+        raise ValueError(f"Unknown analysis format version {version}")
+    decompressor = zlib.decompressobj(zdict=_DICTIONARIES[version])
+    payload = decompressor.decompress(blob[1:]) + decompressor.flush()
+    return restore_derivable(json.loads(payload))
+
+
+if __name__ == "__main__":
+    # Encoded size of saved analyses under each dictionary version
+    for path in sys.argv[1:]:
+        with open(path) as f:
+            payload = json.dumps(strip_derivable(json.load(f)), separators=(',', ':')).encode('utf-8')
+        sizes = []
+        for version, dictionary in sorted(_DICTIONARIES.items()):
+            compressor = zlib.compressobj(level=9, zdict=dictionary)
+            sizes.append(f"v{version}={1 + len(compressor.compress(payload) + compressor.flush())}")
+        print(f"{path}: json={len(payload)} {' '.join(sizes)}")
@@ -0,0 +1,157 @@
+"""
+Batch reads of stored analyses.
+
+Analysis rows (pk='ANALYSIS#<set_id>', sk='TIMESTAMP#<iso time>') carry
+summary attributes next to the encoded analysis blob. Reads here project
+only the summary attributes unless the full documents are asked for, so
+loading dozens of analyses for a comparison view moves a few hundred
+bytes per row instead of the whole blob.
+
+Latest-N and time-window reads are one Query per set on the
+timestamp-index GSI (run in parallel); exact rows are fetched with
+BatchGetItem, 100 keys per request, retrying unprocessed keys. The
+newest summary of many sets comes from their LATEST pointers (kept by
+the stream processor) in one BatchGetItem.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from analysis_codec import decode_analysis
+
+ANALYSIS_PK_PREFIX = 'ANALYSIS#'
+LATEST_PK = 'LATEST'
+
+SUMMARY_ATTRIBUTES = ('pk', 'sk', 'analysis_id', 'timestamp', 'product_name', 'set_name',
+                      'recommendation', 'ev_open', 'sealed_price', 'confidence')
+DATA_ATTRIBUTES = ('blob', 'data')
+
+BATCH_GET_SIZE = 100  # BatchGetItem limit
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.05
+MAX_QUERY_WORKERS = 8
+
+
+def _projection(include_data):
+    attributes = SUMMARY_ATTRIBUTES + (DATA_ATTRIBUTES if include_data else ())
+    names = {f'#a{i}': name for i, name in enumerate(attributes)}
+    return ', '.join(names), names
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def summary_from_item(item, include_data=False):
+    """Response entry for a stored row - summary fields, plus the analysis if asked"""
+    summary = {
+        name: _plain(item[name]) for name in SUMMARY_ATTRIBUTES
+        if name in item and name != 'pk'
+    }
+    summary['set_id'] = item['pk'][len(ANALYSIS_PK_PREFIX):]
+    if include_data:
+        # Rows written before the binary codec keep the analysis as JSON in 'data'
+        if 'blob' in item:
+            summary['analysis'] = decode_analysis(item['blob'])
+        elif 'data' in item:
+            summary['analysis'] = json.loads(item['data'])
+    return summary
+
+
+def query_analyses(table, set_id, since=None, until=None, limit=1, include_data=False):
+    """Newest analyses of a set, optionally within [since, until] (epoch seconds)"""
+    projection, names = _projection(include_data)
+    condition = 'pk = :pk'
+    values = {':pk': f"{ANALYSIS_PK_PREFIX}{set_id}"}
+    if since is not None or until is not None:
+        names['#ts'] = 'timestamp'
+        condition += ' AND #ts BETWEEN :since AND :until'
+        values[':since'] = int(since or 0)
+        values[':until'] = int(until if until is not None else time.time())
+
+    kwargs = {
+        'IndexName': 'timestamp-index',
+        'KeyConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ProjectionExpression': projection,
+        'ScanIndexForward': False,  # Most recent first
+        'Limit': limit
+    }
+    items = []
+    while len(items) < limit:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        kwargs['Limit'] = limit - len(items)
+    return [summary_from_item(item, include_data) for item in items[:limit]]
+
+
+def query_many(table, requests, include_data=False):
+    """
+    Run query_analyses for many sets in parallel. Each request is a dict of
+    query_analyses arguments; results come back in request order.
+    """
+    if not requests:
+        return []
+
+    def run(request):
+        return query_analyses(table, include_data=include_data, **request)
+
+    workers = max(1, min(MAX_QUERY_WORKERS, len(requests)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, requests))
+
+
+def _batch_get(table, keys, projection, names):
+    """{(pk, sk): item} for keys, via BatchGetItem"""
+    found = {}
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {table.name: {
+            'Keys': keys[start:start + BATCH_GET_SIZE],
+            'ProjectionExpression': projection,
+            'ExpressionAttributeNames': names
+        }}
+        for attempt in range(MAX_RETRIES + 1):
+            response = table.meta.client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table.name, []):
+                found[(item['pk'], item['sk'])] = item
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                break
+            time.sleep(BACKOFF_BASE * (2 ** attempt))
+        else:
+            print(f"Batch get gave up on {len(request[table.name]['Keys'])} keys")
+    return found
+
+
+def batch_get_analyses(table, keys, include_data=False):
+    """Rows for exact (set_id, sk) keys with BatchGetItem, in key order (None if missing)"""
+    projection, names = _projection(include_data)
+    wanted = [{'pk': f"{ANALYSIS_PK_PREFIX}{set_id}", 'sk': sk} for set_id, sk in keys]
+    found = _batch_get(table, wanted, projection, names)
+    return [
+        summary_from_item(found[(key['pk'], key['sk'])], include_data)
+        if (key['pk'], key['sk']) in found else None
+        for key in wanted
+    ]
+
+
+def latest_analyses(table, set_ids):
+    """Newest analysis summary per set from the LATEST pointers ({set_id: summary})"""
+    projection, names = _projection(False)
+    names[f'#a{len(names)}'] = 'analysis_pk'
+    names[f'#a{len(names)}'] = 'analysis_sk'
+    projection = ', '.join(names)
+    found = _batch_get(table, [{'pk': LATEST_PK, 'sk': f"SET#{set_id}"} for set_id in set_ids],
+                       projection, names)
+    return {
+        item['sk'][len('SET#'):]: summary_from_item(dict(item, pk=item['analysis_pk'], sk=item['analysis_sk']))
+        for item in found.values()
+    }
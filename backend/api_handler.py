@@ -0,0 +1,17 @@
+"""
+Lambda entry point of the analysis API (PokemonAnalyzerFunction).
+
+The routes live in app-full.py, whose hyphenated name is not importable
+as a module, so it is loaded from its path once per container, during
+the init phase, and its lambda_handler is re-exported.
+"""
+
+import importlib.util
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    'app_full', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app-full.py'))
+app_full = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app_full)
+
+lambda_handler = app_full.lambda_handler
@@ -6,42 +6,85 @@ Analyzes sealed products for Open vs Hold vs Resell decisions
 import json
 import os
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-import boto3
+from concurrent.futures import ThreadPoolExecutor
 from pokemontcgsdk import Card, Set
 from pokemontcgsdk import RestClient
 import requests
-
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
+from rarity import rarity_code, rarity_name, pull_rate_table, pull_rate_version
+from simulator import simulate_boxes, DEFAULT_BOXES, MAX_BOXES, MAX_SEED
+from box_distribution import exact_box_distribution
+from ev_aggregate import register_aggregate, apply_price_updates, data_version
+from sweep import parse_axis, run_sweep
+from ev_engine import (calculate_expected_value, product_expected_value, price_set_products,
+                       MIN_CARD_VALUE, TOP_CARDS, MAX_TOP_CARDS, PACKS_PER_BOX, CARDS_PER_PACK)
+from product_types import PRODUCT_TYPES, product_type_of, fixed_value, scale_to_product
+from price_history import history_from_env, sealed_series, card_series
+from confidence import bootstrap_ev, confidence_from_samples
+from calibration import (refresh_calibrations, record_openings, summarize_logs,
+                         calibrated_codes)
+from write_behind import WriteBehindWriter, FLUSH_AT_END
+from analysis_codec import encode_analysis, decode_analysis
+from leaderboard import read_leaderboard, ORDERS
+from tiered_cache import default_cache
+from result_cache import ResultCache, bump_snapshot, snapshot_version
+from analysis_store import query_many, batch_get_analyses, latest_analyses, summary_from_item
+from rollups import read_rollups, GRANULARITIES
+from stream_processor import process_rows
+from storage import storage_from_env
+from archive import ArchiveReader, archive_from_env
+
+# Analytics table - DynamoDB, or SQLite/in-memory offline (STORAGE_BACKEND)
 table_name = os.environ.get('DYNAMODB_TABLE', 'pokemon-tcg-analytics')
-table = dynamodb.Table(table_name)
+table = storage_from_env(table_name)
+
+# Memory -> /tmp -> DynamoDB cache for sealed prices, set lists and catalogs
+cache = default_cache(table)
+
+# Finished /analyze results by content address, retired when prices or pull rates change.
+# Calibrations are brought up to the version a result is keyed under before it is computed
+result_cache = ResultCache(cache, table,
+                           on_version=lambda version: refresh_calibrations(table, version))
+
+# Analyses past ARCHIVE_AFTER_DAYS live in archive objects (S3 or ARCHIVE_DIR)
+archive = archive_from_env()
+archive_reader = ArchiveReader(table, archive) if archive else None
+
+# Analytics rows are written behind the response with BatchWriteItem
+analytics_writer = WriteBehindWriter(table)
+
+# Trending, rollups and latest pointers are derived from stored analyses by
+# the stream processor; 'inline' derives them here, for setups without it
+DERIVED_VIEWS = os.environ.get('DERIVED_VIEWS', 'inline')
+
+
+def sync_calibrations():
+    """Reload pull rates calibrated from opening logs if the data snapshot moved on"""
+    try:
+        refresh_calibrations(table, snapshot_version(table))
+    except Exception as e:
+        print(f"Calibration sync error: {str(e)}")
+
+
+# Pull rates calibrated from submitted opening logs
+sync_calibrations()
+
+# Sealed and card price series (PRICE_HISTORY_BACKEND selects DynamoDB or local files)
+price_history = history_from_env(table)
 
 # Configure Pokemon TCG SDK
 RestClient.configure(os.environ.get('POKEMON_TCG_API_KEY', ''))
 
-# Pull rate estimations (community averages)
-PULL_RATES = {
-    'Common': 1.0,  # Not counted in EV
-    'Uncommon': 1.0,  # Not counted in EV
-    'Rare': 0.25,  # 1 per 4 packs
-    'Rare Holo': 0.166,  # 1 per 6 packs
-    'Ultra Rare': 0.166,  # 1 per 6 packs
-    'Full Art': 0.083,  # 1 per 12 packs
-    'Secret Rare': 0.028,  # 1 per 36 packs
-    'Illustration Rare': 0.055,  # 1 per 18 packs
-    'Special Illustration Rare': 0.055,
-    'Hyper Rare': 0.020,  # 1 per 50 packs
-    'Gold Rare': 0.020,  # 1 per 50 packs
-}
-
-# Minimum card value to include in EV calculation
-MIN_CARD_VALUE = 0.40
-
-# Standard booster box configuration
-PACKS_PER_BOX = 36
-CARDS_PER_PACK = 10
+# Batch analyze limits
+MAX_BATCH_ITEMS = 50
+MAX_STORED_FETCH = 100
+MAX_SET_FETCH_WORKERS = 8
+
+# Hold projection - fitted from price history when a series has enough
+# observations, otherwise this flat 6-month appreciation
+HOLD_APPRECIATION = 0.15
+HOLD_HORIZON_DAYS = 182
 
 
 def lambda_handler(event, context):
@@ -54,6 +97,12 @@ def lambda_handler(event, context):
         'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
     }
 
+    # Writes still buffered from the previous invocation land before this one
+    analytics_writer.flush()
+
+    # Another container may have taken opening logs since this one loaded its rates
+    sync_calibrations()
+
     try:
         path = event.get('path', '')
         method = event.get('httpMethod', '')
@@ -69,13 +118,33 @@ def lambda_handler(event, context):
         # Route requests
         if path == '/analyze' and method == 'POST':
             return analyze_product(event, headers)
+        elif path == '/analyze/batch' and method == 'POST':
+            return analyze_batch(event, headers)
+        elif path == '/analyses' and method == 'POST':
+            return get_analyses(event, headers)
         elif path.startswith('/analyze/') and method == 'GET':
             product_id = path.split('/')[-1]
             return get_analysis(product_id, headers)
         elif path == '/sets' and method == 'GET':
             return list_sets(headers)
         elif path == '/trending' and method == 'GET':
-            return get_trending(headers)
+            return get_trending(event, headers)
+        elif path == '/sweep' and method == 'POST':
+            return sweep_scenarios(event, headers)
+        elif path == '/prices' and method == 'POST':
+            return update_prices(event, headers)
+        elif path == '/history' and method == 'GET':
+            return get_price_history(event, headers)
+        elif path == '/openings' and method == 'POST':
+            return submit_openings(event, headers)
+        elif path == '/rollups' and method == 'GET':
+            return get_rollups(event, headers)
+        elif path == '/cache/stats' and method == 'GET':
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps(cache.stats())
+            }
         else:
             return {
                 'statusCode': 404,
@@ -91,6 +160,10 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
+    finally:
+        if FLUSH_AT_END and not analytics_writer.flush():
+            print("Analytics writes still pending when the response was returned")
+
 
 def analyze_product(event, headers):
     """Analyze a sealed product for Open/Hold/Resell decision"""
@@ -100,6 +173,9 @@ def analyze_product(event, headers):
         product_name = body.get('product_name')
         set_name = body.get('set_name')
         sealed_price = body.get('sealed_price')  # Optional - will fetch if not provided
+        seed = body.get('seed')  # Optional - makes the simulation reproducible
+        top_k = body.get('top_k', TOP_CARDS)
+        min_price = body.get('min_price')  # Optional - also list every card over this price
 
         if not product_name and not set_name:
             return {
@@ -108,6 +184,41 @@ def analyze_product(event, headers):
                 'body': json.dumps({'error': 'product_name or set_name required'})
             }
 
+        try:
+            n_boxes = int(body.get('simulations', DEFAULT_BOXES))
+            seed = int(seed) if seed is not None else None
+            top_k = int(top_k)
+            min_price = float(min_price) if min_price is not None else None
+        except (TypeError, ValueError):
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': 'simulations, seed and top_k must be integers and min_price a number'
+                })
+            }
+        if (not 1 <= n_boxes <= MAX_BOXES or (seed is not None and not 0 <= seed < MAX_SEED)
+                or not 1 <= top_k <= MAX_TOP_CARDS
+                or (min_price is not None and not 0 <= min_price < float('inf'))):
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': f'simulations must be 1-{MAX_BOXES}, seed 0-{MAX_SEED - 1}, '
+                             f'top_k 1-{MAX_TOP_CARDS} and min_price a finite amount >= 0'
+                })
+            }
+
+        # Identical requests against the same data snapshot share one result
+        result_key = result_cache.key(body)
+        cached = result_cache.get(result_key)
+        if cached is not None:
+            return {
+                'statusCode': 200,
+                'headers': dict(headers, **{'X-Cache': 'HIT'}),
+                'body': json.dumps(cached)
+            }
+
         # Step 1: Get set data from Pokemon TCG API
         pokemon_set = find_set(set_name or product_name)
         if not pokemon_set:
@@ -117,27 +228,73 @@ def analyze_product(event, headers):
                 'body': json.dumps({'error': 'Set not found'})
             }
 
-        # Step 2: Get all cards in the set
-        cards = get_cards_for_set(pokemon_set.id)
+        # Step 2: Get all cards in the set with prices and rarity codes
+        catalog = get_set_catalog(pokemon_set.id)
+        product_name = product_name or f"{pokemon_set.name} Booster Box"
+        product_type = product_type_of(product_name)
+        packs = PRODUCT_TYPES[product_type]['packs']
 
-        # Step 3: Get card prices and calculate EV
-        ev_data = calculate_expected_value(cards, pokemon_set.id)
+        # Step 3: Calculate EV once for the set, then rescale to the product
+        set_ev = calculate_expected_value(
+            catalog, pokemon_set.id, top_k=top_k,
+            min_price=min_price
+        )
+        ev_data = product_expected_value(set_ev, product_type)
+        ev_data['set_products'] = price_set_products(set_ev)
+
+        # Keep an incremental aggregate so later price deltas skip the full
+        # recompute; rebuilt only when the snapshot or catalog prices move
+        register_aggregate(pokemon_set.id, product_type, catalog,
+                           pull_rate_table(pokemon_set.id), packs, MIN_CARD_VALUE,
+                           version=aggregate_version(catalog))
 
         # Step 4: Get sealed product price
         if not sealed_price:
             sealed_price = estimate_sealed_price(pokemon_set.name, product_name)
 
-        # Step 5: Calculate ROI metrics
+        # Step 5: Box-value spread - Monte Carlo sample and exact distribution.
+        # Guaranteed promos and extras are a constant, so they are taken off
+        # the sealed price instead of added to every sampled box
+        pull_rates = pull_rate_table(pokemon_set.id)
+        packs_price = sealed_price - fixed_value(product_type)
+        simulation = simulate_boxes(
+            catalog,
+            pull_rates,
+            sealed_price=packs_price,
+            packs_per_box=packs,
+            n_boxes=n_boxes,
+            seed=seed,
+            min_card_value=MIN_CARD_VALUE,
+            set_id=pokemon_set.id,
+            cards_per_pack=CARDS_PER_PACK
+        )
+        box_distribution = exact_box_distribution(
+            catalog,
+            pull_rates,
+            sealed_price=packs_price,
+            packs_per_box=packs,
+            set_id=pokemon_set.id,
+            min_card_value=MIN_CARD_VALUE,
+            cards_per_pack=CARDS_PER_PACK
+        )
+
+        # Step 6: Calculate ROI metrics
         analysis = generate_recommendation(
             ev_data=ev_data,
             sealed_price=sealed_price,
             set_name=pokemon_set.name,
             set_id=pokemon_set.id,
-            product_name=product_name or f"{pokemon_set.name} Booster Box"
+            product_name=product_name,
+            ev_samples=bootstrap_ev(catalog, pokemon_set.id, packs=packs) + fixed_value(product_type),
+            hold_projection=get_hold_projection(product_name)
         )
+        analysis['simulation'] = simulation
+        analysis['box_distribution'] = box_distribution
 
-        # Step 6: Store in DynamoDB for analytics
+        # Step 7: Queue for DynamoDB as soon as the analysis is complete, so the
+        # write runs while the result is cached and the response serialized
         store_analysis(analysis)
+        result_cache.put(result_key, analysis)
 
         return {
             'statusCode': 200,
@@ -154,6 +311,390 @@ def analyze_product(event, headers):
         }
 
 
+def analyze_batch(event, headers):
+    """
+    Analyze many sealed products in one call.
+    Items are grouped by set so each set is fetched, hydrated and has its
+    EV computed once, however many of its products are requested.
+    """
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+        items = body.get('items', [])
+        top_k = int(body.get('top_k', TOP_CARDS))
+
+        if not items or len(items) > MAX_BATCH_ITEMS:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f'items must contain 1-{MAX_BATCH_ITEMS} products'})
+            }
+
+        # Group items by set search term
+        items_by_set = {}
+        for index, item in enumerate(items):
+            term = item.get('set_name') or item.get('product_name')
+            if term:
+                items_by_set.setdefault(term.strip().lower(), []).append(index)
+
+        # Fetch every set's catalog once, in parallel
+        terms = list(items_by_set)
+        workers = max(1, min(MAX_SET_FETCH_WORKERS, len(terms)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            loaded = list(executor.map(load_set_catalog, terms))
+
+        results = [None] * len(items)
+        for term, (pokemon_set, catalog) in zip(terms, loaded):
+            if not pokemon_set:
+                for index in items_by_set[term]:
+                    results[index] = {'error': 'Set not found', 'item': items[index]}
+                continue
+
+            # One EV and one bootstrap per set; every product is a rescale
+            set_ev = calculate_expected_value(catalog, pokemon_set.id, top_k=top_k)
+            set_samples = bootstrap_ev(catalog, pokemon_set.id)
+
+            product_names = {
+                index: items[index].get('product_name') or f"{pokemon_set.name} Booster Box"
+                for index in items_by_set[term]
+            }
+            projections = get_hold_projections(set(product_names.values()))
+
+            for index, product_name in product_names.items():
+                item = items[index]
+                product_type = product_type_of(product_name)
+                sealed_price = item.get('sealed_price') or estimate_sealed_price(pokemon_set.name, product_name)
+                results[index] = generate_recommendation(
+                    ev_data=product_expected_value(set_ev, product_type),
+                    sealed_price=sealed_price,
+                    set_name=pokemon_set.name,
+                    set_id=pokemon_set.id,
+                    product_name=product_name,
+                    ev_samples=scale_to_product(set_samples, product_type, PACKS_PER_BOX),
+                    hold_projection=projections.get(product_name)
+                )
+
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = {'error': 'product_name or set_name required', 'item': items[index]}
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'analyses': results,
+                'items_count': len(items),
+                'sets_fetched': len(terms)
+            }, default=str)
+        }
+
+    except Exception as e:
+        print(f"Batch analysis error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def load_set_catalog(search_term: str) -> Tuple[Optional[Set], List[Dict]]:
+    """Find a set and fetch its hydrated card catalog"""
+    pokemon_set = find_set(search_term)
+    if not pokemon_set:
+        return None, []
+    return pokemon_set, get_set_catalog(pokemon_set.id)
+
+
+def sweep_scenarios(event, headers):
+    """
+    Sensitivity sweep over sealed price, appreciation, packs per box and
+    min card value for one set. Each axis is a list, a number or
+    {'min', 'max', 'steps'}.
+    """
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+        set_name = body.get('set_name')
+
+        if not set_name or body.get('sealed_price') is None:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'set_name and sealed_price required'})
+            }
+
+        try:
+            sealed_prices = parse_axis(body.get('sealed_price'), None)
+            appreciations = parse_axis(body.get('appreciation'), HOLD_APPRECIATION)
+            packs_per_box = parse_axis(body.get('packs_per_box'), PACKS_PER_BOX)
+            min_card_values = parse_axis(body.get('min_card_value'), MIN_CARD_VALUE)
+        except (KeyError, TypeError, ValueError) as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f'Invalid sweep range: {str(e)}'})
+            }
+
+        pokemon_set, catalog = load_set_catalog(set_name)
+        if not pokemon_set:
+            return {
+                'statusCode': 404,
+                'headers': headers,
+                'body': json.dumps({'error': 'Set not found'})
+            }
+
+        try:
+            sweep = run_sweep(catalog, pokemon_set.id, sealed_prices, appreciations,
+                              packs_per_box, min_card_values)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        sweep.update({'set_name': pokemon_set.name, 'set_id': pokemon_set.id})
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps(sweep)
+        }
+
+    except Exception as e:
+        print(f"Sweep error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def update_prices(event, headers):
+    """
+    Apply delta card price updates to the EV aggregates of a set and
+    append card and sealed price observations to their history series
+    """
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+        set_id = body.get('set_id')
+        updates = body.get('updates', [])
+        sealed = body.get('sealed', [])  # [{'product_name': ..., 'price': ...}]
+
+        if not set_id and updates:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'set_id required'})
+            }
+
+        card_updates = [(u['card_id'], float(u['price'])) for u in updates]
+        ev_totals = apply_price_updates(set_id, card_updates) if set_id else {}
+        if card_updates:
+            # The next /analyze rebuilds its aggregate from the cached catalog
+            update_catalog_prices(set_id, card_updates)
+
+        # One batched read and parallel conditional writes for the whole sync
+        price_history.record_many(
+            [(card_series(card_id), price) for card_id, price in card_updates]
+            + [(sealed_series(observation['product_name']), float(observation['price']))
+               for observation in sealed],
+            body.get('timestamp')
+        )
+
+        if card_updates or sealed:
+            invalidate_results()
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'set_id': set_id,
+                'updates_applied': len(updates),
+                'sealed_recorded': len(sealed),
+                'ev_totals': ev_totals
+            })
+        }
+
+    except Exception as e:
+        print(f"Price update error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def submit_openings(event, headers):
+    """
+    Add box-opening results to a set's pull-rate calibration. Accepts pack
+    logs ('packs': [[hit rarity, ...], ...]) or totals ('pack_count' and
+    'hits': {rarity: count}); either way it is one atomic update.
+    """
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+        set_id = body.get('set_id')
+
+        if not set_id or not (body.get('packs') or body.get('pack_count')):
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'set_id and packs or pack_count required'})
+            }
+
+        try:
+            if body.get('packs'):
+                packs, hits = summarize_logs(body['packs'])
+            else:
+                packs = int(body['pack_count'])
+                hits = {}
+                for rarity, count in body.get('hits', {}).items():
+                    if isinstance(count, float) and count.is_integer():
+                        count = int(count)
+                    if isinstance(count, bool) or not isinstance(count, int):
+                        raise ValueError(f"Hit count for {rarity} must be a whole number")
+                    code = rarity_code(rarity)
+                    hits[code] = hits.get(code, 0) + count
+            calibration = record_openings(table, set_id, packs, hits)
+        except (TypeError, ValueError) as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+        invalidate_results()
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'set_id': set_id,
+                'packs_submitted': packs,
+                'version': calibration['version'],
+                'packs_total': calibration['packs'],
+                'pull_rates': {
+                    rarity_name(code): {
+                        'rate': round(calibration['rates'][code], 5),
+                        'std': round(calibration['stds'][code], 5)
+                    }
+                    for code in calibrated_codes(calibration['rates'])
+                }
+            })
+        }
+
+    except Exception as e:
+        print(f"Opening submission error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def invalidate_results():
+    """Retire every cached /analyze result after prices or pull rates change"""
+    try:
+        bump_snapshot(table)
+    except Exception as e:
+        print(f"Snapshot bump error: {str(e)}")
+
+
+def get_price_history(event, headers):
+    """Six months of price points and the fitted projection for one series"""
+
+    params = event.get('queryStringParameters') or {}
+    if params.get('card_id'):
+        series = card_series(params['card_id'])
+    elif params.get('product_name'):
+        series = sealed_series(params['product_name'])
+    else:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': 'product_name or card_id required'})
+        }
+
+    try:
+        days, prices = price_history.points(series, int(params.get('days', HOLD_HORIZON_DAYS)))
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'series': series,
+                'points': [
+                    {'date': datetime.utcfromtimestamp(day * 86400).date().isoformat(),
+                     'price': price}
+                    for day, price in zip(days, prices)
+                ],
+                'projection': price_history.projection(series, HOLD_HORIZON_DAYS)
+            })
+        }
+
+    except Exception as e:
+        print(f"Price history error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def get_rollups(event, headers):
+    """Hourly or daily count/min/max/mean of EV, sealed price and ROI for one set"""
+
+    params = event.get('queryStringParameters') or {}
+    granularity = params.get('granularity', 'day')
+    if not params.get('set_id') or granularity not in GRANULARITIES:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': f"set_id required, granularity one of {', '.join(GRANULARITIES)}"})
+        }
+
+    try:
+        now = time.time()
+        days = float(params.get('days', 90))
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'set_id': params['set_id'],
+                'granularity': granularity,
+                'buckets': read_rollups(table, params['set_id'], granularity, now - days * 86400, now)
+            })
+        }
+
+    except Exception as e:
+        print(f"Rollup read error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def get_hold_projection(product_name: str) -> Optional[Dict]:
+    """Fitted 6-month projection for a sealed product, or None without enough history"""
+    try:
+        return price_history.projection(sealed_series(product_name), HOLD_HORIZON_DAYS)
+    except Exception as e:
+        print(f"Hold projection error: {str(e)}")
+        return None
+
+
+def get_hold_projections(product_names) -> Dict[str, Optional[Dict]]:
+    """Hold projections for many sealed products in one batch read"""
+    try:
+        projections = price_history.projections(
+            [sealed_series(name) for name in product_names], HOLD_HORIZON_DAYS
+        )
+        return {name: projections.get(sealed_series(name)) for name in product_names}
+    except Exception as e:
+        print(f"Hold projection error: {str(e)}")
+        return {}
+
+
 def find_set(search_term: str) -> Optional[Set]:
     """Find a Pokemon TCG set by name"""
     try:
@@ -174,6 +715,30 @@ def find_set(search_term: str) -> Optional[Set]:
         return None
 
 
+def get_set_catalog(set_id: str) -> List[Dict]:
+    """Hydrated card catalog of a set, read through the tiered cache"""
+    return cache.get('catalog', set_id,
+                     lambda: hydrate_cards(get_cards_for_set(set_id)) or None) or []
+
+
+def aggregate_version(catalog: List[Dict]):
+    """Data version for EV aggregates, or None (always rebuild) if the snapshot can't be read"""
+    try:
+        return data_version(snapshot_version(table), catalog)
+    except Exception as e:
+        print(f"Snapshot read error: {str(e)}")
+        return None
+
+
+def update_catalog_prices(set_id: str, card_updates: List[Tuple[str, float]]):
+    """Apply (card_id, price) updates to a set's cached catalog, if it is cached"""
+    prices = dict(card_updates)
+    cache.update('catalog', set_id, lambda catalog: [
+        dict(card, price=prices[card['id']]) if card['id'] in prices else card
+        for card in catalog
+    ])
+
+
 def get_cards_for_set(set_id: str) -> List[Card]:
     """Get all cards for a specific set"""
     try:
@@ -184,62 +749,29 @@ def get_cards_for_set(set_id: str) -> List[Card]:
         return []
 
 
-def calculate_expected_value(cards: List[Card], set_id: str) -> Dict:
-    """Calculate expected value of opening packs"""
-
-    ev_total = 0.0
-    card_breakdown = []
-    rarity_stats = {}
+def hydrate_cards(cards: List[Card]) -> List[Dict]:
+    """Convert SDK cards into priced catalog entries, normalizing rarity once"""
 
+    catalog = []
     for card in cards:
         try:
-            # Get card price
-            price = get_card_price(card)
-
-            if price < MIN_CARD_VALUE:
-                continue
-
-            # Get rarity
             rarity = card.rarity
-            pull_rate = get_pull_rate(rarity)
-
-            # Calculate contribution to EV
-            ev_contribution = price * pull_rate * PACKS_PER_BOX
-            ev_total += ev_contribution
-
-            # Track stats
-            if rarity not in rarity_stats:
-                rarity_stats[rarity] = {'count': 0, 'total_value': 0}
-            rarity_stats[rarity]['count'] += 1
-            rarity_stats[rarity]['total_value'] += price
-
-            # Store card data if significant contributor (>=5% of EV)
-            if ev_contribution >= (ev_total * 0.05) or price >= 10:
-                card_breakdown.append({
-                    'name': card.name,
-                    'rarity': rarity,
-                    'price': round(price, 2),
-                    'pull_rate': pull_rate,
-                    'ev_contribution': round(ev_contribution, 2),
-                    'set_number': card.number,
-                    'image': card.images.small if hasattr(card, 'images') else None
-                })
-
+            catalog.append({
+                'id': card.id,
+                'name': card.name,
+                'number': card.number,
+                'rarity': rarity,
+                'rarity_code': rarity_code(rarity),
+                'price': get_card_price(card),
+                'reverse_price': get_reverse_price(card),
+                **get_price_band(card),
+                'image': card.images.small if hasattr(card, 'images') else None
+            })
         except Exception as e:
-            print(f"Error processing card {card.name}: {str(e)}")
+            print(f"Error hydrating card {card.name}: {str(e)}")
             continue
 
-    # Sort by EV contribution
-    card_breakdown.sort(key=lambda x: x['ev_contribution'], reverse=True)
-
-    return {
-        'ev_total': round(ev_total, 2),
-        'top_cards': card_breakdown[:20],  # Top 20 contributors
-        'rarity_breakdown': rarity_stats,
-        'total_cards_analyzed': len(cards),
-        'valuable_cards_count': len(card_breakdown),
-        'api_source': 'pokemontcg.io'
-    }
+    return catalog
 
 
 def get_card_price(card: Card) -> float:
@@ -270,31 +802,39 @@ def get_card_price(card: Card) -> float:
         return 0.0
 
 
-def get_pull_rate(rarity: str) -> float:
+def get_price_band(card: Card) -> Dict:
+    """TCGPlayer low/high listing prices for the price type get_card_price uses"""
+    try:
+        if hasattr(card, 'tcgplayer') and card.tcgplayer:
+            prices = card.tcgplayer.prices
+            for price_type in ('holofoil', 'normal', 'reverseHolofoil'):
+                band = getattr(prices, price_type, None)
+                if band:
+                    return {'price_low': band.low, 'price_high': band.high}
+        return {'price_low': None, 'price_high': None}
+
+    except Exception as e:
+        print(f"Price band fetch error for {card.name}: {str(e)}")
+        return {'price_low': None, 'price_high': None}
+
+
+def get_reverse_price(card: Card) -> Optional[float]:
+    """Get reverse holo market price from TCGPlayer, if the card has one"""
+    try:
+        if hasattr(card, 'tcgplayer') and card.tcgplayer:
+            prices = card.tcgplayer.prices
+            if hasattr(prices, 'reverseHolofoil') and prices.reverseHolofoil:
+                return prices.reverseHolofoil.market
+        return None
+
+    except Exception as e:
+        print(f"Reverse price fetch error for {card.name}: {str(e)}")
+        return None
+
+
+def get_pull_rate(rarity: str, set_id: Optional[str] = None) -> float:
     """Get pull rate for a rarity type"""
-    # Try exact match
-    if rarity in PULL_RATES:
-        return PULL_RATES[rarity]
-
-    # Try partial matches
-    rarity_lower = rarity.lower()
-    if 'secret' in rarity_lower or 'sr' in rarity_lower:
-        return PULL_RATES['Secret Rare']
-    elif 'hyper' in rarity_lower:
-        return PULL_RATES['Hyper Rare']
-    elif 'gold' in rarity_lower:
-        return PULL_RATES['Gold Rare']
-    elif 'illustration rare' in rarity_lower:
-        return PULL_RATES['Illustration Rare']
-    elif 'full art' in rarity_lower or 'ultra rare' in rarity_lower:
-        return PULL_RATES['Full Art']
-    elif 'holo' in rarity_lower:
-        return PULL_RATES['Rare Holo']
-    elif 'rare' in rarity_lower:
-        return PULL_RATES['Rare']
-
-    # Default
-    return 0.05
+    return pull_rate_table(set_id)[rarity_code(rarity)]
 
 
 def estimate_sealed_price(set_name: str, product_name: str) -> float:
@@ -305,20 +845,19 @@ def estimate_sealed_price(set_name: str, product_name: str) -> float:
     if cached:
         return cached
 
-    # Default estimates by product type
-    if 'booster box' in product_name.lower():
-        return 100.0  # Default booster box price
-    elif 'etb' in product_name.lower() or 'elite trainer' in product_name.lower():
-        return 50.0
-    elif 'booster bundle' in product_name.lower():
-        return 25.0
-    else:
-        return 100.0  # Default
+    # Default estimate for the product type
+    return PRODUCT_TYPES[product_type_of(product_name)]['default_price']
 
 
 def generate_recommendation(ev_data: Dict, sealed_price: float, set_name: str,
-                            set_id: str, product_name: str) -> Dict:
-    """Generate Open vs Hold vs Resell recommendation"""
+                            set_id: str, product_name: str,
+                            ev_samples, hold_projection: Optional[Dict] = None) -> Dict:
+    """
+    Generate Open vs Hold vs Resell recommendation. ev_samples are the set's
+    bootstrap EV replicates (confidence.bootstrap_ev). hold_projection is the
+    product's fitted price trend (see get_hold_projection); without one the
+    flat HOLD_APPRECIATION is assumed.
+    """
 
     ev_open = ev_data['ev_total']
 
@@ -326,8 +865,15 @@ def generate_recommendation(ev_data: Dict, sealed_price: float, set_name: str,
     roi_open = ev_open - sealed_price
     roi_open_percent = (roi_open / sealed_price * 100) if sealed_price > 0 else 0
 
-    # Estimate hold value (simplified - would use historical data in production)
-    projected_6mo_price = sealed_price * 1.15  # Assume 15% appreciation
+    # Estimate hold value from the sealed price trend
+    if hold_projection:
+        appreciation = hold_projection['appreciation']
+        appreciation_estimate = (f"{appreciation:.1%} fitted from "
+                                 f"{hold_projection['observations']} price observations")
+    else:
+        appreciation = HOLD_APPRECIATION
+        appreciation_estimate = f"{HOLD_APPRECIATION:.0%} for sealed (no price history)"
+    projected_6mo_price = sealed_price * (1 + appreciation)
     roi_hold = projected_6mo_price - sealed_price
     roi_hold_percent = (roi_hold / sealed_price * 100) if sealed_price > 0 else 0
 
@@ -340,8 +886,8 @@ def generate_recommendation(ev_data: Dict, sealed_price: float, set_name: str,
         roi_open_percent, roi_hold_percent, roi_resell_percent, ev_open, sealed_price
     )
 
-    # Calculate confidence score
-    confidence = calculate_confidence(ev_data, sealed_price)
+    # Confidence from the bootstrap EV spread
+    confidence = calculate_confidence(ev_samples, sealed_price)
 
     return {
         'product_name': product_name,
@@ -369,14 +915,18 @@ def generate_recommendation(ev_data: Dict, sealed_price: float, set_name: str,
             }
         },
         'recommendation': recommendation,
-        'confidence_score': confidence,
+        'confidence_score': confidence['score'],
+        'confidence': confidence,
         'ev_breakdown': ev_data,
         'assumptions': {
-            'packs_per_box': PACKS_PER_BOX,
-            'pull_rates': 'Community averages (see documentation)',
+            'product_type': ev_data['product']['product_type'],
+            'packs_per_box': ev_data['packs'],
+            'guaranteed_extras_value': ev_data['product']['fixed_value'],
+            'pull_rates': (f"Calibrated from opening logs (v{pull_rate_version(set_id)})"
+                           if pull_rate_version(set_id) else 'Community averages (see documentation)'),
             'min_card_value': MIN_CARD_VALUE,
             'hold_period': '6 months',
-            'appreciation_estimate': '15% for sealed'
+            'appreciation_estimate': appreciation_estimate
         },
         'api_sources': [
             'pokemontcg.io for card data',
@@ -407,81 +957,40 @@ def determine_recommendation(roi_open_pct: float, roi_hold_pct: float,
         return "HOLD SEALED - Marginal expected value, sealed preservation recommended"
 
 
-def calculate_confidence(ev_data: Dict, sealed_price: float) -> int:
-    """Calculate confidence score 1-100"""
-
-    confidence = 50  # Base confidence
-
-    # More cards analyzed = higher confidence
-    if ev_data['total_cards_analyzed'] > 200:
-        confidence += 20
-    elif ev_data['total_cards_analyzed'] > 100:
-        confidence += 10
-
-    # More valuable cards = higher confidence
-    if ev_data['valuable_cards_count'] > 50:
-        confidence += 15
-    elif ev_data['valuable_cards_count'] > 20:
-        confidence += 10
-
-    # API data available
-    if ev_data.get('api_source'):
-        confidence += 15
-
-    return min(confidence, 100)
+def calculate_confidence(ev_samples, sealed_price: float) -> Dict:
+    """Confidence score 1-100 and EV interval from bootstrap EV replicates"""
+    return confidence_from_samples(ev_samples, sealed_price)
 
 
 def store_analysis(analysis: Dict):
-    """Store analysis in DynamoDB for analytics"""
+    """Queue analysis for DynamoDB (written behind the response)"""
     try:
         # Generate unique ID
         analysis_id = f"{analysis['set_id']}_{int(time.time())}"
 
-        # Store in DynamoDB
-        table.put_item(
-            Item={
-                'pk': f"ANALYSIS#{analysis['set_id']}",
-                'sk': f"TIMESTAMP#{analysis['timestamp']}",
-                'analysis_id': analysis_id,
-                'timestamp': int(datetime.now().timestamp()),
-                'product_name': analysis['product_name'],
-                'set_name': analysis['set_name'],
-                'recommendation': analysis['recommendation'],
-                'ev_open': analysis['pricing']['expected_value_open'],
-                'sealed_price': analysis['pricing']['sealed_box_cost'],
-                'confidence': analysis['confidence_score'],
-                'data': json.dumps(analysis)
-            }
-        )
+        row = {
+            'pk': f"ANALYSIS#{analysis['set_id']}",
+            'sk': f"TIMESTAMP#{analysis['timestamp']}",
+            'analysis_id': analysis_id,
+            'timestamp': int(datetime.now().timestamp()),
+            'product_name': analysis['product_name'],
+            'set_name': analysis['set_name'],
+            'recommendation': analysis['recommendation'],
+            'ev_open': analysis['pricing']['expected_value_open'],
+            'sealed_price': analysis['pricing']['sealed_box_cost'],
+            'confidence': analysis['confidence_score'],
+            'blob': encode_analysis(analysis)
+        }
+        analytics_writer.put(row)
 
-        # Also store in trending cache
-        update_trending_cache(analysis)
+        # Without a stream consumer, update trending/rollups/latest behind the response
+        if DERIVED_VIEWS == 'inline':
+            analytics_writer.defer(process_rows, table, [(None, row)])
 
     except Exception as e:
         print(f"DynamoDB store error: {str(e)}")
 
 
-def update_trending_cache(analysis: Dict):
-    """Update trending products cache"""
-    try:
-        table.put_item(
-            Item={
-                'pk': 'TRENDING',
-                'sk': f"SET#{analysis['set_id']}",
-                'timestamp': int(datetime.now().timestamp()),
-                'set_name': analysis['set_name'],
-                'product_name': analysis['product_name'],
-                'ev_open': analysis['pricing']['expected_value_open'],
-                'sealed_price': analysis['pricing']['sealed_box_cost'],
-                'roi_percent': analysis['roi']['open']['percent'],
-                'recommendation': analysis['recommendation'],
-                'ttl': int((datetime.now() + timedelta(days=7)).timestamp())
-            }
-        )
-    except Exception as e:
-        print(f"Trending cache error: {str(e)}")
-
-
 def get_analysis(product_id: str, headers: Dict) -> Dict:
     """Retrieve stored analysis by ID"""
     try:
@@ -495,12 +1004,18 @@ def get_analysis(product_id: str, headers: Dict) -> Dict:
             ScanIndexForward=False  # Most recent first
         )
 
-        if response['Items']:
-            item = response['Items'][0]
+        item = response['Items'][0] if response['Items'] else None
+        if item is None and archive_reader:
+            # Every row of the set is past the archive cutoff
+            item = archive_reader.latest(product_id)
+
+        if item:
+            # Rows written before the binary codec keep the analysis as JSON in 'data'
+            body = json.dumps(decode_analysis(item['blob'])) if 'blob' in item else item.get('data', '{}')
             return {
                 'statusCode': 200,
                 'headers': headers,
-                'body': item.get('data', '{}')
+                'body': body
             }
         else:
             return {
@@ -518,21 +1033,126 @@ def get_analysis(product_id: str, headers: Dict) -> Dict:
         }
 
 
-def list_sets(headers: Dict) -> Dict:
-    """List available Pokemon TCG sets"""
+def get_analyses(event, headers: Dict) -> Dict:
+    """
+    Stored analyses for many sets in one call. 'set_ids' entries are set
+    IDs or {'set_id', 'since', 'until', 'limit'} (newest first, default 1
+    each); 'keys' are exact {'set_id', 'sk'} rows. Only summary attributes
+    are read unless 'include_data' is set.
+    """
     try:
-        sets = Set.all()
-        set_list = [
-            {
-                'id': s.id,
-                'name': s.name,
-                'series': s.series,
-                'release_date': s.releaseDate,
-                'total_cards': s.total,
-                'logo': s.images.logo if hasattr(s, 'images') else None
+        body = json.loads(event.get('body', '{}'))
+        include_data = bool(body.get('include_data'))
+        keys = body.get('keys', [])
+
+        # Per-set window and limit, defaulting to the request-wide ones
+        queries = []
+        try:
+            for entry in body.get('set_ids', []):
+                entry = {'set_id': entry} if isinstance(entry, str) else entry
+                if not isinstance(entry, dict) or not isinstance(entry.get('set_id'), str):
+                    raise ValueError('each set_ids entry needs a set_id')
+                limit = entry.get('limit', body.get('limit'))
+                if limit is None:
+                    limit = 1
+                elif isinstance(limit, bool) or not str(limit).isdigit() or int(limit) < 1:
+                    raise ValueError('limit must be a positive integer')
+                limit = int(limit)
+                queries.append({
+                    'set_id': entry['set_id'],
+                    'since': entry.get('since', body.get('since')),
+                    'until': entry.get('until', body.get('until')),
+                    'limit': limit
+                })
+            if any(not isinstance(key, dict) or not isinstance(key.get('set_id'), str)
+                   or not isinstance(key.get('sk'), str) for key in keys):
+                raise ValueError('each keys entry needs a set_id and sk')
+        except (TypeError, ValueError) as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        if not queries and not keys:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'set_ids or keys required'})
+            }
+        if sum(query['limit'] for query in queries) + len(keys) > MAX_STORED_FETCH:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f'At most {MAX_STORED_FETCH} analyses per request'})
             }
-            for s in sets[:50]  # Limit to recent 50 sets
+
+        # Plain newest-summary lookups come from the LATEST pointers in one
+        # BatchGetItem; sets without a pointer fall back to a query
+        def from_pointer(query):
+            return (not include_data and query['limit'] == 1
+                    and query['since'] is None and query['until'] is None)
+
+        pointed = [query['set_id'] for query in queries if from_pointer(query)]
+        latest = latest_analyses(table, pointed) if pointed else {}
+        pending = [query for query in queries
+                   if not (from_pointer(query) and query['set_id'] in latest)]
+        queried = iter(query_many(table, pending, include_data=include_data))
+        by_set = [
+            [latest[query['set_id']]] if from_pointer(query) and query['set_id'] in latest
+            else next(queried)
+            for query in queries
         ]
+        rows = batch_get_analyses(
+            table, [(key['set_id'], key['sk']) for key in keys], include_data=include_data
+        ) if keys else []
+        if archive_reader:
+            # Keys missing from the table may have been archived
+            for i, key in enumerate(keys):
+                if rows[i] is None:
+                    item = archive_reader.find(key['set_id'], key['sk'])
+                    rows[i] = summary_from_item(item, include_data) if item else None
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'sets': [
+                    {'set_id': query['set_id'], 'analyses': analyses}
+                    for query, analyses in zip(queries, by_set)
+                ],
+                'rows': rows
+            }, default=str)
+        }
+
+    except Exception as e:
+        print(f"Get analyses error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def load_set_list() -> List[Dict]:
+    """Summaries of the 50 most recent sets from the Pokemon TCG API"""
+    return [
+        {
+            'id': s.id,
+            'name': s.name,
+            'series': s.series,
+            'release_date': s.releaseDate,
+            'total_cards': s.total,
+            'logo': s.images.logo if hasattr(s, 'images') else None
+        }
+        for s in Set.all()[:50]  # Limit to recent 50 sets
+    ]
+
+
+def list_sets(headers: Dict) -> Dict:
+    """List available Pokemon TCG sets"""
+    try:
+        set_list = cache.get('sets', 'recent', load_set_list)
 
         return {
             'statusCode': 200,
@@ -549,20 +1169,19 @@ def list_sets(headers: Dict) -> Dict:
         }
 
 
-def get_trending(headers: Dict) -> Dict:
-    """Get trending analyses"""
+def get_trending(event, headers: Dict) -> Dict:
+    """Get trending analyses from the leaderboard (?order=roi|recent)"""
     try:
-        response = table.query(
-            KeyConditionExpression='pk = :pk',
-            ExpressionAttributeValues={
-                ':pk': 'TRENDING'
-            },
-            Limit=20,
-            ScanIndexForward=False
-        )
+        order = (event.get('queryStringParameters') or {}).get('order', 'roi')
+        if order not in ORDERS:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f"order must be one of {', '.join(ORDERS)}"})
+            }
 
         trending = []
-        for item in response.get('Items', []):
+        for item in read_leaderboard(table, order):
             trending.append({
                 'set_name': item.get('set_name'),
                 'product_name': item.get('product_name'),
@@ -576,7 +1195,7 @@ def get_trending(headers: Dict) -> Dict:
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({'trending': trending})
+            'body': json.dumps({'trending': trending, 'order': order}, default=str)
         }
 
     except Exception as e:
@@ -589,24 +1208,23 @@ def get_trending(headers: Dict) -> Dict:
 
 
 def get_cached_price(product_name: str) -> Optional[float]:
-    """Get cached sealed price from DynamoDB"""
-    try:
+    """Sealed price from the tiered cache, loaded from the PRICE_CACHE row on a miss"""
+
+    def load_price():
         response = table.get_item(
             Key={
                 'pk': 'PRICE_CACHE',
                 'sk': f"PRODUCT#{product_name}"
             }
         )
-
-        if 'Item' in response:
-            item = response['Item']
-            # Check if cache is still valid (1 hour TTL)
-            cached_time = item.get('timestamp', 0)
-            if time.time() - cached_time < 3600:
-                return item.get('price')
-
+        item = response.get('Item')
+        if item and time.time() - float(item.get('timestamp', 0)) < cache.ttl('price'):
+            return float(item['price'])
         return None
 
+    try:
+        return cache.get('price', product_name, load_price)
+
     except Exception as e:
         print(f"Cache fetch error: {str(e)}")
         return None
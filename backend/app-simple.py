@@ -6,6 +6,24 @@ import json
 import os
 from datetime import datetime
 from pokemon_api import fetch_all_set_cards, set_api_key
+from ev_table import load_ev_table, get_table, DEFAULT_EV_PER_PACK
+from portfolio import optimize_portfolio
+from price_history import history_from_env, sealed_series
+from product_types import PRODUCT_TYPES, product_type_of, product_ev
+from completion import CompletionIndex, collection_variants, simulate_completion
+from rarity import pull_rate_table
+from tiered_cache import default_cache
+
+# Materialized EV per pack by set - loaded once per container
+# (rebuild with `python ev_table.py`)
+EV_TABLE = load_ev_table()
+
+# Memory -> /tmp -> DynamoDB cache for set catalogs
+CACHE = default_cache(get_table())
+
+# Sealed price series - hold projections are fitted from these
+PRICE_HISTORY = history_from_env(get_table())
+HOLD_HORIZON_DAYS = 182
 
 # CORS headers
 CORS_HEADERS = {
@@ -66,6 +84,10 @@ def lambda_handler(event, context):
             return get_shopping_list(CORS_HEADERS)
         elif path == '/sealed-products' or path == '/prod/sealed-products':
             return get_sealed_products(CORS_HEADERS)
+        elif (path == '/portfolio' or path == '/prod/portfolio') and method == 'POST':
+            return get_portfolio(event, CORS_HEADERS)
+        elif (path == '/completion' or path == '/prod/completion') and method == 'POST':
+            return get_completion_cost(event, CORS_HEADERS)
         elif path == '/cards' or path == '/prod/cards':
             return get_all_cards(event, CORS_HEADERS)
         elif path.startswith('/analyze') and method == 'POST':
@@ -215,50 +237,63 @@ def get_shopping_list(headers):
     }
 
 
+def get_set_cards(set_id):
+    """Priced English cards of a set, read through the tiered cache"""
+    return CACHE.get('cards', set_id, lambda: fetch_all_set_cards(set_id) or None) or []
+
+
 def get_ev_per_pack(set_id='sv3pt5'):
-    """Get EV per pack - uses pre-calculated values for speed"""
-    # Pre-calculated EV values based on real Pokemon TCG API data
-    # Updated Nov 2024 with current market prices
-    ev_cache = {
-        'sv08': 5.20,     # Surging Sparks - New set (Nov 2024)
-        'sv07': 4.60,     # Stellar Crown
-        'sv06.5': 4.10,   # Shrouded Fable
-        'sv06': 4.40,     # Twilight Masquerade
-        'sv04.5': 4.80,   # Paldean Fates - Special set with high-value pulls
-        'sv03': 4.20,     # Obsidian Flames
-        'sv3pt5': 6.34,   # 151 - High value (Charizard, Mew, Mewtwo)
-    }
+    """Get EV per pack from the materialized EV table"""
+    entry = EV_TABLE.get(set_id)
+    return entry['ev_per_pack'] if entry else DEFAULT_EV_PER_PACK
+
 
-    # Return cached value or default estimate
-    return ev_cache.get(set_id, 4.50)
+def get_hold_projections(product_names):
+    """Fitted 6-month projections by product name (one batch read)"""
+    try:
+        projections = PRICE_HISTORY.projections(
+            [sealed_series(name) for name in product_names], HOLD_HORIZON_DAYS
+        )
+        return {name: projections.get(sealed_series(name)) for name in product_names}
+    except Exception as e:
+        print(f"Hold projection error: {str(e)}")
+        return {}
 
 
-def calculate_product_roi(product, set_id='sv3pt5'):
-    """Calculate ROI for a sealed product using REAL EV"""
+def calculate_product_roi(product, set_id='sv3pt5', hold_projection=None):
+    """Calculate ROI for a sealed product using REAL EV and its fitted price trend"""
     price = product['price']
     msrp = product['msrp']
-    packs = product.get('packs', 36)
 
-    # Get EV per pack (pre-calculated from real market data)
+    # EV per pack (materialized from live catalogs by the EV engine), scaled
+    # to the product's packs plus its guaranteed promos and extras
     ev_per_pack = get_ev_per_pack(set_id)
-    ev_open = packs * ev_per_pack
+    contents = product_ev(ev_per_pack, product_type_of(product['name']))
+    ev_open = contents['ev_total']
 
     # ROI calculations
     roi_open = {
         'value': round(ev_open, 2),
         'profit': round(ev_open - price, 2),
         'percent': round(((ev_open - price) / price * 100), 1),
-        'ev_per_pack': ev_per_pack
+        'ev_per_pack': ev_per_pack,
+        'product_type': contents['product_type'],
+        'fixed_value': contents['fixed_value']
     }
 
-    # Hold 6 months projection (conservative 10-20% appreciation for popular sets)
-    appreciation_rate = 0.15 if price < msrp * 0.90 else 0.10
+    # Hold 6 months projection - fitted price trend, or a conservative
+    # 10-15% appreciation when the product has too little history
+    if hold_projection:
+        appreciation_rate = hold_projection['appreciation']
+    else:
+        appreciation_rate = 0.15 if price < msrp * 0.90 else 0.10
     projected_6mo = price * (1 + appreciation_rate)
 
     roi_hold = {
         'value': round(projected_6mo, 2),
         'profit': round(projected_6mo - price, 2),
-        'percent': round(appreciation_rate * 100, 1)
+        'percent': round(appreciation_rate * 100, 1),
+        'source': 'price_history' if hold_projection else 'default'
     }
 
     # Resell now (only profit if below MSRP)
@@ -285,7 +320,7 @@ def calculate_product_roi(product, set_id='sv3pt5'):
     }
 
 
-def get_sealed_products(headers):
+def build_sealed_products():
     """SEALED PRODUCTS UNDER $100 - Real eBay prices from reputable sellers (Nov 2024)"""
 
     products = [
@@ -331,6 +366,8 @@ def get_sealed_products(headers):
         '151': 'sv3pt5',               # Pokemon 151 (English)
     }
 
+    projections = get_hold_projections([product['name'] for product in products])
+
     # Add URLs and ROI to each product
     for product in products:
         product['tcgplayer_url'] = generate_product_tcgplayer_url(product['name'])
@@ -340,9 +377,17 @@ def get_sealed_products(headers):
 
         # Calculate REAL ROI based on actual card values
         set_id = set_id_map.get(product['set'], 'sv3pt5')
-        roi = calculate_product_roi(product, set_id)
+        roi = calculate_product_roi(product, set_id, projections.get(product['name']))
         product['roi'] = roi
 
+    return products
+
+
+def get_sealed_products(headers):
+    """Sealed products with ROI, best ROI first"""
+
+    products = build_sealed_products()
+
     # Sort by best ROI
     products.sort(key=lambda x: x['roi']['best_roi_percent'], reverse=True)
 
@@ -358,6 +403,106 @@ def get_sealed_products(headers):
     }
 
 
+def get_portfolio(event, headers):
+    """Best sealed product mix for a budget (bounded knapsack over product ROI)"""
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        budget = float(body.get('budget', 0))
+        caps = body.get('max_quantity', {})  # Optional - {product name: max units}
+        risk_aversion = float(body.get('risk_aversion', 0.0))
+
+        if budget <= 0 or not 0 <= risk_aversion <= 1:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'budget must be > 0 and risk_aversion between 0 and 1'})
+            }
+
+        portfolio = optimize_portfolio(build_sealed_products(), budget, caps, risk_aversion)
+        portfolio['last_updated'] = datetime.now().isoformat()
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps(portfolio)
+        }
+
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def get_completion_cost(event, headers):
+    """Cost to complete a set (or master set) from singles vs. opening boxes"""
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        set_id = body.get('set_id')
+        master = bool(body.get('master', False))  # Include reverse holo variants
+        owned = body.get('owned', [])  # Card IDs; reverse variants as '<id>:reverse'
+        product_type = product_type_of(body.get('product_type', 'Booster Box'))
+        box_price = float(body.get('box_price', PRODUCT_TYPES[product_type]['default_price']))
+        boxes = int(body.get('boxes', 10))
+        cheapest = int(body.get('cheapest', 10))
+
+        if not set_id:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'set_id required'})
+            }
+
+        catalog = get_set_cards(set_id)
+        if not catalog:
+            return {
+                'statusCode': 404,
+                'headers': headers,
+                'body': json.dumps({'error': f'No priced cards for {set_id}'})
+            }
+
+        index = CompletionIndex(collection_variants(catalog, master))
+        opening = simulate_completion(
+            catalog, pull_rate_table(set_id), set_id, master=master, owned_ids=owned,
+            packs_per_box=PRODUCT_TYPES[product_type]['packs'], box_price=box_price,
+            boxes=boxes, seed=body.get('seed')
+        )
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'set_id': set_id,
+                'master_set': master,
+                'variants': len(index.ids),
+                'owned': int(index.owned_mask(owned).sum()),
+                'singles': {
+                    'full_set_cost': round(index.total_cost, 2),
+                    'remaining_cost': round(index.remaining_cost(owned), 2),
+                    f'cheapest_{cheapest}_remaining_cost': round(index.cheapest_remaining(cheapest, owned), 2)
+                },
+                'opening': dict(opening, product_type=product_type),
+                'last_updated': datetime.now().isoformat()
+            })
+        }
+
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
 def get_all_cards(event, headers):
     """Return all cards from a set with search support (English only) - REAL API DATA"""
 
@@ -380,7 +525,7 @@ def get_all_cards(event, headers):
 
     # Fetch REAL cards from Pokemon TCG API
     print(f"Fetching cards from Pokemon TCG API for set: {set_id}")
-    all_cards = fetch_all_set_cards(set_id)
+    all_cards = get_set_cards(set_id)
     print(f"Fetched {len(all_cards)} cards from API")
 
     # FILTER: Only show high-value cards worth hunting for ($3+ minimum)
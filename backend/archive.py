@@ -0,0 +1,314 @@
+"""
+Hot/cold tiering of stored analyses.
+
+Analysis rows older than ARCHIVE_AFTER_DAYS are moved out of the table
+into compressed, date-partitioned archive objects, so the table (and the
+cost of scanning or backing it up) stops growing with history.
+
+For each set, old rows are grouped by the date in their sort key.
+Each group becomes one immutable object,
+    analyses/date=<YYYY-MM-DD>/<set_id>/<first ts>-<last ts>-<count>.bin
+holding the rows (summary attributes and encoded blob) as
+length-prefixed frames, zlib-compressed. The job then writes one small
+index item (pk='ARCHIVE#<set_id>', sk='DATE#<date>#<part>') and deletes
+the rows. Writing the object and index before deleting makes a rerun
+after a crash safe: the same rows map to the same object name.
+
+Reads fall back to the archive transparently: get_analysis uses the
+newest index item when a set has no hot rows, and exact-key lookups
+search the objects of the key's date. Objects are cached per container.
+
+Sets are listed from their LATEST pointers. Rows written before the
+stream processor existed have none; the first run should backfill them
+(`--backfill`, or 'backfill_pointers' in the Lambda event), see
+stream_processor.backfill_latest_pointers.
+
+Objects go to S3 (ARCHIVE_BACKEND=s3, ARCHIVE_BUCKET) or a local
+directory (ARCHIVE_BACKEND=local, ARCHIVE_DIR). Run the job with
+`python archive.py [days] [--backfill]` or the scheduled Lambda
+(lambda_handler).
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from decimal import Decimal
+
+from analysis_store import ANALYSIS_PK_PREFIX, LATEST_PK
+from storage import storage_from_env
+from stream_processor import backfill_latest_pointers
+
+ARCHIVE_PK_PREFIX = 'ARCHIVE#'
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.05
+# Archive objects kept in memory per container
+OBJECT_CACHE_SIZE = 32
+
+
+class LocalArchive:
+    """Archive objects as files under a directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def put(self, key, data):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def get(self, key):
+        with open(os.path.join(self.directory, key), 'rb') as f:
+            return f.read()
+
+
+class S3Archive:
+    """Archive objects in an S3 bucket"""
+
+    def __init__(self, bucket):
+        import boto3
+        self.bucket = bucket
+        self.s3 = boto3.client('s3')
+
+    def put(self, key, data):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def get(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+
+def archive_from_env():
+    """
+    Archive store for the configured backend: ARCHIVE_BACKEND is 's3'
+    (default, ARCHIVE_BUCKET) or 'local' (ARCHIVE_DIR). None when S3 is
+    selected but no bucket is configured.
+    """
+    if os.environ.get('ARCHIVE_BACKEND', 's3') == 'local':
+        return LocalArchive(os.environ.get('ARCHIVE_DIR', '/tmp/analysis-archive'))
+    bucket = os.environ.get('ARCHIVE_BUCKET')
+    return S3Archive(bucket) if bucket else None
+
+
+# --- object format ---
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Unserializable value {type(value).__name__}")
+
+
+def encode_rows(rows):
+    """Rows -> archive object bytes (length-prefixed header/blob frames, compressed)"""
+    frames = []
+    for row in rows:
+        blob = row.get('blob')
+        blob = b'' if blob is None else bytes(blob.value) if hasattr(blob, 'value') else bytes(blob)
+        header = json.dumps({k: v for k, v in row.items() if k != 'blob'},
+                            separators=(',', ':'), default=_plain).encode('utf-8')
+        frames.append(struct.pack('<II', len(header), len(blob)) + header + blob)
+    return zlib.compress(b''.join(frames), 6)
+
+
+def decode_rows(data):
+    """Archive object bytes -> rows, numbers as Decimal like table items"""
+    payload = zlib.decompress(data)
+    rows, position = [], 0
+    while position < len(payload):
+        header_length, blob_length = struct.unpack_from('<II', payload, position)
+        position += 8
+        row = json.loads(payload[position:position + header_length], parse_float=Decimal,
+                         parse_int=Decimal)
+        position += header_length
+        if blob_length:
+            row['blob'] = payload[position:position + blob_length]
+        position += blob_length
+        rows.append(row)
+    return rows
+
+
+def row_date(sk):
+    """Date partition of an analysis sort key ('TIMESTAMP#<iso time>')"""
+    return sk.split('#', 1)[1][:10]
+
+
+# --- archiving ---
+
+def _old_rows(table, set_id, cutoff):
+    """Every stored row of a set older than cutoff (epoch seconds)"""
+    kwargs = {
+        'IndexName': 'timestamp-index',
+        'KeyConditionExpression': 'pk = :pk AND #ts < :cutoff',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ExpressionAttributeValues': {':pk': f"{ANALYSIS_PK_PREFIX}{set_id}", ':cutoff': int(cutoff)}
+    }
+    rows = []
+    while True:
+        response = table.query(**kwargs)
+        rows.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return rows
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _archived_sets(table):
+    """Set IDs with stored analyses, from their LATEST pointers"""
+    kwargs = {
+        'KeyConditionExpression': 'pk = :pk',
+        'ExpressionAttributeValues': {':pk': LATEST_PK}
+    }
+    set_ids = []
+    while True:
+        response = table.query(**kwargs)
+        set_ids.extend(item['sk'][len('SET#'):] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return set_ids
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _delete_rows(table, rows):
+    """Delete rows with BatchWriteItem, retrying unprocessed keys"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        requests = [
+            {'DeleteRequest': {'Key': {'pk': row['pk'], 'sk': row['sk']}}}
+            for row in rows[start:start + BATCH_SIZE]
+        ]
+        for attempt in range(MAX_RETRIES + 1):
+            response = table.meta.client.batch_write_item(RequestItems={table.name: requests})
+            requests = response.get('UnprocessedItems', {}).get(table.name, [])
+            if not requests:
+                break
+            time.sleep(BACKOFF_BASE * (2 ** attempt))
+        else:
+            raise RuntimeError(f"Could not delete {len(requests)} archived rows")
+
+
+def archive_set(table, archive, set_id, cutoff):
+    """Archive one set's rows older than cutoff; returns rows archived"""
+    by_date = {}
+    for row in _old_rows(table, set_id, cutoff):
+        by_date.setdefault(row_date(row['sk']), []).append(row)
+
+    archived = 0
+    for date, rows in sorted(by_date.items()):
+        rows.sort(key=lambda row: row['sk'])
+        timestamps = [int(row['timestamp']) for row in rows]
+        part = f"{min(timestamps)}-{max(timestamps)}-{len(rows)}"
+        object_key = f"analyses/date={date}/{set_id}/{part}.bin"
+
+        archive.put(object_key, encode_rows(rows))
+        table.put_item(Item={
+            'pk': f"{ARCHIVE_PK_PREFIX}{set_id}",
+            'sk': f"DATE#{date}#{part}",
+            'object_key': object_key,
+            'count': len(rows),
+            'first_sk': rows[0]['sk'],
+            'last_sk': rows[-1]['sk'],
+            'timestamp': max(timestamps)
+        })
+        _delete_rows(table, rows)
+        archived += len(rows)
+    return archived
+
+
+def archive_analyses(table, archive, older_than_days=ARCHIVE_AFTER_DAYS, now=None,
+                     backfill=False):
+    """
+    Move every set's analyses older than older_than_days to the archive.
+    With backfill, sets without a LATEST pointer get one first.
+    """
+    if backfill:
+        backfill_latest_pointers(table)
+    cutoff = (now or time.time()) - older_than_days * 86400
+    # Whole days only, so a date partition is written in a single run
+    cutoff -= cutoff % 86400
+    results = {}
+    for set_id in _archived_sets(table):
+        try:
+            results[set_id] = archive_set(table, archive, set_id, cutoff)
+        except Exception as e:
+            print(f"Archive error for {set_id}: {str(e)}")
+            results[set_id] = {'error': str(e)}
+    return results
+
+
+# --- reads ---
+
+class ArchiveReader:
+    """Archived rows by key, with decoded objects cached per container"""
+
+    def __init__(self, table, archive, cache_size=OBJECT_CACHE_SIZE):
+        self.table = table
+        self.archive = archive
+        self.cache_size = cache_size
+        self._objects = OrderedDict()
+
+    def _rows(self, object_key):
+        if object_key in self._objects:
+            self._objects.move_to_end(object_key)
+            return self._objects[object_key]
+        rows = decode_rows(self.archive.get(object_key))
+        self._objects[object_key] = rows
+        if len(self._objects) > self.cache_size:
+            self._objects.popitem(last=False)
+        return rows
+
+    def _index(self, set_id, prefix='DATE#', newest_first=True, limit=None):
+        kwargs = {
+            'KeyConditionExpression': 'pk = :pk AND begins_with(sk, :prefix)',
+            'ExpressionAttributeValues': {':pk': f"{ARCHIVE_PK_PREFIX}{set_id}", ':prefix': prefix},
+            'ScanIndexForward': not newest_first
+        }
+        if limit:
+            kwargs['Limit'] = limit
+        return self.table.query(**kwargs).get('Items', [])
+
+    def latest(self, set_id):
+        """Newest archived row of a set, or None"""
+        index = self._index(set_id, limit=1)
+        if not index:
+            return None
+        return max(self._rows(index[0]['object_key']), key=lambda row: row['sk'])
+
+    def find(self, set_id, sk):
+        """Archived row with this key, or None"""
+        for entry in self._index(set_id, prefix=f"DATE#{row_date(sk)}#"):
+            if entry['first_sk'] <= sk <= entry['last_sk']:
+                for row in self._rows(entry['object_key']):
+                    if row['sk'] == sk:
+                        return row
+        return None
+
+
+def lambda_handler(event, context):
+    """Scheduled archive job"""
+    archive = archive_from_env()
+    if archive is None:
+        return {'error': 'ARCHIVE_BUCKET not configured'}
+    event = event or {}
+    days = int(event.get('older_than_days', ARCHIVE_AFTER_DAYS))
+    results = archive_analyses(storage_from_env(), archive, days,
+                               backfill=bool(event.get('backfill_pointers')))
+    print(f"Archived {sum(v for v in results.values() if isinstance(v, int))} rows "
+          f"across {len(results)} sets")
+    return results
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != '--backfill']
+    days = int(args[0]) if args else ARCHIVE_AFTER_DAYS
+    archive = archive_from_env()
+    if archive is None:
+        sys.exit('Set ARCHIVE_BUCKET, or ARCHIVE_BACKEND=local')
+    print(f"Archiving analyses older than {days} days...")
+    results = archive_analyses(storage_from_env(), archive, days,
+                               backfill='--backfill' in sys.argv[1:])
+    for set_id, result in results.items():
+        print(f"  {set_id}: {result}")
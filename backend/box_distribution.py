@@ -0,0 +1,168 @@
+"""
+Exact box-value distribution - convolves the slot-based pack model
+(pack_model.py) over cent-sized value buckets with FFTs.
+
+Cost depends on the value range of the set, not on a sample count, and
+results are deterministic, so they are cached per set price snapshot.
+Buckets widen past one cent when a set's box-value range would need more
+than MAX_BUCKETS of them, so an expensive chase card costs resolution
+rather than memory. The mean and standard deviation are computed exactly
+from the slots, not from the bucketed PMF.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from pack_model import build_pack_slots, pack_layout
+
+# Reported box-value percentiles (same as the simulator)
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Cached distributions - one per set price snapshot and box configuration
+MAX_CACHED_DISTRIBUTIONS = 16
+_distribution_cache = OrderedDict()
+
+# CDF tail beyond this is dropped from cached distributions
+TAIL_EPSILON = 1e-12
+
+# Most value buckets in one convolution (FFT time and memory scale with it)
+MAX_BUCKETS = 1 << 18
+
+
+def _fft_size(n):
+    """Smallest power of two >= n"""
+    return 1 << max(n - 1, 0).bit_length()
+
+
+def fit_bucket_cents(components, bucket_cents=1):
+    """
+    Bucket width in cents that keeps the sum of components - (slot, times)
+    pairs - within MAX_BUCKETS buckets, and at least bucket_cents
+    """
+    max_cents = sum(
+        float(slot['values'].max()) * 100 * times for slot, times in components
+        if slot['values'].size
+    )
+    return max(int(bucket_cents), int(np.ceil(max_cents / (MAX_BUCKETS - 1))))
+
+
+def slot_moments(slot):
+    """Mean and variance of one pull from a slot, in dollars"""
+    mean = float(slot['probs'] @ slot['values'])
+    return mean, float(slot['probs'] @ slot['values'] ** 2) - mean ** 2
+
+
+def slot_pmf(slot, bucket_cents=1):
+    """PMF of one pull from a slot over value buckets; bucket 0 holds the zero-value mass"""
+    buckets = np.rint(slot['values'] * 100 / bucket_cents).astype(np.int64)
+    size = int(buckets.max()) + 1 if buckets.size else 1
+    pmf = np.bincount(buckets, weights=slot['probs'], minlength=size)
+    pmf[0] += max(0.0, 1.0 - float(slot['probs'].sum()))
+    return pmf
+
+
+def sum_pmf(components):
+    """
+    PMF of a sum of independent pulls, by FFT convolution.
+    components is a list of (pmf, times) - times independent pulls of each pmf.
+    """
+    support = sum((len(pmf) - 1) * times for pmf, times in components) + 1
+    n = _fft_size(support)
+
+    spectrum = np.ones(n // 2 + 1, dtype=np.complex128)
+    for pmf, times in components:
+        spectrum *= np.fft.rfft(pmf, n) ** times
+
+    result = np.fft.irfft(spectrum, n)[:support]
+    np.clip(result, 0.0, None, out=result)
+    result /= result.sum()
+    return result
+
+
+def box_value_pmf(slots, packs_per_box, bucket_cents=1):
+    """
+    PMF of total box value: convolve slots into one pack, then the pack into
+    a box. bucket_cents should come from fit_bucket_cents.
+    """
+    pack = sum_pmf([(slot_pmf(slot, bucket_cents), slot['count']) for slot in slots])
+    return sum_pmf([(pack, packs_per_box)])
+
+
+def summarize_distribution(cdf, mean, std, bucket_cents, sealed_price):
+    """Percentiles and probability of loss from a box-value CDF"""
+    dollars = bucket_cents / 100
+    percentiles = {
+        f'p{p}': round(float(np.searchsorted(cdf, p / 100) * dollars), 2)
+        for p in PERCENTILES
+    }
+
+    # P(value < sealed_price): mass of every bucket strictly below the price
+    below = int(np.ceil(sealed_price / dollars)) - 1
+    if below < 0:
+        prob_loss = 0.0
+    else:
+        prob_loss = float(cdf[min(below, len(cdf) - 1)])
+
+    return {
+        'method': 'exact',
+        'bucket_cents': bucket_cents,
+        'mean': round(mean, 2),
+        'std': round(std, 2),
+        'percentiles': percentiles,
+        'prob_loss': round(prob_loss, 4)
+    }
+
+
+def price_snapshot_key(catalog, pull_rates):
+    """Stable hash of every input that affects a set's box distribution"""
+    snapshot = [
+        (card['id'], card['rarity_code'], card['price'], card.get('reverse_price'))
+        for card in catalog
+    ]
+    snapshot.sort(key=lambda entry: str(entry[0]))
+    payload = json.dumps([snapshot, list(pull_rates)], default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def exact_box_distribution(catalog, pull_rates, sealed_price, packs_per_box,
+                           set_id=None, min_card_value=0.0, cards_per_pack=None,
+                           bucket_cents=1):
+    """Exact box-value distribution summary, cached per set price snapshot"""
+
+    key = (set_id, packs_per_box, bucket_cents, min_card_value,
+           price_snapshot_key(catalog, pull_rates))
+
+    cached = _distribution_cache.get(key)
+    if cached is not None:
+        _distribution_cache.move_to_end(key)
+    else:
+        slots = build_pack_slots(catalog, pull_rates, pack_layout(set_id),
+                                 min_card_value, cards_per_pack)
+        width = fit_bucket_cents([(slot, slot['count'] * packs_per_box) for slot in slots],
+                                 bucket_cents)
+        pmf = box_value_pmf(slots, packs_per_box, width)
+
+        # Pulls are independent, so moments add over every pull of the box
+        mean, variance = 0.0, 0.0
+        for slot in slots:
+            slot_mean, slot_variance = slot_moments(slot)
+            mean += slot_mean * slot['count'] * packs_per_box
+            variance += slot_variance * slot['count'] * packs_per_box
+        std = float(np.sqrt(max(variance, 0.0)))
+
+        cdf = np.cumsum(pmf)
+        cdf = cdf[:int(np.searchsorted(cdf, 1.0 - TAIL_EPSILON)) + 1]
+
+        cached = (cdf, mean, std, width)
+        _distribution_cache[key] = cached
+        if len(_distribution_cache) > MAX_CACHED_DISTRIBUTIONS:
+            _distribution_cache.popitem(last=False)
+
+    cdf, mean, std, width = cached
+    summary = summarize_distribution(cdf, mean, std, width, sealed_price)
+    summary['packs_per_box'] = packs_per_box
+    summary['snapshot'] = key[-1][:12]
+    return summary
@@ -0,0 +1,173 @@
+"""
+Pull-rate calibration - turns submitted box-opening logs into per-set pull
+rates with Bayesian updates.
+
+Each set keeps running totals in one DynamoDB item (pk='PULL_CALIBRATION',
+sk='SET#<set_id>'): packs opened and hits per rarity code. A submission of
+any size is summarized locally and applied with one UpdateItem ADD, so
+cost is O(1) per submission and history is never reprocessed. Every
+submission bumps the item's version.
+
+The configured table is the prior, worth PRIOR_STRENGTH packs. Configured
+hit rates are per-pack marginals (they sum above 1), so each calibrated
+rarity gets the Beta marginal of a Dirichlet posterior: posterior mean
+(PRIOR_STRENGTH * prior + hits) / (PRIOR_STRENGTH + packs). Guaranteed
+slots (rate 1.0) and unpullable classes (rate 0) are not calibrated.
+
+Every submission also bumps the data snapshot version (result_cache.py).
+Containers reload all calibrations when they see a new version, so warm
+containers other than the one that took the submission stop using the
+old rates before they compute results under the new version.
+"""
+
+import math
+import time
+
+from rarity import (RARITY_NAMES, configured_pull_rate_table, rarity_code,
+                    set_calibrated_table)
+
+CALIBRATION_PK = 'PULL_CALIBRATION'
+
+# Pseudo-packs of weight given to the configured (community) rates
+PRIOR_STRENGTH = 500
+
+MAX_PACKS_PER_SUBMISSION = 100000
+
+# Data snapshot version the installed tables were loaded at
+_loaded = {'version': None}
+
+
+def calibrated_codes(prior):
+    """Rarity codes whose pull rate is calibrated (0 < rate < 1)"""
+    return [code for code, rate in enumerate(prior) if 0 < rate < 1]
+
+
+def summarize_logs(pack_logs):
+    """
+    Packs and hits per rarity code from pack logs. Each log is the list of
+    rarity strings pulled from the pack's hit slots (commons, uncommons and
+    reverse holos left out).
+    """
+    hits = {}
+    for pulls in pack_logs:
+        for rarity in pulls:
+            code = rarity_code(rarity)
+            hits[code] = hits.get(code, 0) + 1
+    return len(pack_logs), hits
+
+
+def posterior_rates(prior, packs, hits, strength=PRIOR_STRENGTH):
+    """Posterior mean rate per rarity code and its standard deviation"""
+    rates, stds = list(prior), [0.0] * len(prior)
+    for code in calibrated_codes(prior):
+        alpha = strength * prior[code] + hits.get(code, 0)
+        total = strength + packs
+        mean = alpha / total
+        rates[code] = mean
+        stds[code] = math.sqrt(mean * max(1 - mean, 0.0) / (total + 1))
+    return tuple(rates), tuple(stds)
+
+
+def _calibration(set_id, item):
+    """Posterior table from a stored calibration item"""
+    prior = configured_pull_rate_table(set_id)
+    packs = int(item.get('packs', 0))
+    hits = {
+        int(key[len('hits_'):]): int(value)
+        for key, value in item.items() if key.startswith('hits_')
+    }
+    if any(not 0 <= count <= packs for count in hits.values()):
+        raise ValueError(f"Stored hit counts outside 0-{packs} packs")
+    rates, stds = posterior_rates(prior, packs, hits)
+    return {
+        'set_id': set_id,
+        'version': int(item.get('version', 0)),
+        'packs': packs,
+        'rates': rates,
+        'stds': stds
+    }
+
+
+def record_openings(table, set_id, packs, hits):
+    """
+    Add one submission (packs opened, {rarity code: hits}) to a set's
+    totals, install the new posterior table and return it
+    """
+    if not 0 < packs <= MAX_PACKS_PER_SUBMISSION:
+        raise ValueError(f"packs must be between 1 and {MAX_PACKS_PER_SUBMISSION}")
+    prior = configured_pull_rate_table(set_id)
+    allowed = set(calibrated_codes(prior))
+    unknown = [RARITY_NAMES[code] for code in hits if code not in allowed]
+    if unknown:
+        raise ValueError(f"Rarities not calibrated from hit slots: {', '.join(unknown)}")
+    # Totals are added for good - a bad count would corrupt every later posterior
+    invalid = [RARITY_NAMES[code] for code, count in hits.items()
+               if isinstance(count, bool) or not isinstance(count, int) or not 0 <= count <= packs]
+    if invalid:
+        raise ValueError(f"Hit counts must be whole numbers from 0 to {packs}: "
+                         f"{', '.join(invalid)}")
+
+    adds = {f'hits_{code}': count for code, count in hits.items() if count}
+    names = {f'#h{i}': name for i, name in enumerate(adds)}
+    expression = ', '.join(
+        ['packs :packs', 'version :one'] + [f'#h{i} :h{i}' for i in range(len(adds))]
+    )
+    values = {':packs': packs, ':one': 1, ':ts': int(time.time()), ':set_id': set_id}
+    values.update({f':h{i}': count for i, count in enumerate(adds.values())})
+
+    response = table.update_item(
+        Key={'pk': CALIBRATION_PK, 'sk': f"SET#{set_id}"},
+        UpdateExpression=f"SET set_id = :set_id, #ts = :ts ADD {expression}",
+        ExpressionAttributeNames=dict(names, **{'#ts': 'timestamp'}),
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW'
+    )
+
+    calibration = _calibration(set_id, response['Attributes'])
+    set_calibrated_table(set_id, calibration['rates'], calibration['version'])
+    return calibration
+
+
+def load_calibrations(table):
+    """
+    Read every set's calibration and install the posterior tables. Returns
+    them by set, or None if they could not be read.
+    """
+    calibrations = {}
+    try:
+        kwargs = {
+            'KeyConditionExpression': 'pk = :pk',
+            'ExpressionAttributeValues': {':pk': CALIBRATION_PK}
+        }
+        while True:
+            response = table.query(**kwargs)
+            for item in response.get('Items', []):
+                # A corrupt item costs only its own set the calibration
+                try:
+                    calibration = _calibration(item['set_id'], item)
+                except Exception as e:
+                    print(f"Skipping calibration of {item.get('set_id')}: {str(e)}")
+                    continue
+                set_calibrated_table(item['set_id'], calibration['rates'], calibration['version'])
+                calibrations[item['set_id']] = calibration
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    except Exception as e:
+        print(f"Calibration load error: {str(e)}")
+        return None
+
+    return calibrations
+
+
+def refresh_calibrations(table, snapshot_version):
+    """
+    Reload the calibrations unless they were already loaded at this data
+    snapshot version. The version must be read before calling, so a bump
+    that lands during the reload is picked up on the next call.
+    """
+    if _loaded['version'] == snapshot_version:
+        return
+    if load_calibrations(table) is not None:
+        _loaded['version'] = snapshot_version
@@ -0,0 +1,222 @@
+"""
+Set completion calculator - what it costs to complete a set (or a master
+set with reverse holo variants) from singles, versus opening product.
+
+Variant prices are sorted once and prefix-summed, so the total cost, the
+cost of the cheapest N cards and the cost of the cheapest N cards still
+missing are prefix-sum lookups. Opening is evaluated two ways, both from
+the slot pack model:
+- simulation: collectors open boxes one at a time (all collectors at once
+  with NumPy), tracking owned variants, duplicates and the singles cost
+  of whatever is still missing after each box
+- exact: expected packs until every variant is pulled, from the
+  per-pack miss probability of each variant (coupon collector with
+  unequal probabilities). Variants no pack contains (promos) are
+  excluded and reported separately, priced as singles.
+"""
+
+import numpy as np
+
+from pack_model import build_pack_slots, pack_layout
+from simulator import alias_table, draw_categorical
+
+REVERSE_SUFFIX = ':reverse'
+
+DEFAULT_COLLECTORS = 1000
+MAX_COMPLETION_BOXES = 50
+
+# Exact expected packs is summed in chunks up to this many packs
+MAX_EXACT_PACKS = 2000000
+EXACT_CHUNK = 4096
+
+
+def collection_variants(catalog, master=False):
+    """
+    Collectible variants as (variant_id, catalog_index, price, slot_price_field).
+    Master sets add a reverse holo variant for every card that has one.
+    """
+    variants = [(card['id'], i, card['price'], 'price') for i, card in enumerate(catalog)]
+    if master:
+        variants += [
+            (card['id'] + REVERSE_SUFFIX, i, card['reverse_price'], 'reverse_price')
+            for i, card in enumerate(catalog) if card.get('reverse_price')
+        ]
+    return variants
+
+
+class CompletionIndex:
+    """Price-sorted variants with prefix sums for instant cost queries"""
+
+    def __init__(self, variants):
+        order = sorted(range(len(variants)), key=lambda v: (variants[v][2], variants[v][0]))
+        self.ids = [variants[v][0] for v in order]
+        self.prices = np.array([variants[v][2] for v in order], dtype=np.float64)
+        self.position = {variant_id: pos for pos, variant_id in enumerate(self.ids)}
+        self.prefix = np.concatenate([[0.0], np.cumsum(self.prices)])
+
+    @property
+    def total_cost(self):
+        return float(self.prefix[-1])
+
+    def cheapest(self, n):
+        """Cost of the n cheapest variants"""
+        return float(self.prefix[min(max(n, 0), len(self.ids))])
+
+    def owned_mask(self, owned_ids):
+        owned = np.zeros(len(self.ids), dtype=bool)
+        positions = [self.position[v] for v in owned_ids if v in self.position]
+        owned[positions] = True
+        return owned
+
+    def remaining_cost(self, owned_ids=()):
+        """Singles cost of every variant not yet owned"""
+        owned = self.owned_mask(owned_ids)
+        return self.total_cost - float(self.prices[owned].sum())
+
+    def cheapest_remaining(self, n, owned_ids=()):
+        """Cost of the n cheapest variants not yet owned"""
+        if n <= 0:
+            return 0.0
+        owned = self.owned_mask(owned_ids)
+        missing_count = np.cumsum(~owned)
+        # Smallest prefix that holds n missing variants
+        end = int(np.searchsorted(missing_count, n, side='left')) + 1
+        end = min(end, len(self.ids))
+        owned_prefix = float(self.prices[:end][owned[:end]].sum())
+        return float(self.prefix[end]) - owned_prefix
+
+
+def variant_slots(catalog, variants, pull_rates, layout):
+    """
+    Pack slots over variant positions: per slot, (count, outcome
+    probabilities, outcome -> variant index or -1 if not collected)
+    """
+    variant_of = {(index, field): v for v, (_, index, _, field) in enumerate(variants)}
+    slots = []
+    for slot in build_pack_slots(catalog, pull_rates, layout):
+        outcomes = [variant_of.get((int(i), slot['price']), -1) for i in slot['indices']]
+        probs = slot['probs']
+        empty = max(0.0, 1.0 - float(probs.sum()))
+        if empty > 1e-12:
+            probs = np.append(probs, empty)
+            outcomes.append(-1)
+        slots.append((slot['count'], probs, np.array(outcomes, dtype=np.int64)))
+    return slots
+
+
+def pack_miss_logs(slots, n_variants):
+    """log of the probability that one pack misses each variant (0 if unpullable)"""
+    log_miss = np.zeros(n_variants)
+    for count, probs, outcomes in slots:
+        per_variant = np.bincount(outcomes[outcomes >= 0], weights=probs[outcomes >= 0],
+                                  minlength=n_variants)
+        log_miss += count * np.log1p(-np.minimum(per_variant, 1.0))
+    return log_miss
+
+
+def expected_packs_to_complete(slots, needed):
+    """
+    Exact expected number of packs until every pullable needed variant
+    (boolean mask) has been pulled: E[T] = sum over t >= 0 of P(T > t),
+    with P(T > t) = 1 - prod_i (1 - q_i^t) and q_i the probability that a
+    pack misses variant i. Variants no pack can contain (promos, pull rate
+    0) are left out - see unpullable. None if the expectation exceeds
+    MAX_EXACT_PACKS.
+    """
+    log_miss = pack_miss_logs(slots, len(needed))
+    log_miss = log_miss[needed & (log_miss < 0)]
+    if not len(log_miss):
+        return 0.0
+
+    expected = 0.0
+    for start in range(0, MAX_EXACT_PACKS, EXACT_CHUNK):
+        t = np.arange(start, start + EXACT_CHUNK)[:, None]
+        # log P(all pulled by t) = sum_i log(1 - q_i^t)
+        with np.errstate(divide='ignore'):
+            log_done = np.log1p(-np.exp(t * log_miss[None, :])).sum(axis=1)
+        tail = -np.expm1(log_done)
+        expected += float(tail.sum())
+        if tail[-1] < 1e-9:
+            return expected
+    return None
+
+
+def unpullable(slots, needed):
+    """Mask of needed variants that no pack can contain"""
+    return needed & (pack_miss_logs(slots, len(needed)) == 0)
+
+
+def simulate_completion(catalog, pull_rates, set_id=None, master=False, owned_ids=(),
+                        packs_per_box=36, box_price=0.0, boxes=10,
+                        n_collectors=DEFAULT_COLLECTORS, seed=None):
+    """
+    Open up to `boxes` boxes for n_collectors collectors at once. Reports,
+    after each box, completion, duplicates and the cost of buying the rest
+    as singles, and the box count that minimizes total cost.
+    """
+    if not 1 <= boxes <= MAX_COMPLETION_BOXES:
+        raise ValueError(f"boxes must be between 1 and {MAX_COMPLETION_BOXES}")
+
+    rng = np.random.default_rng(seed)
+    variants = collection_variants(catalog, master)
+    prices = np.array([v[2] for v in variants], dtype=np.float64)
+    slots = variant_slots(catalog, variants, pull_rates, pack_layout(set_id))
+
+    owned_start = np.zeros(len(variants), dtype=bool)
+    owned_set = set(owned_ids)
+    owned_start[[v for v, variant in enumerate(variants) if variant[0] in owned_set]] = True
+
+    # pulls[c, v]: copies of variant v pulled by collector c
+    n_variants = len(variants)
+    pulls = np.zeros((n_collectors, n_variants), dtype=np.int64)
+    tables = [(count, alias_table(probs), outcomes) for count, probs, outcomes in slots]
+    rows = np.arange(n_collectors)
+
+    per_box = []
+    for box in range(1, boxes + 1):
+        for count, table, outcomes in tables:
+            n_draws = packs_per_box * count
+            drawn = outcomes[draw_categorical(table, n_collectors * n_draws, rng)]
+            cells = np.repeat(rows * n_variants, n_draws) + drawn
+            pulls += np.bincount(cells[drawn >= 0], minlength=pulls.size).reshape(pulls.shape)
+
+        have = (pulls > 0) | owned_start
+        missing_cost = ((~have) * prices).sum(axis=1)
+        # Copies beyond the first one needed (everything pulled of an owned variant)
+        duplicates = pulls - ((pulls > 0) & ~owned_start)
+        duplicate_value = (duplicates * prices).sum(axis=1)
+        spent = box * box_price
+
+        per_box.append({
+            'boxes': box,
+            'completion_percent': round(float(have.mean()) * 100, 2),
+            'prob_complete': round(float(have.all(axis=1).mean()), 4),
+            'missing_singles_cost': round(float(missing_cost.mean()), 2),
+            'duplicates': round(float(duplicates.sum(axis=1).mean()), 1),
+            'duplicate_value': round(float(duplicate_value.mean()), 2),
+            'total_cost': round(spent + float(missing_cost.mean()), 2),
+            'net_cost_selling_duplicates': round(
+                spent + float(missing_cost.mean()) - float(duplicate_value.mean()), 2)
+        })
+
+    expected_packs = expected_packs_to_complete(slots, ~owned_start)
+    # Promos and other variants packs never contain can only be bought
+    singles_only = unpullable(slots, ~owned_start)
+    singles_only_cost = float(prices[singles_only].sum())
+    best = min(per_box, key=lambda row: row['total_cost'])
+    return {
+        'collectors_simulated': n_collectors,
+        'packs_per_box': packs_per_box,
+        'box_price': box_price,
+        'by_box': per_box,
+        'best_boxes_then_singles': best,
+        'expected_boxes_to_complete': (
+            round(expected_packs / packs_per_box, 1) if expected_packs is not None else None
+        ),
+        'expected_cost_to_complete_by_opening': (
+            round(expected_packs / packs_per_box * box_price + singles_only_cost, 2)
+            if expected_packs is not None else None
+        ),
+        'unpullable_variants': [variants[v][0] for v in np.flatnonzero(singles_only)],
+        'unpullable_singles_cost': round(singles_only_cost, 2)
+    }
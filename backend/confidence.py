@@ -0,0 +1,101 @@
+"""
+Bootstrap confidence - how uncertain a set's EV is, given the spread of
+TCGPlayer prices and pull rates.
+
+Each replicate redraws every card price within its observed low/high band
+(median at the market price) and scales each rarity's hit-slot pull rate
+by up to +-PULL_RATE_TOLERANCE. Pulls are weighted by the slot-based pack
+model, like the EV itself. The EV spread across replicates gives the
+confidence interval and score. All replicates are computed as one
+(replicates x pulls) NumPy array.
+"""
+
+import numpy as np
+
+from ev_engine import MIN_CARD_VALUE, PACKS_PER_BOX
+from pack_model import build_pack_slots, pack_layout
+from rarity import RARITY_NAMES, pull_rate_table
+
+BOOTSTRAP_SAMPLES = 2000
+DEFAULT_SEED = 0
+
+# Relative uncertainty of community pull rates
+PULL_RATE_TOLERANCE = 0.20
+
+# Band used for cards without low/high prices: market -+ this fraction
+DEFAULT_PRICE_BAND = 0.25
+
+# Observed bands are clipped to [market / BAND_CLIP, market * BAND_CLIP] so a
+# single outlier listing cannot dominate the spread
+BAND_CLIP = 3.0
+
+
+def price_bands(catalog):
+    """Market, low and high price arrays for every card of the catalog"""
+    market = np.array([card['price'] for card in catalog], dtype=np.float64)
+    low = np.array([card.get('price_low') or np.nan for card in catalog], dtype=np.float64)
+    high = np.array([card.get('price_high') or np.nan for card in catalog], dtype=np.float64)
+
+    low = np.where(np.isnan(low), market * (1 - DEFAULT_PRICE_BAND), low)
+    high = np.where(np.isnan(high), market * (1 + DEFAULT_PRICE_BAND), high)
+    low = np.clip(low, market / BAND_CLIP, market)
+    high = np.clip(high, market, market * BAND_CLIP)
+    return market, low, high
+
+
+def bootstrap_ev(catalog, set_id, packs=PACKS_PER_BOX, n_samples=BOOTSTRAP_SAMPLES,
+                 seed=DEFAULT_SEED, pull_rate_tolerance=PULL_RATE_TOLERANCE):
+    """EV of n_samples bootstrap replicates of the set's prices and pull rates"""
+    rng = np.random.default_rng(seed)
+    slots = build_pack_slots(catalog, pull_rate_table(set_id), pack_layout(set_id),
+                             MIN_CARD_VALUE)
+    if not sum(len(slot['indices']) for slot in slots):
+        return np.zeros(n_samples)
+
+    # One entry per counted (card, slot) pull: value, expected copies per pack
+    cards = np.concatenate([slot['indices'] for slot in slots])
+    values = np.concatenate([slot['values'] for slot in slots])
+    rates = np.concatenate([slot['probs'] * slot['count'] for slot in slots])
+    rated = np.concatenate([np.full(len(slot['indices']), slot['rated']) for slot in slots])
+    codes = np.array([catalog[i]['rarity_code'] for i in cards], dtype=np.int64)
+
+    # Price: half the draws uniform in [low, market], half in [market, high];
+    # a card's reverse-holo value moves with its market price
+    market, low, high = price_bands(catalog)
+    u = rng.random((n_samples, len(market)))
+    below = u < 0.5
+    fraction = np.where(below, u * 2, u * 2 - 1)
+    prices = np.where(below,
+                      low + (market - low) * fraction,
+                      market + (high - market) * fraction)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = np.where(market > 0, prices / market, 1.0)
+
+    # Pull rates: per-rarity scale of the hit slot; guaranteed slots stay fixed
+    scale = 1 + pull_rate_tolerance * (2 * rng.random((n_samples, len(RARITY_NAMES))) - 1)
+    sampled_rates = np.where(rated, rates * scale[:, codes], rates)
+
+    return (values * factors[:, cards] * sampled_rates).sum(axis=1) * packs
+
+
+def confidence_from_samples(ev_samples, sealed_price=None):
+    """
+    Confidence score (1-100) and 90% EV interval from bootstrap replicates.
+    The score is 100 minus the interval half-width as a percent of the
+    median EV.
+    """
+    p5, p50, p95 = np.percentile(ev_samples, [5, 50, 95])
+    relative_spread = (p95 - p5) / (2 * p50) if p50 > 0 else 1.0
+    score = int(np.clip(round(100 * (1 - relative_spread)), 1, 100))
+
+    confidence = {
+        'score': score,
+        'ev_interval_90': {'low': round(float(p5), 2), 'median': round(float(p50), 2),
+                           'high': round(float(p95), 2)},
+        'ev_std': round(float(ev_samples.std()), 2),
+        'relative_spread': round(float(relative_spread), 4),
+        'bootstrap_samples': len(ev_samples)
+    }
+    if sealed_price:
+        confidence['prob_open_beats_sealed'] = round(float((ev_samples > sealed_price).mean()), 4)
+    return confidence
@@ -0,0 +1,217 @@
+"""
+Incremental EV aggregate - keeps a set/product EV current under single-card
+price updates without rerunning the full EV calculation.
+
+Cards are weighted by the slot-based pack model, like the EV engine. A
+card's expected copies per pack depend only on its rarity and the price
+field it is valued at (market or reverse holo), so value sums are kept per
+(rarity code, price field) in integer cents and the EV total is exact
+after any number of updates. Top contributors live in a lazy-deletion
+max-heap: an update pushes one entry and stale entries are skipped when
+read.
+"""
+
+import heapq
+
+from pack_model import card_rates, card_value, pack_layout
+from product_types import fixed_value
+
+# Heap is rebuilt once stale entries outnumber live ones by this factor
+HEAP_COMPACT_FACTOR = 2
+
+# Live aggregates per (set_id, product_type), plus set_id -> product types
+_aggregates = {}
+_products_by_set = {}
+
+
+def _cents(price):
+    return int(round((price or 0.0) * 100))
+
+
+class IncrementalEV:
+    """EV of one product of a set, maintained under price updates"""
+
+    def __init__(self, catalog, pull_rates, packs, min_card_value=0.0, layout=None,
+                 fixed_value=0.0):
+        self.pull_rates = pull_rates
+        self.packs = packs
+        self.fixed_value = fixed_value
+        self.min_cents = _cents(min_card_value)
+        self.total_cards = len(catalog)
+        # Data version the aggregate was built at, set by register_aggregate
+        self.version = None
+
+        self.cards = {}
+        self.rates = {}
+        self.rarity_counts = {}
+        self.rarity_cents = {}
+        self.term_rates = {}
+        self.term_cents = {}
+        self._heap = []
+        self._versions = {}
+
+        for card, card_rate in zip(catalog, card_rates(catalog, pull_rates, layout or pack_layout())):
+            self.cards[card['id']] = dict(card)
+            self.rates[card['id']] = card_rate
+            self._versions[card['id']] = 0
+            for price_field, rate in card_rate.items():
+                self.term_rates[(card['rarity_code'], price_field)] = rate
+            self._add(self.cards[card['id']], 1)
+            self._push(self.cards[card['id']])
+
+    def _terms(self, card):
+        """(rarity code, price field) -> counted value in cents, for one card"""
+        terms = {}
+        for price_field in self.rates[card['id']]:
+            cents = _cents(card_value(card, price_field))
+            if self._is_counted(cents):
+                terms[(card['rarity_code'], price_field)] = cents
+        return terms
+
+    def _add(self, card, sign):
+        """Add (sign=1) or remove (sign=-1) one card's counted values"""
+        for key, cents in self._terms(card).items():
+            self.term_cents[key] = self.term_cents.get(key, 0) + sign * cents
+        cents = _cents(card['price'])
+        if self._is_counted(cents):
+            rarity = card['rarity']
+            self.rarity_counts[rarity] = self.rarity_counts.get(rarity, 0) + sign
+            self.rarity_cents[rarity] = self.rarity_cents.get(rarity, 0) + sign * cents
+
+    def _push(self, card):
+        contribution = self._contribution(card)
+        if contribution > 0:
+            heapq.heappush(self._heap, (-contribution, card['id'], self._versions[card['id']]))
+
+    def _contribution(self, card):
+        return sum(
+            cents * self.term_rates[key] for key, cents in self._terms(card).items()
+        ) * self.packs / 100
+
+    def _is_counted(self, cents):
+        return cents >= self.min_cents
+
+    def apply_price_update(self, card_id, new_price):
+        """Update one card's price; O(log n). Returns the new EV total"""
+        card = self.cards.get(card_id)
+        if card is None:
+            raise KeyError(f"Unknown card {card_id}")
+
+        self._add(card, -1)
+        card['price'] = new_price
+        self._add(card, 1)
+
+        self._versions[card_id] += 1
+        self._push(card)
+
+        if len(self._heap) > HEAP_COMPACT_FACTOR * len(self.cards) + 64:
+            self._compact()
+
+        return self.ev_total
+
+    def _compact(self):
+        """Drop stale heap entries"""
+        self._heap = [
+            entry for entry in self._heap
+            if entry[2] == self._versions[entry[1]]
+        ]
+        heapq.heapify(self._heap)
+
+    @property
+    def ev_total(self):
+        """EV of the product, packs plus guaranteed contents - O(number of rarities)"""
+        total_cents = sum(
+            cents * self.term_rates[key] for key, cents in self.term_cents.items()
+        )
+        return total_cents * self.packs / 100 + self.fixed_value
+
+    def rarity_breakdown(self):
+        """Count and total value of counted cards per rarity"""
+        return {
+            rarity: {'count': count, 'total_value': round(self.rarity_cents[rarity] / 100, 2)}
+            for rarity, count in self.rarity_counts.items() if count
+        }
+
+    def top_contributors(self, k=20):
+        """Top k cards by EV contribution; O(k log n)"""
+        live = []
+        while self._heap and len(live) < k:
+            entry = heapq.heappop(self._heap)
+            if entry[2] == self._versions[entry[1]]:
+                live.append(entry)
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+
+        top = []
+        for neg_contribution, card_id, _ in live:
+            card = self.cards[card_id]
+            top.append({
+                'name': card['name'],
+                'rarity': card['rarity'],
+                'price': round(card['price'], 2),
+                'pull_rate': round(self.rates[card_id].get('price', 0.0), 6),
+                'ev_contribution': round(-neg_contribution, 2),
+                'set_number': card.get('number'),
+                'image': card.get('image')
+            })
+        return top
+
+    def snapshot(self, k=20):
+        """EV data in the same shape as calculate_expected_value"""
+        return {
+            'ev_total': round(self.ev_total, 2),
+            'top_cards': self.top_contributors(k),
+            'rarity_breakdown': self.rarity_breakdown(),
+            'total_cards_analyzed': self.total_cards,
+            'valuable_cards_count': sum(self.rarity_counts.values()),
+            'api_source': 'pokemontcg.io'
+        }
+
+
+def data_version(snapshot_version, catalog):
+    """
+    Version of the data an aggregate is built from: the snapshot version
+    (pull rates, pushed prices) and the card prices of the catalog
+    """
+    return (snapshot_version, hash(tuple(
+        (card['id'], card['price'], card.get('reverse_price')) for card in catalog
+    )))
+
+
+def register_aggregate(set_id, product_type, catalog, pull_rates, packs, min_card_value=0.0,
+                       version=None):
+    """
+    Build and register the aggregate for one product of a set. The
+    registered aggregate is kept when it was built at the same data
+    version; without a version it is always rebuilt
+    """
+    current = _aggregates.get((set_id, product_type))
+    if version is not None and current is not None and current.version == version:
+        return current
+
+    aggregate = IncrementalEV(catalog, pull_rates, packs, min_card_value, pack_layout(set_id),
+                              fixed_value(product_type))
+    aggregate.version = version
+    _aggregates[(set_id, product_type)] = aggregate
+    _products_by_set.setdefault(set_id, set()).add(product_type)
+    return aggregate
+
+
+def get_aggregate(set_id, product_type):
+    """Registered aggregate for a product, or None"""
+    return _aggregates.get((set_id, product_type))
+
+
+def apply_price_updates(set_id, updates):
+    """
+    Apply a batch of (card_id, new_price) updates to every registered
+    product of a set. Returns {product_type: ev_total}.
+    """
+    results = {}
+    for product_type in _products_by_set.get(set_id, ()):
+        aggregate = _aggregates[(set_id, product_type)]
+        for card_id, new_price in updates:
+            if card_id in aggregate.cards:
+                aggregate.apply_price_update(card_id, new_price)
+        results[product_type] = round(aggregate.ev_total, 2)
+    return results
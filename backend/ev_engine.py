@@ -0,0 +1,171 @@
+"""
+EV engine - expected value of opening packs from a priced card catalog.
+
+Catalogs are lists of card dicts with at least 'id', 'name', 'number',
+'rarity', 'rarity_code', 'price' and 'image' - as produced by
+pokemon_api.fetch_all_set_cards or app-full's hydrate_cards.
+
+Cards are weighted by the slot-based pack model (pack_model.py): a card's
+pull rate is its expected copies per pack, so a rarity's rate is shared by
+its cards and reverse-holo slots count at the reverse price. The EV is the
+mean of the simulated and exact box distributions.
+"""
+
+import heapq
+from typing import Dict, List, Optional
+
+from pack_model import card_rates, card_value, pack_layout
+from product_types import PRODUCT_TYPES, fixed_value, product_ev
+from rarity import pull_rate_table
+
+# Minimum card value to include in EV calculation
+MIN_CARD_VALUE = 0.40
+
+# Default and largest number of top EV contributors returned
+TOP_CARDS = 20
+MAX_TOP_CARDS = 500
+
+# Standard booster box configuration
+PACKS_PER_BOX = 36
+CARDS_PER_PACK = 10
+
+
+def _card_entry(card: Dict, pull_rate: float, ev_contribution: float) -> Dict:
+    """Card breakdown entry for the EV response"""
+    return {
+        'name': card['name'],
+        'rarity': card['rarity'],
+        'price': round(card['price'], 2),
+        'pull_rate': round(pull_rate, 6),
+        'ev_contribution': round(ev_contribution, 2),
+        'set_number': card['number'],
+        'image': card['image']
+    }
+
+
+def card_ev(card: Dict, rates: Dict, min_card_value: float = MIN_CARD_VALUE) -> float:
+    """EV per pack of one card from its card_rates entry"""
+    total = 0.0
+    for price_field, rate in rates.items():
+        value = card_value(card, price_field)
+        if value >= min_card_value:
+            total += value * rate
+    return total
+
+
+def calculate_expected_value(catalog: List[Dict], set_id: str, top_k: int = TOP_CARDS,
+                             min_price: Optional[float] = None,
+                             packs: int = PACKS_PER_BOX) -> Dict:
+    """
+    Calculate expected value of opening `packs` packs.
+    top_k contributors are selected with a bounded min-heap (O(n log k),
+    independent of card order). If min_price is given, every card worth at
+    least that much is also listed under 'cards_over_price'.
+    """
+
+    rates = card_rates(catalog, pull_rate_table(set_id), pack_layout(set_id))
+    ev_total = 0.0
+    rarity_stats = {}
+    contributions = []
+    top_heap = []  # min-heap of (ev_contribution, card_id, position)
+    over_price = []
+
+    for position, card in enumerate(catalog):
+        price = card['price']
+        rarity = card['rarity']
+        pull_rate = rates[position].get('price', 0.0)
+
+        # Calculate contribution to EV - every slot the card can be pulled in,
+        # so a cheap card can still count at its reverse-holo price
+        ev_contribution = card_ev(card, rates[position]) * packs
+        if price < MIN_CARD_VALUE and ev_contribution <= 0:
+            continue
+        ev_total += ev_contribution
+        contributions.append((ev_contribution, price))
+
+        # Track stats
+        if price >= MIN_CARD_VALUE:
+            if rarity not in rarity_stats:
+                rarity_stats[rarity] = {'count': 0, 'total_value': 0}
+            rarity_stats[rarity]['count'] += 1
+            rarity_stats[rarity]['total_value'] += price
+
+        # Keep the top_k contributors; card ID breaks ties
+        entry = (ev_contribution, str(card['id']), position)
+        if len(top_heap) < top_k:
+            heapq.heappush(top_heap, entry)
+        elif top_heap and entry > top_heap[0]:
+            heapq.heappushpop(top_heap, entry)
+
+        if min_price is not None and price >= min_price:
+            over_price.append((price, str(card['id']), position, pull_rate, ev_contribution))
+
+    top_cards = []
+    for ev_contribution, _, position in sorted(top_heap, reverse=True):
+        card = catalog[position]
+        top_cards.append(_card_entry(card, rates[position].get('price', 0.0), ev_contribution))
+
+    # Significant contributors (>=5% of the final EV) or high-value cards
+    valuable_cards_count = sum(
+        1 for ev_contribution, price in contributions
+        if ev_contribution >= ev_total * 0.05 or price >= 10
+    )
+
+    ev_data = {
+        'ev_total': round(ev_total, 2),
+        'top_cards': top_cards,
+        'rarity_breakdown': rarity_stats,
+        'total_cards_analyzed': len(catalog),
+        'valuable_cards_count': valuable_cards_count,
+        'packs': packs,
+        'api_source': 'pokemontcg.io'
+    }
+
+    if min_price is not None:
+        over_price.sort(reverse=True)
+        ev_data['cards_over_price'] = {
+            'min_price': min_price,
+            'cards': [
+                _card_entry(catalog[position], pull_rate, ev_contribution)
+                for _, _, position, pull_rate, ev_contribution in over_price
+            ]
+        }
+
+    return ev_data
+
+
+def ev_per_pack(catalog: List[Dict], set_id: str) -> float:
+    """Expected value of a single pack"""
+    return calculate_expected_value(catalog, set_id, top_k=0)['ev_total'] / PACKS_PER_BOX
+
+
+def product_expected_value(ev_data: Dict, product_type: str) -> Dict:
+    """
+    EV data of one product type, rescaled from a set's EV data without
+    touching the catalog: pack contributions scale with the pack count and
+    the product's guaranteed promos and extras are added on top.
+    """
+    packs = PRODUCT_TYPES[product_type]['packs']
+    scale = packs / ev_data['packs']
+
+    def scaled(entries):
+        return [dict(e, ev_contribution=round(e['ev_contribution'] * scale, 2)) for e in entries]
+
+    product_data = dict(
+        ev_data,
+        ev_total=round(ev_data['ev_total'] * scale + fixed_value(product_type), 2),
+        top_cards=scaled(ev_data['top_cards']),
+        packs=packs,
+        product=product_ev(ev_data['ev_total'] / ev_data['packs'], product_type)
+    )
+    if 'cards_over_price' in ev_data:
+        product_data['cards_over_price'] = dict(
+            ev_data['cards_over_price'], cards=scaled(ev_data['cards_over_price']['cards'])
+        )
+    return product_data
+
+
+def price_set_products(ev_data: Dict) -> Dict:
+    """EV of every product type of a set from one EV computation"""
+    per_pack = ev_data['ev_total'] / ev_data['packs']
+    return {name: product_ev(per_pack, name) for name in PRODUCT_TYPES}
@@ -0,0 +1,119 @@
+"""
+Materialized EV-per-pack table - per-set EV computed from live catalogs by
+the EV engine and stored in DynamoDB under its own partition key.
+
+Handlers load the whole table into an in-process cache at init, so a
+lookup costs the same as the old hard-coded dict. Run this module to
+rebuild every set in parallel:
+
+    python ev_table.py [set_id ...]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from ev_engine import ev_per_pack
+from pokemon_api import fetch_all_set_cards, set_api_key
+from storage import storage_from_env
+
+EV_TABLE_PK = 'EV_TABLE'
+
+# Used for sets missing from the table (never refreshed, or table unreachable)
+DEFAULT_EV_PER_PACK = 4.50
+
+# Sets rebuilt when no set IDs are given (English Scarlet & Violet sets)
+DEFAULT_SET_IDS = ('sv08', 'sv07', 'sv06.5', 'sv06', 'sv04.5', 'sv03', 'sv3pt5')
+
+MAX_REFRESH_WORKERS = 8
+
+
+def get_table():
+    """Analytics table holding the EV table rows (backend per STORAGE_BACKEND)"""
+    return storage_from_env()
+
+
+def load_ev_table(table=None):
+    """Read every EV_TABLE row into {set_id: entry}"""
+    entries = {}
+    try:
+        table = table or get_table()
+        kwargs = {
+            'KeyConditionExpression': 'pk = :pk',
+            'ExpressionAttributeValues': {':pk': EV_TABLE_PK}
+        }
+        while True:
+            response = table.query(**kwargs)
+            for item in response.get('Items', []):
+                entries[item['set_id']] = {
+                    'ev_per_pack': float(item['ev_per_pack']),
+                    'version': int(item.get('version', 0)),
+                    'timestamp': int(item.get('timestamp', 0))
+                }
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    except Exception as e:
+        print(f"EV table load error: {str(e)}")
+
+    return entries
+
+
+def refresh_set(table, set_id):
+    """Recompute one set's EV per pack from its live catalog and store it"""
+    catalog = fetch_all_set_cards(set_id)
+    if not catalog:
+        raise ValueError(f"No priced cards fetched for {set_id}")
+
+    value = ev_per_pack(catalog, set_id)
+    response = table.update_item(
+        Key={'pk': EV_TABLE_PK, 'sk': f"SET#{set_id}"},
+        UpdateExpression='SET set_id = :set_id, ev_per_pack = :ev, cards_priced = :cards, '
+                         '#ts = :ts ADD version :one',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues={
+            ':set_id': set_id,
+            ':ev': Decimal(str(round(value, 4))),
+            ':cards': len(catalog),
+            ':ts': int(time.time()),
+            ':one': 1
+        },
+        ReturnValues='UPDATED_NEW'
+    )
+    return {
+        'set_id': set_id,
+        'ev_per_pack': round(value, 4),
+        'version': int(response['Attributes']['version'])
+    }
+
+
+def refresh_ev_table(table, set_ids=DEFAULT_SET_IDS):
+    """Rebuild the EV table for many sets in parallel"""
+
+    def refresh(set_id):
+        try:
+            return refresh_set(table, set_id)
+        except Exception as e:
+            print(f"EV refresh error for {set_id}: {str(e)}")
+            return {'set_id': set_id, 'error': str(e)}
+
+    workers = max(1, min(MAX_REFRESH_WORKERS, len(set_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(refresh, set_ids))
+
+
+if __name__ == "__main__":
+    api_key = os.environ.get('POKEMON_TCG_API_KEY')
+    if api_key:
+        set_api_key(api_key)
+
+    set_ids = sys.argv[1:] or DEFAULT_SET_IDS
+    print(f"Refreshing EV table for {len(set_ids)} sets...")
+    for result in refresh_ev_table(get_table(), set_ids):
+        if 'error' in result:
+            print(f"  {result['set_id']}: FAILED ({result['error']})")
+        else:
+            print(f"  {result['set_id']}: ${result['ev_per_pack']} per pack (v{result['version']})")
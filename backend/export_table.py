@@ -0,0 +1,364 @@
+"""
+Export stored analyses for offline study.
+
+A full export scans the table with TotalSegments parallel workers (one
+Segment each), filtered to ANALYSIS# rows and projected to the export
+columns. Workers hand pages to the writer through a bounded queue, so
+memory stays at a few pages however large the table is. An incremental
+export (--since, or the high-water mark kept in --state) skips the scan:
+it lists the sets from their LATEST pointers and queries each set's
+timestamp-index partition for newer rows, in parallel. Rows in the
+boundary second can repeat across incremental exports; (set_id, sk)
+identifies a row. Sets stored before the stream processor existed have
+no pointer; --backfill-pointers creates them first (see
+stream_processor.backfill_latest_pointers).
+
+Formats:
+  csv      - one header row, one line per analysis
+  ndjson   - one JSON object per line (--include-data adds the decoded analysis)
+  columns  - typed binary columns in row groups, readable with read_columns()
+
+Column file layout: the magic line b'PTCGCOL1\\n', then per row group a
+uint32 header length, a JSON header ({'rows': n, 'columns': [{'name',
+'type', 'length'}]}) and each column's bytes in order. 'f8' columns are
+little-endian float64 (NaN when missing), 'i8' int64, and 'str' an int32
+offsets array (rows + 1 entries) followed by the UTF-8 data.
+
+    python export_table.py --format columns --output analyses.col --segments 16
+    python export_table.py --format ndjson --output new.ndjson --state export.state
+"""
+
+import argparse
+import csv
+import json
+import queue
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
+
+from analysis_codec import decode_analysis
+from analysis_store import ANALYSIS_PK_PREFIX, LATEST_PK
+from storage import storage_from_env
+from stream_processor import backfill_latest_pointers
+
+# name -> column type
+COLUMNS = {
+    'set_id': 'str',
+    'sk': 'str',
+    'analysis_id': 'str',
+    'timestamp': 'i8',
+    'product_name': 'str',
+    'set_name': 'str',
+    'recommendation': 'str',
+    'ev_open': 'f8',
+    'sealed_price': 'f8',
+    'confidence': 'f8',
+}
+
+COLUMN_MAGIC = b'PTCGCOL1\n'
+DEFAULT_SEGMENTS = 8
+PAGE_SIZE = 1000
+ROW_GROUP_SIZE = 65536
+# Pages buffered between the scanners and the writer
+QUEUE_PAGES = 16
+
+_DONE = object()
+
+
+def _projection(include_data):
+    attributes = ['pk'] + [name for name in COLUMNS if name != 'set_id']
+    if include_data:
+        attributes += ['blob', 'data']
+    names = {f'#a{i}': name for i, name in enumerate(attributes)}
+    return ', '.join(names), names
+
+
+def export_row(item, include_data=False):
+    """Export columns of one stored item"""
+    row = {'set_id': item['pk'][len(ANALYSIS_PK_PREFIX):]}
+    for name, kind in COLUMNS.items():
+        if name == 'set_id':
+            continue
+        value = item.get(name)
+        if isinstance(value, Decimal):
+            value = int(value) if kind == 'i8' else float(value)
+        row[name] = value
+    if include_data:
+        if 'blob' in item:
+            row['analysis'] = decode_analysis(item['blob'])
+        elif 'data' in item:
+            row['analysis'] = json.loads(item['data'])
+    return row
+
+
+# --- readers ---
+
+def scan_segment(table, segment, total_segments, pages, include_data=False):
+    """Put every ANALYSIS# row of one scan segment on the pages queue"""
+    projection, names = _projection(include_data)
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'Limit': PAGE_SIZE,
+        'ProjectionExpression': projection,
+        'ExpressionAttributeNames': names,
+        'FilterExpression': 'begins_with(pk, :prefix)',
+        'ExpressionAttributeValues': {':prefix': ANALYSIS_PK_PREFIX}
+    }
+    while True:
+        response = table.scan(**kwargs)
+        if response.get('Items'):
+            pages.put([export_row(item, include_data) for item in response['Items']])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def exported_sets(table):
+    """Set IDs with stored analyses, from their LATEST pointers"""
+    set_ids = []
+    kwargs = {
+        'KeyConditionExpression': 'pk = :pk',
+        'ExpressionAttributeValues': {':pk': LATEST_PK}
+    }
+    while True:
+        response = table.query(**kwargs)
+        set_ids.extend(item['sk'][len('SET#'):] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return set_ids
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_since(table, set_id, since, pages, include_data=False):
+    """
+    Put a set's rows from since (epoch seconds) on the pages queue. The
+    boundary second is included, so a row written in the same second as
+    the previous export's newest is not lost (it may appear in both)
+    """
+    projection, names = _projection(include_data)
+    names['#ts'] = 'timestamp'
+    kwargs = {
+        'IndexName': 'timestamp-index',
+        'KeyConditionExpression': 'pk = :pk AND #ts >= :since',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {':pk': f"{ANALYSIS_PK_PREFIX}{set_id}", ':since': int(since)},
+        'ProjectionExpression': projection,
+        'Limit': PAGE_SIZE
+    }
+    while True:
+        response = table.query(**kwargs)
+        if response.get('Items'):
+            pages.put([export_row(item, include_data) for item in response['Items']])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+# --- writers ---
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=list(COLUMNS), extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class NdjsonWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rows):
+        for row in rows:
+            self.stream.write(json.dumps(row, separators=(',', ':'), default=str) + '\n')
+
+    def close(self):
+        pass
+
+
+def _encode_column(values, kind):
+    if kind == 'f8':
+        return np.array([np.nan if v is None else v for v in values], dtype='<f8').tobytes()
+    if kind == 'i8':
+        return np.array([0 if v is None else v for v in values], dtype='<i8').tobytes()
+    encoded = [('' if v is None else str(v)).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i4')
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets.tobytes() + b''.join(encoded)
+
+
+class ColumnWriter:
+    """Typed binary columns, flushed every ROW_GROUP_SIZE rows"""
+
+    def __init__(self, stream, row_group_size=ROW_GROUP_SIZE):
+        self.stream = stream
+        self.row_group_size = row_group_size
+        self.buffer = []
+        self.stream.write(COLUMN_MAGIC)
+
+    def write(self, rows):
+        self.buffer.extend(rows)
+        while len(self.buffer) >= self.row_group_size:
+            self._flush(self.buffer[:self.row_group_size])
+            del self.buffer[:self.row_group_size]
+
+    def _flush(self, rows):
+        columns = [
+            (name, kind, _encode_column([row.get(name) for row in rows], kind))
+            for name, kind in COLUMNS.items()
+        ]
+        header = json.dumps({
+            'rows': len(rows),
+            'columns': [{'name': name, 'type': kind, 'length': len(data)}
+                        for name, kind, data in columns]
+        }).encode('utf-8')
+        self.stream.write(struct.pack('<I', len(header)) + header)
+        for _, _, data in columns:
+            self.stream.write(data)
+
+    def close(self):
+        if self.buffer:
+            self._flush(self.buffer)
+            self.buffer = []
+
+
+def read_columns(path):
+    """Yield each row group of a column file as {name: numpy array}"""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMN_MAGIC)) != COLUMN_MAGIC:
+            raise ValueError(f"{path} is not a column export")
+        while True:
+            size = f.read(4)
+            if not size:
+                return
+            header = json.loads(f.read(struct.unpack('<I', size)[0]))
+            group = {}
+            for column in header['columns']:
+                data = f.read(column['length'])
+                if column['type'] in ('f8', 'i8'):
+                    group[column['name']] = np.frombuffer(data, dtype='<' + column['type'])
+                else:
+                    offsets = np.frombuffer(data[:4 * (header['rows'] + 1)], dtype='<i4')
+                    text = data[4 * (header['rows'] + 1):]
+                    group[column['name']] = np.array(
+                        [text[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])],
+                        dtype=object
+                    )
+            yield group
+
+
+WRITERS = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'columns': ColumnWriter}
+
+
+def export(table, stream, fmt='csv', segments=DEFAULT_SEGMENTS, since=None, include_data=False,
+           backfill=False):
+    """
+    Export analyses to stream. Returns (rows written, newest timestamp seen).
+    Full exports scan in parallel segments; with since, only newer rows of
+    each set are queried, after backfilling missing set pointers if asked.
+    """
+    writer = WRITERS[fmt](stream)
+    pages = queue.Queue(maxsize=QUEUE_PAGES)
+
+    if since is None:
+        jobs = [(scan_segment, (table, segment, segments, pages, include_data))
+                for segment in range(segments)]
+    else:
+        if backfill:
+            backfill_latest_pointers(table, segments)
+        jobs = [(query_since, (table, set_id, since, pages, include_data))
+                for set_id in exported_sets(table)]
+
+    errors = []
+
+    def produce():
+        def run(job):
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception as e:
+                errors.append(e)
+        with ThreadPoolExecutor(max_workers=max(1, min(segments, len(jobs)))) as executor:
+            list(executor.map(run, jobs))
+        pages.put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    rows_written, pages_written, newest = 0, 0, since or 0
+    started = time.monotonic()
+    while True:
+        page = pages.get()
+        if page is _DONE:
+            break
+        writer.write(page)
+        rows_written += len(page)
+        pages_written += 1
+        newest = max([newest] + [row['timestamp'] or 0 for row in page])
+        if pages_written % 100 == 0:
+            rate = rows_written / max(time.monotonic() - started, 1e-9)
+            print(f"  {rows_written} rows ({rate:.0f}/s)", file=sys.stderr)
+    writer.close()
+    producer.join()
+
+    if errors:
+        raise errors[0]
+    return rows_written, newest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export stored analyses')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--output', default='-', help="file path, or '-' for stdout")
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS,
+                        help='parallel scan segments (and worker threads)')
+    parser.add_argument('--since', type=int, help='only rows newer than this epoch timestamp')
+    parser.add_argument('--state', help='file holding the last exported timestamp; '
+                                        'read for --since and updated after the export')
+    parser.add_argument('--include-data', action='store_true',
+                        help='ndjson only: add the decoded analysis to each row')
+    parser.add_argument('--backfill-pointers', action='store_true',
+                        help='incremental only: first give sets stored before the stream '
+                             'processor a LATEST pointer')
+    args = parser.parse_args(argv)
+
+    since = args.since
+    if since is None and args.state:
+        try:
+            with open(args.state) as f:
+                since = int(f.read().strip())
+        except (OSError, ValueError):
+            since = None
+
+    binary = args.format == 'columns'
+    if args.output == '-':
+        stream = sys.stdout.buffer if binary else sys.stdout
+    else:
+        stream = open(args.output, 'wb' if binary else 'w', newline='' if not binary else None)
+
+    started = time.monotonic()
+    try:
+        rows, newest = export(storage_from_env(), stream, args.format, args.segments, since,
+                              args.include_data and args.format == 'ndjson', args.backfill_pointers)
+    finally:
+        if stream not in (sys.stdout, sys.stdout.buffer):
+            stream.close()
+
+    if args.state and rows:
+        with open(args.state, 'w') as f:
+            f.write(str(newest))
+    print(f"Exported {rows} rows in {time.monotonic() - started:.1f}s"
+          + (f" (since {since})" if since is not None else ''), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
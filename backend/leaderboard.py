@@ -0,0 +1,98 @@
+"""
+Trending leaderboard - one materialized item holding the top analyzed
+products by open ROI and by recency, so reading trending is one GetItem.
+
+The item (pk='LEADERBOARD', sk='TRENDING') carries a version number; every
+update is a read-merge-write of a batch of entries, guarded by a condition
+on that version and retried on conflict. An entry never replaces a newer
+one for the same product, so merging a redelivered batch is a no-op. Entries older than ENTRY_MAX_AGE_DAYS are pruned on
+every update and filtered on read, so the board does not depend on table
+TTL.
+"""
+
+import time
+from decimal import Decimal
+
+LEADERBOARD_KEY = {'pk': 'LEADERBOARD', 'sk': 'TRENDING'}
+
+TOP_N = 20
+# The ROI list keeps extra entries so expired leaders are backfilled
+ROI_POOL = 3 * TOP_N
+ENTRY_MAX_AGE_DAYS = 7
+UPDATE_RETRIES = 5
+
+ORDERS = {
+    'roi': ('by_roi', lambda entry: (entry['roi_percent'], entry['timestamp'])),
+    'recent': ('by_recency', lambda entry: entry['timestamp']),
+}
+
+
+def leaderboard_entry(analysis, now=None):
+    """Leaderboard entry for a finished analysis"""
+    return {
+        'key': f"{analysis['set_id']}#{analysis['product_name']}",
+        'set_name': analysis['set_name'],
+        'product_name': analysis['product_name'],
+        'ev_open': Decimal(str(analysis['pricing']['expected_value_open'])),
+        'sealed_price': Decimal(str(analysis['pricing']['sealed_box_cost'])),
+        'roi_percent': Decimal(str(analysis['roi']['open']['percent'])),
+        'recommendation': analysis['recommendation'],
+        'timestamp': int(now or time.time())
+    }
+
+
+def _fresh(entries, now):
+    cutoff = now - ENTRY_MAX_AGE_DAYS * 86400
+    return [entry for entry in entries if entry['timestamp'] >= cutoff]
+
+
+def merge_entries(board, new_entries, now):
+    """Board lists with new entries inserted (replacing their previous versions)"""
+    # The newest entry per key wins, so re-merging the same entries changes nothing
+    latest = {}
+    for entry in new_entries:
+        if entry['key'] not in latest or entry['timestamp'] >= latest[entry['key']]['timestamp']:
+            latest[entry['key']] = entry
+
+    merged = {}
+    for order, (field, sort_key) in ORDERS.items():
+        kept = [
+            e for e in board.get(field, [])
+            if e['key'] not in latest or e['timestamp'] > latest[e['key']]['timestamp']
+        ]
+        kept_keys = {e['key'] for e in kept}
+        added = [e for e in latest.values() if e['key'] not in kept_keys]
+        entries = sorted(_fresh(kept + added, now), key=sort_key, reverse=True)
+        merged[field] = entries[:ROI_POOL if order == 'roi' else TOP_N]
+    return merged
+
+
+def update_leaderboard(table, entries, now=None):
+    """Merge entries into the leaderboard with optimistic concurrency"""
+    from botocore.exceptions import ClientError
+
+    now = int(now or time.time())
+    for _ in range(UPDATE_RETRIES):
+        board = table.get_item(Key=LEADERBOARD_KEY, ConsistentRead=True).get('Item', {})
+        version = int(board.get('version', 0))
+        item = dict(LEADERBOARD_KEY, version=version + 1, timestamp=now,
+                    **merge_entries(board, entries, now))
+        try:
+            table.put_item(
+                Item=item,
+                ConditionExpression='attribute_not_exists(pk) OR version = :version',
+                ExpressionAttributeValues={':version': version}
+            )
+            return item['version']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    raise RuntimeError('Leaderboard update kept conflicting, gave up')
+
+
+def read_leaderboard(table, order='roi', limit=TOP_N, now=None):
+    """Top entries in the given order ('roi' or 'recent') - one GetItem"""
+    field, sort_key = ORDERS[order]
+    board = table.get_item(Key=LEADERBOARD_KEY).get('Item', {})
+    entries = sorted(_fresh(board.get(field, []), now or time.time()), key=sort_key, reverse=True)
+    return entries[:limit]
@@ -0,0 +1,109 @@
+"""
+Slot-based booster pack model shared by the box simulator and the exact
+box-value distribution.
+
+A pack is a list of slots (commons, uncommons, reverse holos, the hit
+slot, ...). Each slot is a categorical distribution over the cards of a
+set: slots with a rarity list draw uniformly from every card of those
+rarities, the 'pull_rates' slot draws each rarity with its pull rate and
+leaves the remaining probability as an empty (zero value) outcome.
+Layouts come from pull_rates.json and resolve per set, then era, then
+default, like the pull-rate tables.
+"""
+
+import numpy as np
+
+from rarity import RARITY_CODES, era_of, load_pull_rate_data
+
+_DATA = load_pull_rate_data()
+
+
+def pack_layout(set_id=None):
+    """Slot layout of one pack for a set"""
+    name = _DATA['layout_sets'].get(set_id) or _DATA['layout_eras'].get(era_of(set_id))
+    return _DATA['pack_layouts'][name or 'default']
+
+
+def _slot_card_probs(catalog, by_code, spec, pull_rates):
+    """Per-card probabilities of one slot, as {catalog_index: probability}"""
+    rarities = spec['rarities']
+
+    if rarities == 'pull_rates':
+        # Only rarities that exist in the set share the slot; rates of 1.0
+        # mark guaranteed slots, which have their own layout entries
+        slot_rates = {
+            code: pull_rates[code] for code in by_code
+            if 0 < pull_rates[code] < 1.0
+        }
+        total_rate = sum(slot_rates.values())
+        scale = 1.0 / total_rate if total_rate > 1.0 else 1.0
+        return {
+            i: rate * scale / len(by_code[code])
+            for code, rate in slot_rates.items() for i in by_code[code]
+        }
+
+    members = [i for name in rarities for i in by_code.get(RARITY_CODES[name], [])]
+    return {i: 1.0 / len(members) for i in members}
+
+
+def card_value(card, price_field='price'):
+    """Value of a card pulled in a slot priced by price_field"""
+    value = card.get(price_field)
+    return card['price'] if value is None else value
+
+
+def card_rates(catalog, pull_rates, layout):
+    """
+    Expected copies per pack of every card, by the price field it is valued
+    at: a list aligned with the catalog of {price_field: rate}. Summing
+    card_value * rate over cards worth at least the minimum card value
+    gives the EV of one pack - the mean of the simulated and exact box
+    distributions.
+    """
+    rates = [{} for _ in catalog]
+    for slot in build_pack_slots(catalog, pull_rates, layout):
+        for i, prob in zip(slot['indices'], slot['probs']):
+            field_rates = rates[i]
+            field_rates[slot['price']] = field_rates.get(slot['price'], 0.0) + float(prob) * slot['count']
+    return rates
+
+
+def build_pack_slots(catalog, pull_rates, layout, min_card_value=0.0, cards_per_pack=None):
+    """
+    Build the slots of one pack from a priced catalog.
+
+    Returns a list of slot dicts with 'slot', 'count', 'price' (the catalog
+    price field used), 'rated' (drawn by pull rate) and arrays 'indices', 'values', 'probs' covering only
+    cards worth at least min_card_value; remaining mass is worth zero.
+    """
+    if cards_per_pack is not None:
+        slot_cards = sum(spec['count'] for spec in layout)
+        if slot_cards != cards_per_pack:
+            raise ValueError(f"Pack layout has {slot_cards} cards, expected {cards_per_pack}")
+
+    by_code = {}
+    for i, card in enumerate(catalog):
+        by_code.setdefault(card['rarity_code'], []).append(i)
+
+    slots = []
+    for spec in layout:
+        price_field = spec.get('price', 'price')
+        indices, values, probs = [], [], []
+        for i, prob in _slot_card_probs(catalog, by_code, spec, pull_rates).items():
+            value = card_value(catalog[i], price_field)
+            if value >= min_card_value:
+                indices.append(i)
+                values.append(value)
+                probs.append(prob)
+
+        slots.append({
+            'slot': spec['slot'],
+            'count': spec['count'],
+            'price': price_field,
+            'rated': spec['rarities'] == 'pull_rates',
+            'indices': np.array(indices, dtype=np.int64),
+            'values': np.array(values, dtype=np.float64),
+            'probs': np.array(probs, dtype=np.float64)
+        })
+
+    return slots
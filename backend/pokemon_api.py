@@ -12,6 +12,7 @@ import json
 import urllib.request
 import urllib.parse
 from datetime import datetime
+from rarity import rarity_code
 
 # Pokemon TCG API base URL
 API_BASE = "https://api.pokemontcg.io/v2"
@@ -102,6 +103,9 @@ def fetch_set_cards(set_id='sv3pt5', page=1, page_size=250):
             if not price or price <= 0:
                 continue
 
+            band_key = {'reverse': 'reverseHolofoil', 'unlimited': 'unlimitedHolofoil'}.get(price_type, price_type)
+            band = tcg_prices[band_key]
+
             processed_card = {
                 'id': card.get('id'),
                 'name': card.get('name'),
@@ -109,8 +113,12 @@ def fetch_set_cards(set_id='sv3pt5', page=1, page_size=250):
                 'set_id': set_id,
                 'number': card.get('number'),
                 'rarity': card.get('rarity', 'Common'),
+                'rarity_code': rarity_code(card.get('rarity', 'Common')),
                 'price': round(float(price), 2),
                 'price_type': price_type,
+                'price_low': band.get('low'),
+                'price_high': band.get('high'),
+                'reverse_price': (tcg_prices.get('reverseHolofoil') or {}).get('market'),
                 'type': card.get('types', ['Colorless'])[0] if card.get('types') else 'Colorless',
                 'supertype': card.get('supertype', 'Pokémon'),
                 'language': 'EN',
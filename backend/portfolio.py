@@ -0,0 +1,122 @@
+"""
+Sealed-product portfolio optimizer - picks the product mix that maximizes
+expected profit within a budget, by bounded knapsack dynamic programming
+over cent-discretized prices.
+
+Each product's per-unit profit comes from calculate_product_roi: the
+profit of its best action (open, hold or resell). With risk_aversion > 0
+the open EV is discounted by that fraction before picking the action, as
+opening is the high-variance choice.
+"""
+
+from functools import reduce
+from math import gcd
+
+import numpy as np
+
+# Largest DP table (items x budget units) before prices are coarsened
+MAX_DP_CELLS = 20000000
+
+
+def unit_profit(roi, price, risk_aversion=0.0):
+    """Per-unit profit and action for a product's ROI numbers"""
+    options = {
+        'OPEN': roi['open']['value'] * (1 - risk_aversion) - price,
+        'HOLD': roi['hold_6mo']['profit'],
+        'RESELL': roi['resell_now']['profit']
+    }
+    action = max(options, key=options.get)
+    return options[action], action
+
+
+def _split_quantity(cap):
+    """Binary split of a quantity cap: 13 -> 1, 2, 4, 6"""
+    parts, size = [], 1
+    while cap > 0:
+        take = min(size, cap)
+        parts.append(take)
+        cap -= take
+        size *= 2
+    return parts
+
+
+def optimize_portfolio(products, budget, caps=None, risk_aversion=0.0):
+    """
+    Choose quantities of products maximizing total profit with total cost
+    <= budget. products need 'name', 'price' and 'roi'; caps maps product
+    name to a maximum quantity (default: as many as the budget allows,
+    none if the product is out of stock).
+    """
+    caps = caps or {}
+    budget_cents = int(round(budget * 100))
+
+    candidates = []
+    for product in products:
+        price_cents = int(round(product['price'] * 100))
+        if price_cents <= 0 or (not product.get('in_stock', True) and product['name'] not in caps):
+            continue
+        profit, action = unit_profit(product['roi'], product['price'], risk_aversion)
+        cap = min(int(caps.get(product['name'], budget_cents // price_cents)),
+                  budget_cents // price_cents)
+        if profit > 0 and cap > 0:
+            candidates.append((product, price_cents, profit, action, cap))
+
+    # Divide everything by the common factor of prices and budget (exact),
+    # then coarsen with prices rounded up if the DP table is still too big
+    unit = reduce(gcd, [c[1] for c in candidates], budget_cents) or 1
+    parts = sum(len(_split_quantity(c[4])) for c in candidates)
+    while parts * (budget_cents // unit + 1) > MAX_DP_CELLS:
+        unit *= 10
+
+    capacity = budget_cents // unit
+    best = np.zeros(capacity + 1)
+    items = []
+    taken = []
+
+    for index, (product, price_cents, profit, action, cap) in enumerate(candidates):
+        weight = -(-price_cents // unit)
+        for quantity in _split_quantity(cap):
+            w, v = weight * quantity, profit * quantity
+            take = np.zeros(capacity + 1, dtype=bool)
+            if w <= capacity:
+                with_item = best[:capacity + 1 - w] + v
+                take[w:] = with_item > best[w:]
+                best[w:] = np.where(take[w:], with_item, best[w:])
+            items.append((index, quantity, w))
+            taken.append(take)
+
+    # Walk the decisions backwards to recover the chosen quantities
+    quantities = [0] * len(candidates)
+    remaining = capacity
+    for (index, quantity, w), take in zip(reversed(items), reversed(taken)):
+        if take[remaining]:
+            quantities[index] += quantity
+            remaining -= w
+
+    picks, total_cost, total_profit = [], 0.0, 0.0
+    for (product, price_cents, profit, action, cap), quantity in zip(candidates, quantities):
+        if quantity:
+            cost = price_cents * quantity / 100
+            picks.append({
+                'name': product['name'],
+                'set': product.get('set'),
+                'quantity': quantity,
+                'unit_price': product['price'],
+                'action': action,
+                'unit_profit': round(profit, 2),
+                'cost': round(cost, 2),
+                'expected_profit': round(profit * quantity, 2)
+            })
+            total_cost += cost
+            total_profit += profit * quantity
+
+    picks.sort(key=lambda p: p['expected_profit'], reverse=True)
+    return {
+        'budget': round(budget, 2),
+        'total_cost': round(total_cost, 2),
+        'expected_profit': round(total_profit, 2),
+        'expected_roi_percent': round(total_profit / total_cost * 100, 1) if total_cost else 0,
+        'risk_aversion': risk_aversion,
+        'resolution_cents': unit,
+        'products': picks
+    }
@@ -0,0 +1,401 @@
+"""
+Price history - append-only price series for sealed products and cards,
+with trend fits that are updated incrementally as observations arrive.
+
+Series are named 'SEALED#<product name>' or 'CARD#<card id>'. Points are
+(day, price in cents) pairs packed into compact binary arrays:
+- DynamoDB backend: one item per series and year
+  (pk='PRICE_HISTORY#<series>', sk='CHUNK#<year>'), so six months of daily
+  points is a single Query
+- Local backend: one append-only binary file per series
+
+Each series keeps a trend state (sk='TREND'): an EWMA of log price and an
+exponentially weighted log-linear regression, both updated in O(1) per
+observation. Hold projections extrapolate the fitted daily log slope.
+
+A series holds at most one point per day, in day order: an observation
+is only appended to a chunk, and only folded into the trend, if it is
+newer than the last day that item already holds (the last of several
+same-day observations in one batch wins). The chunk and trend are
+separate items written independently, so this is what makes a retried
+/prices call harmless - whichever of the two writes landed the first
+time skips the observation, and the other applies it.
+
+A batch of observations (a full price sync) is recorded with one
+BatchGetItem per 100 chunk/trend items and conditional writes issued in
+parallel. Chunks are guarded by their point count and trend states by
+their observation count, so a write that races another /prices call is
+re-read and retried instead of losing the other's update.
+"""
+
+import json
+import math
+import os
+import re
+import struct
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Half-life of observation weights for the trend fit
+TREND_HALF_LIFE_DAYS = 90
+
+# Minimum history before a fitted projection replaces the default
+MIN_TREND_POINTS = 5
+MIN_TREND_SPAN_DAYS = 14
+
+# Fitted 6-month appreciation is clamped to this range
+MAX_APPRECIATION = 1.0
+MIN_APPRECIATION = -0.5
+
+HISTORY_PK_PREFIX = 'PRICE_HISTORY#'
+POINT_FORMAT = '<iI'  # day number, price in cents
+POINT_SIZE = struct.calcsize(POINT_FORMAT)
+APPEND_RETRIES = 3
+BATCH_GET_SIZE = 100  # BatchGetItem limit
+MAX_WRITE_WORKERS = 16
+
+
+def sealed_series(product_name):
+    return f"SEALED#{product_name}"
+
+
+def card_series(card_id):
+    return f"CARD#{card_id}"
+
+
+def day_number(timestamp=None):
+    """Days since the Unix epoch"""
+    return int((time.time() if timestamp is None else timestamp) // 86400)
+
+
+def _year_of(day):
+    return datetime.fromtimestamp(day * 86400, tz=timezone.utc).year
+
+
+def pack_points(points):
+    """Pack [(day, cents)] into bytes"""
+    return b''.join(struct.pack(POINT_FORMAT, day, cents) for day, cents in points)
+
+
+def unpack_points(data):
+    """Unpack bytes into [(day, cents)]"""
+    return list(struct.iter_unpack(POINT_FORMAT, data))
+
+
+def newer_points(points, last_day):
+    """
+    [(day, value)] reduced to one point per day (the last given wins), in
+    day order, keeping only days after last_day (None keeps every day)
+    """
+    by_day = dict(points)
+    return [(day, by_day[day]) for day in sorted(by_day) if last_day is None or day > last_day]
+
+
+def new_trend_state():
+    return {'n': 0, 'origin': None, 'last_day': None, 'level': 0.0,
+            'sw': 0.0, 'swt': 0.0, 'swy': 0.0, 'swtt': 0.0, 'swty': 0.0,
+            'first_day': None}
+
+
+def update_trend(state, day, price, half_life=TREND_HALF_LIFE_DAYS):
+    """Fold one observation into the trend state in O(1)"""
+    if price <= 0:
+        return state
+
+    y = math.log(price)
+    if state['n'] == 0:
+        state.update(origin=day, first_day=day, last_day=day, level=y)
+
+    # Decay previous weights by the time elapsed since the last observation
+    elapsed = max(day - state['last_day'], 0)
+    decay = 0.5 ** (elapsed / half_life)
+    for key in ('sw', 'swt', 'swy', 'swtt', 'swty'):
+        state[key] *= decay
+
+    t = day - state['origin']
+    state['sw'] += 1.0
+    state['swt'] += t
+    state['swy'] += y
+    state['swtt'] += t * t
+    state['swty'] += t * y
+
+    # Time-aware EWMA of log price with the same half-life
+    alpha = 1.0 - decay if state['n'] else 1.0
+    state['level'] += alpha * (y - state['level'])
+
+    state['n'] += 1
+    state['last_day'] = max(day, state['last_day'])
+    return state
+
+
+def trend_slope(state):
+    """Fitted daily log-price slope, or None if the fit is degenerate"""
+    denominator = state['sw'] * state['swtt'] - state['swt'] ** 2
+    if state['n'] < 2 or denominator <= 1e-9:
+        return None
+    return (state['sw'] * state['swty'] - state['swt'] * state['swy']) / denominator
+
+
+def project(state, horizon_days=182):
+    """
+    Projected appreciation over horizon_days from a trend state, or None
+    when there is not enough history to trust the fit.
+    """
+    if not state or state['n'] < MIN_TREND_POINTS:
+        return None
+    if state['last_day'] - state['first_day'] < MIN_TREND_SPAN_DAYS:
+        return None
+    slope = trend_slope(state)
+    if slope is None:
+        return None
+
+    appreciation = math.exp(slope * horizon_days) - 1
+    appreciation = min(max(appreciation, MIN_APPRECIATION), MAX_APPRECIATION)
+
+    # Trend line value at the latest observation (the EWMA lags a trend)
+    intercept = (state['swy'] - slope * state['swt']) / state['sw']
+    fitted = intercept + slope * (state['last_day'] - state['origin'])
+    return {
+        'current_price': round(math.exp(fitted), 2),
+        'ewma_price': round(math.exp(state['level']), 2),
+        'appreciation': round(appreciation, 4),
+        'daily_log_slope': slope,
+        'observations': state['n'],
+        'horizon_days': horizon_days
+    }
+
+
+class DynamoHistoryBackend:
+    """Price history in the analytics table - binary chunk per series and year"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def _batch_get(self, keys):
+        """Items for many keys, strongly consistent, as {(pk, sk): item}"""
+        found = {}
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            request = {self.table.name: {'Keys': keys[start:start + BATCH_GET_SIZE],
+                                         'ConsistentRead': True}}
+            while request:
+                response = self.table.meta.client.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self.table.name, []):
+                    found[(item['pk'], item['sk'])] = item
+                request = response.get('UnprocessedKeys')
+        return found
+
+    def _conditional_write(self, key, item, build, version_field):
+        """
+        Put build(item) unless another writer changed version_field since
+        item was read; on a lost race, re-read the item and rebuild. A
+        build returning None means the item already has everything.
+        """
+        from botocore.exceptions import ClientError
+
+        for _ in range(APPEND_RETRIES):
+            version = int(item[version_field]) if item else 0
+            attributes = build(item)
+            if attributes is None:
+                return
+            try:
+                self.table.put_item(
+                    Item=dict(key, **attributes),
+                    ConditionExpression='attribute_not_exists(pk) OR #version = :version',
+                    ExpressionAttributeNames={'#version': version_field},
+                    ExpressionAttributeValues={':version': version}
+                )
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+            item = self.table.get_item(Key=key, ConsistentRead=True).get('Item')
+        raise RuntimeError(f"Concurrent writes to {key['pk']}/{key['sk']}, gave up")
+
+    def append_observations(self, observations):
+        """Append [(series, day, cents)] to their chunks and fold them into the trends"""
+        chunks, trends = {}, {}
+        for series, day, cents in observations:
+            pk = HISTORY_PK_PREFIX + series
+            chunks.setdefault((pk, f"CHUNK#{_year_of(day)}"), []).append((day, cents))
+            trends.setdefault((pk, 'TREND'), []).append((day, cents / 100))
+        items = self._batch_get([{'pk': pk, 'sk': sk} for pk, sk in list(chunks) + list(trends)])
+
+        def chunk_writer(points):
+            def build(item):
+                data = _binary(item['points']) if item else b''
+                count = int(item['count']) if item else 0
+                last_day = unpack_points(data[-POINT_SIZE:])[0][0] if data else None
+                new = newer_points(points, last_day)
+                if not new:
+                    return None
+                return {'points': data + pack_points(new), 'count': count + len(new)}
+            return build
+
+        def trend_writer(prices):
+            def build(item):
+                state = json.loads(item['state']) if item else new_trend_state()
+                new = newer_points(prices, state['last_day'])
+                if not new:
+                    return None
+                for day, price in new:
+                    update_trend(state, day, price)
+                return {'state': json.dumps(state), 'observations': state['n'],
+                        'timestamp': int(time.time())}
+            return build
+
+        writes = [(key, chunk_writer(points), 'count') for key, points in chunks.items()]
+        writes += [(key, trend_writer(prices), 'observations') for key, prices in trends.items()]
+
+        def write(entry):
+            (pk, sk), build, version_field = entry
+            self._conditional_write({'pk': pk, 'sk': sk}, items.get((pk, sk)), build, version_field)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_WRITE_WORKERS, len(writes)))) as executor:
+            list(executor.map(write, writes))
+
+    def read(self, series, start_day, end_day):
+        kwargs = {
+            'KeyConditionExpression': 'pk = :pk AND sk BETWEEN :start AND :end',
+            'ExpressionAttributeValues': {
+                ':pk': HISTORY_PK_PREFIX + series,
+                ':start': f"CHUNK#{_year_of(start_day)}",
+                ':end': f"CHUNK#{_year_of(end_day)}"
+            }
+        }
+        points = []
+        while True:
+            response = self.table.query(**kwargs)
+            for item in response.get('Items', []):
+                points.extend(unpack_points(_binary(item['points'])))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        # Chunks hold whole years - keep only the requested days
+        return [(d, c) for d, c in points if start_day <= d <= end_day]
+
+    def get_state(self, series):
+        item = self.table.get_item(
+            Key={'pk': HISTORY_PK_PREFIX + series, 'sk': 'TREND'}
+        ).get('Item')
+        return json.loads(item['state']) if item else None
+
+    def get_states(self, series_list):
+        """Trend states for many series with BatchGetItem"""
+        states = {}
+        keys = [{'pk': HISTORY_PK_PREFIX + s, 'sk': 'TREND'} for s in series_list]
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            request = {self.table.name: {'Keys': keys[start:start + BATCH_GET_SIZE]}}
+            while request:
+                response = self.table.meta.client.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self.table.name, []):
+                    states[item['pk'][len(HISTORY_PK_PREFIX):]] = json.loads(item['state'])
+                request = response.get('UnprocessedKeys')
+        return states
+
+
+class LocalHistoryBackend:
+    """Price history on local disk - one append-only binary file per series"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, series, suffix):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', series) + suffix)
+
+    def append_observations(self, observations):
+        """Append [(series, day, cents)] to their files and fold them into the trends"""
+        by_series = {}
+        for series, day, cents in observations:
+            by_series.setdefault(series, []).append((day, cents))
+        for series, points in by_series.items():
+            with open(self._path(series, '.bin'), 'a+b') as f:
+                f.seek(max(f.seek(0, os.SEEK_END) - POINT_SIZE, 0))
+                tail = f.read()
+                new = newer_points(points, unpack_points(tail)[0][0] if tail else None)
+                f.write(pack_points(new))
+            state = self.get_state(series) or new_trend_state()
+            new = newer_points(points, state['last_day'])
+            if new:
+                for day, cents in new:
+                    update_trend(state, day, cents / 100)
+                self._put_state(series, state)
+
+    def read(self, series, start_day, end_day):
+        try:
+            with open(self._path(series, '.bin'), 'rb') as f:
+                points = unpack_points(f.read())
+        except FileNotFoundError:
+            return []
+        return [(d, c) for d, c in points if start_day <= d <= end_day]
+
+    def get_state(self, series):
+        try:
+            with open(self._path(series, '.trend.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_states(self, series_list):
+        states = {}
+        for series in series_list:
+            state = self.get_state(series)
+            if state:
+                states[series] = state
+        return states
+
+    def _put_state(self, series, state):
+        path = self._path(series, '.trend.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+
+def _binary(value):
+    """Raw bytes of a DynamoDB binary attribute"""
+    return bytes(value.value) if hasattr(value, 'value') else bytes(value)
+
+
+class PriceHistory:
+    """Append observations and query series and projections"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def record(self, series, price, timestamp=None):
+        """Append one observation and update the series trend"""
+        self.record_many([(series, price)], timestamp)
+
+    def record_many(self, observations, timestamp=None):
+        """Append [(series, price)] observations and update their trends in one batch"""
+        day = day_number(timestamp)
+        self.backend.append_observations([
+            (series, day, int(round(price * 100))) for series, price in observations
+        ])
+
+    def points(self, series, days=182, end_day=None):
+        """Observations of the last `days` days as arrays (days, prices)"""
+        end_day = day_number() if end_day is None else end_day
+        points = self.backend.read(series, end_day - days, end_day)
+        return array('i', [d for d, _ in points]), array('d', [c / 100 for _, c in points])
+
+    def projection(self, series, horizon_days=182):
+        """Fitted projection for one series, or None"""
+        return project(self.backend.get_state(series), horizon_days)
+
+    def projections(self, series_list, horizon_days=182):
+        """Fitted projections for many series in one batch read"""
+        states = self.backend.get_states(series_list)
+        return {s: project(states.get(s), horizon_days) for s in series_list}
+
+
+def history_from_env(table=None):
+    """
+    PriceHistory for the configured backend: PRICE_HISTORY_BACKEND is
+    'dynamodb' (default, needs the table) or 'local' (PRICE_HISTORY_DIR).
+    """
+    if os.environ.get('PRICE_HISTORY_BACKEND', 'dynamodb') == 'local':
+        return PriceHistory(LocalHistoryBackend(os.environ.get('PRICE_HISTORY_DIR', '/tmp/price-history')))
+    return PriceHistory(DynamoHistoryBackend(table))
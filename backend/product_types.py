@@ -0,0 +1,109 @@
+"""
+Product-type catalog - what each kind of sealed product contains.
+
+Every type lists its booster pack count, guaranteed promo cards (count and
+typical value each), other fixed-value contents, a fallback price when no
+market price is known, and the name fragments that identify it. The EV of
+any product is packs * EV per pack plus its fixed contents, so every SKU
+of a set is priced from one per-pack EV.
+"""
+
+import re
+
+DEFAULT_PRODUCT_TYPE = 'Booster Box'
+
+PRODUCT_TYPES = {
+    'Booster Box': {
+        'packs': 36, 'promos': 0, 'promo_value': 0.0, 'extras': {},
+        'default_price': 100.0,
+        'aliases': ('booster box', 'booster display')
+    },
+    'Elite Trainer Box': {
+        'packs': 9, 'promos': 1, 'promo_value': 3.00,
+        'extras': {'sleeves_dice_energy': 2.00},
+        'default_price': 50.0,
+        'aliases': ('elite trainer box', 'etb')
+    },
+    'Pokemon Center Elite Trainer Box': {
+        'packs': 11, 'promos': 1, 'promo_value': 4.00,
+        'extras': {'sleeves_dice_energy': 2.00},
+        'default_price': 90.0,
+        'aliases': ('pokemon center elite trainer box', 'pokemon center etb', 'pc etb')
+    },
+    'Booster Bundle': {
+        'packs': 6, 'promos': 0, 'promo_value': 0.0, 'extras': {},
+        'default_price': 25.0,
+        'aliases': ('booster bundle', 'bundle')
+    },
+    'Build & Battle Box': {
+        'packs': 4, 'promos': 1, 'promo_value': 2.00,
+        'extras': {'evolution_pack_deck': 1.00},
+        'default_price': 20.0,
+        'aliases': ('build & battle box', 'build and battle box', 'build & battle', 'build and battle')
+    },
+    'Ultra-Premium Collection': {
+        'packs': 16, 'promos': 3, 'promo_value': 5.00,
+        'extras': {'metal_cards_and_accessories': 10.00},
+        'default_price': 120.0,
+        'aliases': ('ultra-premium collection', 'ultra premium collection', 'upc')
+    },
+    'Three-Pack Blister': {
+        'packs': 3, 'promos': 1, 'promo_value': 1.00, 'extras': {},
+        'default_price': 15.0,
+        'aliases': ('3-pack blister', 'three-pack blister', '3 pack blister', 'blister')
+    },
+    'Sleeved Booster': {
+        'packs': 1, 'promos': 0, 'promo_value': 0.0, 'extras': {},
+        'default_price': 4.50,
+        'aliases': ('sleeved booster',)
+    },
+    'Booster Pack': {
+        'packs': 1, 'promos': 0, 'promo_value': 0.0, 'extras': {},
+        'default_price': 4.50,
+        'aliases': ('booster pack', 'pack')
+    },
+}
+
+# (pattern, type), longest alias first so 'pokemon center etb' beats 'etb'
+_ALIAS_PATTERNS = sorted(
+    ((re.compile(r'(?<![a-z0-9])' + re.escape(alias) + r'(?![a-z0-9])'), name, len(alias))
+     for name, spec in PRODUCT_TYPES.items() for alias in spec['aliases']),
+    key=lambda entry: -entry[2]
+)
+
+
+def product_type_of(product_name):
+    """Canonical product type for a product name (DEFAULT_PRODUCT_TYPE if unknown)"""
+    lowered = (product_name or '').lower()
+    for pattern, name, _ in _ALIAS_PATTERNS:
+        if pattern.search(lowered):
+            return name
+    return DEFAULT_PRODUCT_TYPE
+
+
+def fixed_value(product_type):
+    """Value of a product's guaranteed contents besides booster packs"""
+    spec = PRODUCT_TYPES[product_type]
+    return spec['promos'] * spec['promo_value'] + sum(spec['extras'].values())
+
+
+def scale_to_product(box_values, product_type, reference_packs):
+    """
+    Values of opening reference_packs packs (a float or a NumPy array)
+    converted to values of one product of product_type
+    """
+    return box_values * (PRODUCT_TYPES[product_type]['packs'] / reference_packs) + fixed_value(product_type)
+
+
+def product_ev(ev_per_pack, product_type):
+    """EV of one product from the set's EV per pack"""
+    spec = PRODUCT_TYPES[product_type]
+    packs_ev = spec['packs'] * ev_per_pack
+    extras = fixed_value(product_type)
+    return {
+        'product_type': product_type,
+        'packs': spec['packs'],
+        'packs_ev': round(packs_ev, 2),
+        'fixed_value': round(extras, 2),
+        'ev_total': round(packs_ev + extras, 2)
+    }
@@ -0,0 +1,162 @@
+"""
+Rarity taxonomy - normalizes Pokemon TCG API rarity strings into small
+integer codes and serves pull-rate tables indexed by those codes.
+
+Pull rates are loaded from pull_rates.json. Tables can be overridden per
+era (set ID prefix, e.g. 'sv', 'swsh') or per set without code changes,
+and replaced at runtime by tables calibrated from opening logs.
+"""
+
+import json
+import os
+import re
+
+# Rarity classes - the position in this tuple is the rarity code
+RARITY_NAMES = (
+    'Unknown',
+    'Common',
+    'Uncommon',
+    'Rare',
+    'Rare Holo',
+    'Double Rare',
+    'Ultra Rare',
+    'Full Art',
+    'Illustration Rare',
+    'Special Illustration Rare',
+    'Secret Rare',
+    'Hyper Rare',
+    'Gold Rare',
+    'ACE SPEC Rare',
+    'Shiny Rare',
+    'Promo',
+)
+RARITY_CODES = {name: code for code, name in enumerate(RARITY_NAMES)}
+UNKNOWN = RARITY_CODES['Unknown']
+
+# Fallback rules for strings missing from the alias table. Matching is on
+# whole words, so short tokens like 'sr' never match inside other words.
+# First rule whose words are all present wins.
+TOKEN_RULES = (
+    ({'special', 'illustration'}, 'Special Illustration Rare'),
+    ({'illustration'}, 'Illustration Rare'),
+    ({'hyper'}, 'Hyper Rare'),
+    ({'rainbow'}, 'Hyper Rare'),
+    ({'gold'}, 'Gold Rare'),
+    ({'secret'}, 'Secret Rare'),
+    ({'full', 'art'}, 'Full Art'),
+    ({'shiny'}, 'Shiny Rare'),
+    ({'ace', 'spec'}, 'ACE SPEC Rare'),
+    ({'double'}, 'Double Rare'),
+    ({'ultra'}, 'Ultra Rare'),
+    ({'holo'}, 'Rare Holo'),
+    ({'promo'}, 'Promo'),
+    ({'uncommon'}, 'Uncommon'),
+    ({'common'}, 'Common'),
+    ({'rare'}, 'Rare'),
+)
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pull_rates.json')
+
+
+def load_pull_rate_data(path=DATA_FILE):
+    """Load aliases and pull-rate tables from the data file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_DATA = load_pull_rate_data()
+
+# Alias lookups are case-insensitive; results of every normalization are
+# memoized so each distinct API string is parsed only once per container
+_code_cache = {
+    alias.lower(): RARITY_CODES[name] for alias, name in _DATA['aliases'].items()
+}
+_table_cache = {}
+
+# Calibrated tables by set ID: (code-indexed rates, version)
+_calibrated = {}
+
+
+def rarity_code(rarity):
+    """Normalize an API rarity string into its integer rarity code"""
+    if not rarity:
+        return UNKNOWN
+
+    key = rarity.strip().lower()
+    code = _code_cache.get(key)
+    if code is not None:
+        return code
+
+    words = set(re.findall(r'[a-z]+', key))
+    code = UNKNOWN
+    for required, name in TOKEN_RULES:
+        if required <= words:
+            code = RARITY_CODES[name]
+            break
+
+    _code_cache[key] = code
+    return code
+
+
+def rarity_name(code):
+    """Canonical rarity class name for a rarity code"""
+    return RARITY_NAMES[code]
+
+
+def _build_table(overrides):
+    """Merge override tables over the default table into a code-indexed tuple"""
+    rates = dict(_DATA['tables']['default'])
+    for table in overrides:
+        rates.update(table)
+    return tuple(float(rates.get(name, rates['Unknown'])) for name in RARITY_NAMES)
+
+
+def era_of(set_id):
+    """Era key of a set ID - its leading letters (sv3pt5 -> sv)"""
+    match = re.match(r'[a-z]+', (set_id or '').lower())
+    return match.group(0) if match else ''
+
+
+def set_calibrated_table(set_id, rates, version):
+    """Install a calibrated pull-rate table for a set (see calibration.py)"""
+    _calibrated[set_id] = (tuple(float(rate) for rate in rates), int(version))
+
+
+def pull_rate_version(set_id=None):
+    """Version of the set's calibrated table, or 0 for the configured table"""
+    calibrated = _calibrated.get(set_id)
+    return calibrated[1] if calibrated else 0
+
+
+def pull_rate_table(set_id=None):
+    """
+    Pull-rate table for a set, indexed by rarity code. A calibrated table
+    wins; otherwise the configured one (see configured_pull_rate_table).
+    """
+    calibrated = _calibrated.get(set_id)
+    if calibrated:
+        return calibrated[0]
+    return configured_pull_rate_table(set_id)
+
+
+def configured_pull_rate_table(set_id=None):
+    """
+    Pull-rate table for a set from pull_rates.json, indexed by rarity code.
+    Resolution order: set table, era table, default table.
+    """
+    table = _table_cache.get(set_id)
+    if table is not None:
+        return table
+
+    tables = _DATA['tables']
+    overrides = []
+    era_table = _DATA['eras'].get(era_of(set_id))
+    if era_table:
+        overrides.append(tables[era_table])
+    set_table = _DATA['sets'].get(set_id)
+    if set_table:
+        overrides.append(tables[set_table])
+
+    table = _build_table(overrides)
+    _table_cache[set_id] = table
+    return table
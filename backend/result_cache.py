@@ -0,0 +1,110 @@
+"""
+Content-addressed cache of /analyze results, shared by every container.
+
+A result is keyed by the SHA-256 of the normalized request (trimmed,
+case-folded names, sealed price in cents, simulation settings) and the
+data snapshot version. The version is one DynamoDB counter
+(pk='SNAPSHOT', sk='VERSION') that /prices and /openings bump; a bump
+changes every key, so results computed from older prices or pull rates
+are never served again and simply expire. The lookup needs only the
+request and the version, so it runs before the set is resolved.
+
+Results live in the tiered cache under the 'analysis' namespace with a
+short TTL, so a hit is usually answered from container memory or /tmp
+and otherwise from the shared DynamoDB item.
+"""
+
+import hashlib
+import json
+import time
+
+RESULT_NAMESPACE = 'analysis'
+RESULT_TTL = 300
+
+SNAPSHOT_KEY = {'pk': 'SNAPSHOT', 'sk': 'VERSION'}
+# The version is re-read at most this often per container
+SNAPSHOT_CHECK_SECONDS = 5
+
+_snapshot = {'version': None, 'checked': 0.0}
+
+
+def normalize_request(body):
+    """The /analyze inputs that determine the result, in canonical form"""
+
+    def name(value):
+        return ' '.join(str(value).split()).lower() if value else None
+
+    def cents(value):
+        return int(round(float(value) * 100)) if value not in (None, '') else None
+
+    return {
+        'product_name': name(body.get('product_name')),
+        'set_name': name(body.get('set_name')),
+        'sealed_price': cents(body.get('sealed_price')),
+        'simulations': int(body['simulations']) if body.get('simulations') is not None else None,
+        'seed': int(body['seed']) if body.get('seed') is not None else None,
+        'top_k': int(body['top_k']) if body.get('top_k') else None,
+        'min_price': cents(body.get('min_price'))
+    }
+
+
+def result_key(normalized, snapshot_version):
+    """Content address of a normalized request at a snapshot version"""
+    payload = json.dumps([normalized, snapshot_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def snapshot_version(table, now=None):
+    """Current data snapshot version (0 before the first bump)"""
+    now = now or time.time()
+    if _snapshot['version'] is None or now - _snapshot['checked'] >= SNAPSHOT_CHECK_SECONDS:
+        item = table.get_item(Key=SNAPSHOT_KEY).get('Item', {})
+        _snapshot['version'] = int(item.get('version', 0))
+        _snapshot['checked'] = now
+    return _snapshot['version']
+
+
+def bump_snapshot(table):
+    """Advance the snapshot version, retiring every cached result"""
+    response = table.update_item(
+        Key=SNAPSHOT_KEY,
+        UpdateExpression='SET #ts = :ts ADD version :one',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues={':one': 1, ':ts': int(time.time())},
+        ReturnValues='UPDATED_NEW'
+    )
+    _snapshot['version'] = int(response['Attributes']['version'])
+    _snapshot['checked'] = time.time()
+    return _snapshot['version']
+
+
+class ResultCache:
+    """/analyze results by content address, stored in a TieredCache"""
+
+    def __init__(self, cache, table, ttl=RESULT_TTL, on_version=None):
+        self.cache = cache
+        self.table = table
+        self.ttl = ttl
+        # Called with the snapshot version a key is built from, before the
+        # result is computed, so per-container state can catch up to it
+        self.on_version = on_version
+
+    def key(self, body):
+        """Cache key of a request body, or None if the version can't be read"""
+        try:
+            version = snapshot_version(self.table)
+            if self.on_version:
+                self.on_version(version)
+            return result_key(normalize_request(body), version)
+        except Exception as e:
+            print(f"Result cache key error: {str(e)}")
+            return None
+
+    def get(self, key):
+        return self.cache.get(RESULT_NAMESPACE, key) if key else None
+
+    def put(self, key, analysis):
+        if key:
+            # Cache the serialized form so later mutation of the dict can't leak in
+            value = json.loads(json.dumps(analysis, default=str))
+            self.cache.set(RESULT_NAMESPACE, key, value, ttl=self.ttl)
@@ -0,0 +1,209 @@
+"""
+Time-bucketed rollups of analysis history.
+
+Every stored analysis is folded into one hourly and one daily bucket of
+its set (pk='ROLLUP#<set_id>', sk='HOUR#2025-01-02T10' / 'DAY#2025-01-02',
+UTC). A bucket holds the count and, per metric (open EV, sealed price,
+open ROI %), the sum, min and max, so a 90-day chart is one Query of ~90
+small items rather than a page through every raw analysis row.
+
+The count and sums are atomic UpdateItem ADDs. DynamoDB has no min/max
+update, so the same update seeds them with if_not_exists and returns the
+bucket; only when the new value beats the stored extreme is a second,
+conditional SET issued, and a lost race just means someone else stored a
+better one. Hourly buckets expire after HOURLY_RETENTION_DAYS via TTL.
+
+Buckets are maintained by the stream processor, which groups a batch of
+records per bucket and applies each group with one update. Each bucket
+stores the last stream sequence number it applied; the update is
+conditional on it, and when a redelivered group overlaps records already
+applied, the bucket is re-read and only the records past last_seq are
+added.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from write_behind import to_dynamo
+
+ROLLUP_PK_PREFIX = 'ROLLUP#'
+
+HOURLY_RETENTION_DAYS = 14
+
+# name -> (sk prefix, bucket format, seconds kept or None)
+GRANULARITIES = {
+    'hour': ('HOUR#', '%Y-%m-%dT%H', HOURLY_RETENTION_DAYS * 86400),
+    'day': ('DAY#', '%Y-%m-%d', None),
+}
+
+METRICS = ('ev', 'sealed', 'roi')
+
+# Conditional bucket updates attempted before giving up
+SEQUENCE_RETRIES = 3
+
+
+def rollup_values(analysis):
+    """Metric values of one analysis"""
+    return {
+        'ev': analysis['pricing']['expected_value_open'],
+        'sealed': analysis['pricing']['sealed_box_cost'],
+        'roi': analysis['roi']['open']['percent']
+    }
+
+
+def bucket_key(granularity, timestamp):
+    """Sort key of the bucket holding an epoch timestamp"""
+    prefix, fmt, _ = GRANULARITIES[granularity]
+    return prefix + datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(fmt)
+
+
+def _tighten(table, key, field, value, beats):
+    """Conditionally replace a stored min/max that value beats"""
+    from botocore.exceptions import ClientError
+
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression=f"SET {field} = :v",
+            ConditionExpression=f"{field} {beats} :v",
+            ExpressionAttributeValues={':v': value}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def group_values(samples):
+    """Summed metric values and extremes of several analyses' rollup_values"""
+    values = {}
+    for metric in METRICS:
+        column = [sample[metric] for sample in samples]
+        values[metric] = sum(column)
+        values[f'{metric}_min'] = min(column)
+        values[f'{metric}_max'] = max(column)
+    return values
+
+
+def _update_bucket(table, key, set_id, values, count, timestamp, retention, sequences=None):
+    """
+    ADD values (sums over count analyses) to a bucket, seeding its min/max,
+    and return the updated bucket. With sequences, the update only applies
+    if the bucket's last_seq is before all of them.
+    """
+    sets = ['set_id = :set_id']
+    adds = ['#count :count']
+    names = {'#count': 'count'}
+    expression_values = {':set_id': set_id, ':count': count}
+    for metric in METRICS:
+        sets.append(f"{metric}_min = if_not_exists({metric}_min, :{metric}_lo)")
+        sets.append(f"{metric}_max = if_not_exists({metric}_max, :{metric}_hi)")
+        adds.append(f"{metric}_sum :{metric}")
+        expression_values[f':{metric}'] = values[metric]
+        expression_values[f':{metric}_lo'] = values[f'{metric}_min']
+        expression_values[f':{metric}_hi'] = values[f'{metric}_max']
+    if retention:
+        sets.append('#ttl = :ttl')
+        names['#ttl'] = 'ttl'
+        expression_values[':ttl'] = timestamp + retention
+
+    kwargs = {}
+    if sequences:
+        sets.append('last_seq = :last_seq')
+        expression_values[':first_seq'] = sequences[0]
+        expression_values[':last_seq'] = sequences[-1]
+        kwargs['ConditionExpression'] = 'attribute_not_exists(last_seq) OR last_seq < :first_seq'
+
+    return table.update_item(
+        Key=key,
+        UpdateExpression=f"SET {', '.join(sets)} ADD {', '.join(adds)}",
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=expression_values,
+        ReturnValues='ALL_NEW',
+        **kwargs
+    )['Attributes']
+
+
+def record_rollup(table, set_id, samples, timestamp=None, sequences=None):
+    """
+    Fold analyses' rollup_values (samples) into the set's hourly and daily
+    buckets of timestamp.
+
+    sequences, the samples' zero-padded stream sequence numbers in
+    ascending order, makes the update idempotent per record: samples at or
+    before a bucket's last_seq are already in it and are left out. The
+    group's min/max are always tightened, which is safe to repeat.
+    Returns the number of buckets updated.
+    """
+    from botocore.exceptions import ClientError
+
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    samples = [to_dynamo(dict(sample)) for sample in samples]
+    extremes = group_values(samples)
+    applied = 0
+
+    for granularity, (_, _, retention) in GRANULARITIES.items():
+        key = {'pk': f"{ROLLUP_PK_PREFIX}{set_id}", 'sk': bucket_key(granularity, timestamp)}
+        pending = list(range(len(samples)))
+        bucket = None
+        for _ in range(SEQUENCE_RETRIES):
+            if not pending:
+                break  # Every sample already applied - redelivered records
+            try:
+                bucket = _update_bucket(
+                    table, key, set_id, group_values([samples[i] for i in pending]),
+                    len(pending), timestamp, retention,
+                    [sequences[i] for i in pending] if sequences else None
+                )
+                applied += 1
+                break
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+            # Part of the group was applied before - keep only the samples past last_seq
+            bucket = table.get_item(Key=key, ConsistentRead=True).get('Item')
+            last_seq = bucket.get('last_seq') if bucket else None
+            pending = [i for i in pending if last_seq is None or sequences[i] > last_seq]
+        else:
+            raise RuntimeError(f"Concurrent rollup updates to {key['sk']} of {set_id}, gave up")
+
+        for metric in METRICS:
+            low, high = extremes[f'{metric}_min'], extremes[f'{metric}_max']
+            if bucket is None or low < bucket[f'{metric}_min']:
+                _tighten(table, key, f'{metric}_min', low, '>')
+            if bucket is None or high > bucket[f'{metric}_max']:
+                _tighten(table, key, f'{metric}_max', high, '<')
+
+    return applied
+
+
+def _summary(item):
+    count = int(item['count'])
+    summary = {'bucket': item['sk'].split('#', 1)[1], 'count': count}
+    for metric in METRICS:
+        summary[metric] = {
+            'mean': round(float(item[f'{metric}_sum']) / count, 2) if count else None,
+            'min': float(item[f'{metric}_min']),
+            'max': float(item[f'{metric}_max'])
+        }
+    return summary
+
+
+def read_rollups(table, set_id, granularity='day', since=None, until=None):
+    """Bucket summaries of a set between two epoch timestamps, oldest first"""
+    until = until or time.time()
+    since = since if since is not None else until - 90 * 86400
+    kwargs = {
+        'KeyConditionExpression': 'pk = :pk AND sk BETWEEN :start AND :end',
+        'ExpressionAttributeValues': {
+            ':pk': f"{ROLLUP_PK_PREFIX}{set_id}",
+            ':start': bucket_key(granularity, since),
+            ':end': bucket_key(granularity, until)
+        }
+    }
+    buckets = []
+    while True:
+        response = table.query(**kwargs)
+        buckets.extend(_summary(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return buckets
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,154 @@
+"""
+Monte Carlo box-opening simulator - samples many booster boxes at once with
+batched NumPy draws and summarizes the spread of box values.
+
+Packs follow the slot model in pack_model.py. Cards under the minimum card
+value count as zero, as in the EV calculation. Slots that hold tracked
+chase cards are sampled pull by pull; the per-box total of every other slot
+is drawn once per box from its exact convolved distribution.
+"""
+
+import numpy as np
+
+from box_distribution import fit_bucket_cents, slot_pmf, sum_pmf
+from pack_model import build_pack_slots, pack_layout
+from rarity import rarity_name
+
+# Reported box-value percentiles
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# ~27 ms for a 220-card catalog; 100000 took ~175 ms, most of the 200 ms budget
+DEFAULT_BOXES = 20000
+# Upper bound on boxes per request - memory and time grow linearly with it
+MAX_BOXES = 1000000
+MAX_SEED = 2 ** 32
+DEFAULT_CHASE_CARDS = 5
+
+
+def alias_table(probs):
+    """
+    Walker alias table for O(1) sampling from a categorical distribution.
+    Returns (accept, alias) arrays of the same length as probs.
+    """
+    n = len(probs)
+    scaled = probs * (n / probs.sum())
+    accept = np.ones(n)
+    alias = np.arange(n)
+
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        accept[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+
+    return accept, alias
+
+
+def draw_categorical(table, size, rng):
+    """Draw size samples from an alias table using one uniform per sample"""
+    accept, alias = table
+    u = rng.random(size) * len(accept)
+    column = u.astype(np.int64)
+    return np.where(u - column < accept[column], column, alias[column])
+
+
+def sample_slot_pulls(slot, n_pulls, n_boxes, rng):
+    """
+    Sample every valuable pull of a slot across n_boxes boxes.
+
+    Instead of drawing every card, draws the number of valuable pulls per
+    box from a binomial, then only those pulls from the conditional card
+    distribution. Returns (box_idx, pulled) - the box and slot position of
+    each valuable pull.
+    """
+    probs = slot['probs']
+    p_valuable = float(probs.sum())
+    if p_valuable <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    counts = rng.binomial(n_pulls, min(p_valuable, 1.0), size=n_boxes)
+    box_idx = np.repeat(np.arange(n_boxes), counts)
+    return box_idx, draw_categorical(alias_table(probs), box_idx.size, rng)
+
+
+def sample_slot_totals(slot, n_pulls, n_boxes, rng):
+    """Sample the total value of n_pulls pulls of a slot for each box"""
+    bucket_cents = fit_bucket_cents([(slot, n_pulls)])
+    cdf = np.cumsum(sum_pmf([(slot_pmf(slot, bucket_cents), n_pulls)]))
+    buckets = np.searchsorted(cdf, rng.random(n_boxes) * cdf[-1], side='right')
+    return np.minimum(buckets, len(cdf) - 1) * bucket_cents / 100
+
+
+def sample_box_values(slots, packs_per_box, n_boxes, rng, track=()):
+    """
+    Sample box values for n_boxes boxes. Returns (box_values, hits) where
+    hits is a boolean (n_boxes, len(track)) matrix marking boxes that
+    pulled each tracked catalog card in a regular (non-reverse) slot.
+    """
+    box_values = np.zeros(n_boxes)
+    hits = np.zeros((n_boxes, len(track)), dtype=bool)
+    position = {card: pos for pos, card in enumerate(track)}
+
+    for slot in slots:
+        n_pulls = packs_per_box * slot['count']
+        slot_position = np.array([
+            position.get(i, -1) if slot['price'] == 'price' else -1
+            for i in slot['indices']
+        ], dtype=np.int64)
+
+        if not (slot_position >= 0).any():
+            box_values += sample_slot_totals(slot, n_pulls, n_boxes, rng)
+            continue
+
+        box_idx, pulled = sample_slot_pulls(slot, n_pulls, n_boxes, rng)
+        box_values += np.bincount(box_idx, weights=slot['values'][pulled], minlength=n_boxes)
+
+        tracked = slot_position[pulled]
+        mask = tracked >= 0
+        hits[box_idx[mask], tracked[mask]] = True
+
+    return box_values, hits
+
+
+def simulate_boxes(catalog, pull_rates, sealed_price, packs_per_box,
+                   n_boxes=DEFAULT_BOXES, seed=None, min_card_value=0.0,
+                   chase_count=DEFAULT_CHASE_CARDS, set_id=None, cards_per_pack=None):
+    """Simulate opening n_boxes boxes and summarize the box-value distribution"""
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    rng = np.random.default_rng(seed)
+
+    slots = build_pack_slots(catalog, pull_rates, pack_layout(set_id),
+                             min_card_value, cards_per_pack)
+
+    # Chase cards: the most valuable cards that can be pulled
+    candidates = {int(i) for slot in slots if slot['price'] == 'price' for i in slot['indices']}
+    track = sorted(candidates, key=lambda i: (-catalog[i]['price'], i))[:chase_count]
+
+    box_values, hits = sample_box_values(slots, packs_per_box, n_boxes, rng, track)
+    pcts = np.percentile(box_values, PERCENTILES)
+
+    chase_cards = []
+    for pos, i in enumerate(track):
+        card = catalog[i]
+        chase_cards.append({
+            'name': card['name'],
+            'rarity': rarity_name(card['rarity_code']),
+            'price': round(float(card['price']), 2),
+            'hit_probability': round(float(hits[:, pos].mean()), 4)
+        })
+
+    return {
+        'boxes_simulated': n_boxes,
+        'seed': seed,
+        'packs_per_box': packs_per_box,
+        'mean': round(float(box_values.mean()), 2),
+        'std': round(float(box_values.std()), 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, pcts)},
+        'prob_loss': round(float((box_values < sealed_price).mean()), 4),
+        'chase_cards': chase_cards
+    }
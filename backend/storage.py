@@ -0,0 +1,756 @@
+"""
+Storage backends for the analytics table.
+
+Every data path talks to the table through the subset of boto3's Table
+API it already uses: get_item, put_item, delete_item, update_item (with
+condition, SET/ADD/REMOVE and ReturnValues), query (key conditions,
+sort order, Limit/ExclusiveStartKey, the timestamp-index GSI,
+ProjectionExpression, FilterExpression), scan (with Segment/
+TotalSegments) and meta.client.batch_get_item / batch_write_item. That
+subset is the storage interface; three backends provide it:
+
+  dynamodb - the boto3 Table itself
+  sqlite   - one SQLite file, for offline runs that persist
+  memory   - a per-process dict, for tests and benchmarks
+
+STORAGE_BACKEND selects one (default dynamodb); STORAGE_PATH is the
+SQLite file. The offline backends evaluate the DynamoDB expression
+syntax themselves, store numbers as Decimal and reject floats as boto3
+does, and raise botocore's ClientError with
+ConditionalCheckFailedException when a condition fails, so callers
+behave the same on every backend. Expressions may be strings or boto3
+Key()/Attr() conditions, which are built into strings as boto3 does.
+SQLite stores every value in a one-key {type: payload} envelope, so a
+map whose only key is 'N', 'S' or 'B' is never mistaken for a number,
+string or binary.
+"""
+
+import base64
+import bisect
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from decimal import Decimal
+
+DEFAULT_SQLITE_PATH = '/tmp/pokemon-tcg-analytics.db'
+
+# Keys read per step of an offline scan walk
+SCAN_CHUNK = 256
+
+# Global secondary indexes: name -> (partition key, sort key)
+INDEXES = {'timestamp-index': ('pk', 'timestamp')}
+
+
+# --- values ---
+
+def _normalize(value):
+    """Item value as boto3 would store it (numbers become Decimal)"""
+    if isinstance(value, bool) or value is None or isinstance(value, (str, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if hasattr(value, 'value') and isinstance(value.value, (bytes, bytearray)):
+        return bytes(value.value)  # boto3 Binary
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return {_normalize(v) for v in value}
+    raise TypeError(f"Unsupported item value type {type(value).__name__}")
+
+
+def _conditional_check_failed(operation):
+    from botocore.exceptions import ClientError
+    return ClientError(
+        {'Error': {'Code': 'ConditionalCheckFailedException',
+                   'Message': 'The conditional request failed'}},
+        operation
+    )
+
+
+# --- expressions ---
+
+_TOKEN = re.compile(
+    r'\s*(<>|<=|>=|[=<>(),+\-]|[#:]?[A-Za-z_][A-Za-z0-9_]*(?:\.#?[A-Za-z_][A-Za-z0-9_]*)*)'
+)
+_MISSING = object()
+
+
+def _tokenize(expression):
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match:
+            raise ValueError(f"Invalid expression near: {expression[position:]!r}")
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for condition, key and update expressions"""
+
+    def __init__(self, expression, names, values):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected and token.upper() != expected):
+            raise ValueError(f"Expected {expected or 'token'}, got {token!r}")
+        self.position += 1
+        return token
+
+    # Operands
+    def path(self):
+        token = self.take()
+        if token.startswith(':'):
+            raise ValueError(f"Expected attribute name, got {token}")
+        # Nested paths ('#a.#b') resolve each placeholder
+        return '.'.join(self.names.get(part, part) if part.startswith('#') else part
+                        for part in token.split('.'))
+
+    def operand(self):
+        token = self.peek()
+        if token.startswith(':'):
+            self.take()
+            value = self.values[token]
+            return ('value', value)
+        if token in ('if_not_exists', 'list_append', 'size'):
+            self.take()
+            self.take('(')
+            args = [self.operand()]
+            while self.peek() == ',':
+                self.take()
+                args.append(self.operand())
+            self.take(')')
+            return (token, args)
+        return ('path', self.path())
+
+    # Conditions
+    def condition(self):
+        node = self.conjunction()
+        while self.peek() and self.peek().upper() == 'OR':
+            self.take()
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.peek() and self.peek().upper() == 'AND':
+            self.take()
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.peek() and self.peek().upper() == 'NOT':
+            self.take()
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self):
+        token = self.peek()
+        if token == '(':
+            self.take()
+            node = self.condition()
+            self.take(')')
+            return node
+        if token in ('attribute_exists', 'attribute_not_exists', 'begins_with', 'contains'):
+            self.take()
+            self.take('(')
+            args = [self.operand()]
+            while self.peek() == ',':
+                self.take()
+                args.append(self.operand())
+            self.take(')')
+            return (token, args)
+
+        left = self.operand()
+        operator = self.take()
+        if operator.upper() == 'BETWEEN':
+            low = self.operand()
+            self.take('AND')
+            return ('between', left, low, self.operand())
+        if operator.upper() == 'IN':
+            self.take('(')
+            options = [self.operand()]
+            while self.peek() == ',':
+                self.take()
+                options.append(self.operand())
+            self.take(')')
+            return ('in', left, options)
+        if operator not in ('=', '<>', '<', '<=', '>', '>='):
+            raise ValueError(f"Unsupported operator {operator}")
+        return ('compare', operator, left, self.operand())
+
+    def done(self):
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected token {self.peek()!r}")
+
+
+def _resolve(operand, item):
+    kind, payload = operand
+    if kind == 'value':
+        return payload
+    if kind == 'path':
+        value = item
+        for part in payload.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                return _MISSING
+            value = value[part]
+        return value
+    if kind == 'if_not_exists':
+        current = _resolve(payload[0], item)
+        return _resolve(payload[1], item) if current is _MISSING else current
+    if kind == 'list_append':
+        return list(_resolve(payload[0], item)) + list(_resolve(payload[1], item))
+    if kind == 'size':
+        value = _resolve(payload[0], item)
+        return _MISSING if value is _MISSING else Decimal(len(value))
+    raise ValueError(f"Unsupported operand {kind}")
+
+
+def _compare(operator, left, right):
+    if left is _MISSING or right is _MISSING:
+        return operator == '<>' and not (left is _MISSING and right is _MISSING)
+    if operator in ('=', '<>'):
+        return (left == right) == (operator == '=')
+    if isinstance(left, (Decimal, int)) != isinstance(right, (Decimal, int)) \
+            or (not isinstance(left, (Decimal, int)) and type(left) is not type(right)):
+        return False  # DynamoDB never orders values of different types
+    return {'<': left < right, '<=': left <= right,
+            '>': left > right, '>=': left >= right}[operator]
+
+
+def _evaluate(node, item):
+    kind = node[0]
+    if kind == 'or':
+        return _evaluate(node[1], item) or _evaluate(node[2], item)
+    if kind == 'and':
+        return _evaluate(node[1], item) and _evaluate(node[2], item)
+    if kind == 'not':
+        return not _evaluate(node[1], item)
+    if kind == 'compare':
+        return _compare(node[1], _resolve(node[2], item), _resolve(node[3], item))
+    if kind == 'between':
+        value = _resolve(node[1], item)
+        return (_compare('>=', value, _resolve(node[2], item))
+                and _compare('<=', value, _resolve(node[3], item)))
+    if kind == 'in':
+        value = _resolve(node[1], item)
+        return any(_compare('=', value, _resolve(option, item)) for option in node[2])
+    args = [_resolve(arg, item) for arg in node[1]]
+    if kind == 'attribute_exists':
+        return args[0] is not _MISSING
+    if kind == 'attribute_not_exists':
+        return args[0] is _MISSING
+    if kind == 'begins_with':
+        return isinstance(args[0], (str, bytes)) and args[0].startswith(args[1])
+    if kind == 'contains':
+        return args[0] is not _MISSING and args[1] in args[0]
+    raise ValueError(f"Unsupported condition {kind}")
+
+
+def _expression_string(expression, names, values, is_key_condition=False):
+    """
+    (expression, names, values) for a string expression, or for a boto3
+    Key()/Attr() condition built into one as boto3 does
+    """
+    if isinstance(expression, str):
+        return expression, names, values
+    if hasattr(expression, 'get_expression'):
+        from boto3.dynamodb.conditions import ConditionExpressionBuilder
+        built = ConditionExpressionBuilder().build_expression(
+            expression, is_key_condition=is_key_condition)
+        return (built.condition_expression,
+                dict(names or {}, **built.attribute_name_placeholders),
+                dict(values or {}, **built.attribute_value_placeholders))
+    raise TypeError(f"Expression must be a string or a boto3 condition, "
+                    f"not {type(expression).__name__}")
+
+
+def parse_condition(expression, names=None, values=None, is_key_condition=False):
+    """Condition/filter/key-condition expression (string or boto3 condition) -> evaluable tree"""
+    expression, names, values = _expression_string(expression, names, values, is_key_condition)
+    parser = _Parser(expression, names, _normalize(values or {}))
+    node = parser.condition()
+    parser.done()
+    return node
+
+
+def matches(expression, item, names=None, values=None):
+    """True if item satisfies a DynamoDB condition expression"""
+    return _evaluate(parse_condition(expression, names, values), item)
+
+
+def apply_update(item, expression, names=None, values=None):
+    """Apply a SET/ADD/REMOVE update expression to item in place; returns updated names"""
+    parser = _Parser(expression, names, _normalize(values or {}))
+    updated = []
+    while parser.peek():
+        clause = parser.take().upper()
+        while True:
+            path = parser.path()
+            if clause == 'SET':
+                parser.take('=')
+                value = _resolve(parser.operand(), item)
+                if parser.peek() in ('+', '-'):
+                    sign = parser.take()
+                    other = _resolve(parser.operand(), item)
+                    value = value + other if sign == '+' else value - other
+                item[path] = value
+            elif clause == 'ADD':
+                value = _resolve(parser.operand(), item)
+                current = item.get(path)
+                if isinstance(value, set):
+                    item[path] = (current or set()) | value
+                else:
+                    item[path] = (current or Decimal(0)) + value
+            elif clause == 'REMOVE':
+                item.pop(path, None)
+            elif clause == 'DELETE':
+                value = _resolve(parser.operand(), item)
+                item[path] = (item.get(path) or set()) - value
+            else:
+                raise ValueError(f"Unsupported update clause {clause}")
+            updated.append(path)
+            if parser.peek() != ',':
+                break
+            parser.take()
+    return updated
+
+
+def project(item, projection, names=None):
+    """Copy of item restricted to a ProjectionExpression"""
+    if not projection:
+        return item
+    fields = [part.strip() for part in projection.split(',')]
+    fields = [(names or {}).get(field, field) for field in fields]
+    return {field: item[field] for field in fields if field in item}
+
+
+def _sort_bounds(node, sort_key):
+    """Inclusive (low, high) bounds a key condition puts on the sort key"""
+    if node[0] == 'between' and node[1] == ('path', sort_key):
+        return node[2][1], node[3][1]
+    if node[0] == 'begins_with' and node[1][0] == ('path', sort_key):
+        prefix = node[1][1][1]
+        return prefix, prefix + '\U0010ffff'
+    if node[0] == 'compare' and node[2] == ('path', sort_key):
+        operator, value = node[1], node[3][1]
+        if operator == '=':
+            return value, value
+        if operator in ('<', '<='):
+            return None, value
+        if operator in ('>', '>='):
+            return value, None
+    raise ValueError('Unsupported sort key condition')
+
+
+def split_key_condition(expression, names, values, partition_key, sort_key):
+    """(partition value, sort bounds, condition tree) of a KeyConditionExpression"""
+    node = parse_condition(expression, names, values, is_key_condition=True)
+    parts = [node[1], node[2]] if node[0] == 'and' else [node]
+    partition_value, bounds = None, (None, None)
+    for part in parts:
+        if part[0] == 'compare' and part[1] == '=' and part[2] == ('path', partition_key):
+            partition_value = part[3][1]
+        else:
+            bounds = _sort_bounds(part, sort_key)
+    if partition_value is None:
+        raise ValueError(f"Key condition must fix {partition_key}")
+    return partition_value, bounds, node
+
+
+# --- backends ---
+
+class _BatchClient:
+    """meta.client stand-in with the batch calls the code uses"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def batch_write_item(self, RequestItems):
+        for requests in RequestItems.values():
+            for request in requests:
+                if 'PutRequest' in request:
+                    self.store.put_item(Item=request['PutRequest']['Item'])
+                else:
+                    self.store.delete_item(Key=request['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {}}
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for name, request in RequestItems.items():
+            found = []
+            for key in request['Keys']:
+                item = self.store.get_item(
+                    Key=key,
+                    ProjectionExpression=request.get('ProjectionExpression'),
+                    ExpressionAttributeNames=request.get('ExpressionAttributeNames')
+                ).get('Item')
+                if item is not None:
+                    found.append(item)
+            responses[name] = found
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class _Meta:
+    def __init__(self, store):
+        self.client = _BatchClient(store)
+
+
+class ItemStore:
+    """
+    Table API over the primitives a backend supplies: _load(pk, sk),
+    _save(item), _remove(pk, sk), _partition(pk, sort_field, low, high),
+    which returns a partition's items ordered by sort_field (within
+    inclusive bounds), and _all(after) with _materialize(stored), which
+    lazily walk every (pk, sk, stored) past the key after, in key order,
+    and turn a stored entry into an item. A scan page therefore costs
+    the rows it reads, not the size of the table. Read-modify-write calls
+    run under one lock.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.meta = _Meta(self)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(key):
+        return key['pk'], key['sk']
+
+    def get_item(self, Key, ConsistentRead=False, ProjectionExpression=None,
+                 ExpressionAttributeNames=None):
+        item = self._load(*self._key(Key))
+        if item is None:
+            return {}
+        return {'Item': project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None):
+        item = _normalize(Item)
+        with self._lock:
+            if ConditionExpression:
+                current = self._load(*self._key(item)) or {}
+                if not matches(ConditionExpression, current,
+                               ExpressionAttributeNames, ExpressionAttributeValues):
+                    raise _conditional_check_failed('PutItem')
+            self._save(item)
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None):
+        with self._lock:
+            if ConditionExpression:
+                current = self._load(*self._key(Key)) or {}
+                if not matches(ConditionExpression, current,
+                               ExpressionAttributeNames, ExpressionAttributeValues):
+                    raise _conditional_check_failed('DeleteItem')
+            self._remove(*self._key(Key))
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues='NONE'):
+        with self._lock:
+            current = self._load(*self._key(Key))
+            if ConditionExpression and not matches(ConditionExpression, current or {},
+                                                   ExpressionAttributeNames,
+                                                   ExpressionAttributeValues):
+                raise _conditional_check_failed('UpdateItem')
+            item = current or dict(_normalize(Key))
+            updated = apply_update(item, UpdateExpression,
+                                   ExpressionAttributeNames, ExpressionAttributeValues)
+            self._save(item)
+
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        if ReturnValues == 'UPDATED_NEW':
+            return {'Attributes': {name: copy.deepcopy(item[name])
+                                   for name in updated if name in item}}
+        if ReturnValues == 'ALL_OLD':
+            return {'Attributes': current or {}}
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues=None,
+              ExpressionAttributeNames=None, IndexName=None, ScanIndexForward=True,
+              Limit=None, ExclusiveStartKey=None, ProjectionExpression=None,
+              FilterExpression=None, ConsistentRead=False):
+        partition_key, sort_key = INDEXES[IndexName] if IndexName else ('pk', 'sk')
+        partition_value, (low, high), key_node = split_key_condition(
+            KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+            partition_key, sort_key
+        )
+        filter_node = parse_condition(FilterExpression, ExpressionAttributeNames,
+                                      ExpressionAttributeValues) if FilterExpression else None
+
+        items = self._partition(partition_value, sort_key, low, high)
+        if not ScanIndexForward:
+            items.reverse()
+
+        def position(item):
+            return (item[sort_key], item['sk']) if IndexName else (item['sk'],)
+
+        if ExclusiveStartKey:
+            start = position(_normalize(ExclusiveStartKey))
+            items = [item for item in items
+                     if (position(item) > start if ScanIndexForward else position(item) < start)]
+
+        results, evaluated, last = [], 0, None
+        for item in items:
+            if not _evaluate(key_node, item):
+                continue
+            evaluated += 1
+            last = item
+            if filter_node is None or _evaluate(filter_node, item):
+                results.append(project(item, ProjectionExpression, ExpressionAttributeNames))
+            if Limit and evaluated >= Limit:
+                break
+
+        response = {'Items': results, 'Count': len(results), 'ScannedCount': evaluated}
+        if Limit and evaluated >= Limit and last is not items[-1]:
+            response['LastEvaluatedKey'] = {
+                name: last[name] for name in {'pk', 'sk', partition_key, sort_key}
+            }
+        return response
+
+    def scan(self, Segment=0, TotalSegments=1, Limit=None, ExclusiveStartKey=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None,
+             FilterExpression=None, ExpressionAttributeValues=None, IndexName=None,
+             ConsistentRead=False):
+        filter_node = parse_condition(FilterExpression, ExpressionAttributeNames,
+                                      ExpressionAttributeValues) if FilterExpression else None
+        start = (ExclusiveStartKey['pk'], ExclusiveStartKey['sk']) if ExclusiveStartKey else None
+
+        results, count, last = [], 0, None
+        for pk, sk, stored in self._all(after=start):
+            # Segments split the key space by partition key hash
+            if zlib.crc32(pk.encode('utf-8')) % TotalSegments != Segment:
+                continue
+            if Limit and count >= Limit:
+                return {'Items': results, 'Count': len(results),
+                        'LastEvaluatedKey': {'pk': last[0], 'sk': last[1]}}
+            item = self._materialize(stored)
+            if IndexName and INDEXES[IndexName][1] not in item:
+                continue
+            count += 1
+            last = (pk, sk)
+            if filter_node is None or _evaluate(filter_node, item):
+                results.append(project(item, ProjectionExpression, ExpressionAttributeNames))
+
+        return {'Items': results, 'Count': len(results)}
+
+
+class MemoryStorage(ItemStore):
+    """
+    Items in a dict of partitions, plus a sorted list of every (pk, sk)
+    for scans - nothing persists past the process
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._partitions = {}
+        self._keys = []
+
+    def _load(self, pk, sk):
+        item = self._partitions.get(pk, {}).get(sk)
+        return copy.deepcopy(item) if item is not None else None
+
+    def _save(self, item):
+        with self._lock:
+            partition = self._partitions.setdefault(item['pk'], {})
+            if item['sk'] not in partition:
+                bisect.insort(self._keys, (item['pk'], item['sk']))
+            partition[item['sk']] = copy.deepcopy(item)
+
+    def _remove(self, pk, sk):
+        with self._lock:
+            if self._partitions.get(pk, {}).pop(sk, None) is not None:
+                del self._keys[bisect.bisect_left(self._keys, (pk, sk))]
+
+    def _partition(self, pk, sort_field, low, high):
+        with self._lock:
+            items = [copy.deepcopy(item) for item in self._partitions.get(pk, {}).values()
+                     if sort_field in item]
+        items = [item for item in items
+                 if (low is None or _compare('>=', item[sort_field], low))
+                 and (high is None or _compare('<=', item[sort_field], high))]
+        items.sort(key=lambda item: (item[sort_field], item['sk']))
+        return items
+
+    def _all(self, after=None):
+        # Resume from the last key yielded, so writes between chunks are seen
+        while True:
+            with self._lock:
+                start = bisect.bisect_right(self._keys, after) if after is not None else 0
+                chunk = [(pk, sk, self._partitions[pk][sk])
+                         for pk, sk in self._keys[start:start + SCAN_CHUNK]]
+            yield from chunk
+            if len(chunk) < SCAN_CHUNK:
+                return
+            after = chunk[-1][:2]
+
+    @staticmethod
+    def _materialize(stored):
+        return copy.deepcopy(stored)
+
+
+def _encode_value(value):
+    """Item value -> JSON, always as a one-key {type: payload} envelope"""
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, Decimal):
+        return {'N': str(value)}
+    if isinstance(value, bytes):
+        return {'B': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, set):
+        return {'SS': sorted(value)} if all(
+            isinstance(v, str) for v in value) else {'NS': sorted(str(v) for v in value)}
+    if isinstance(value, dict):
+        return {'M': {k: _encode_value(v) for k, v in value.items()}}
+    if isinstance(value, list):
+        return {'L': [_encode_value(v) for v in value]}
+    raise TypeError(f"Unsupported item value type {type(value).__name__}")
+
+
+_DECODERS = {
+    'BOOL': lambda payload: payload,
+    'NULL': lambda payload: None,
+    'S': lambda payload: payload,
+    'N': Decimal,
+    'B': base64.b64decode,
+    'SS': set,
+    'NS': lambda payload: {Decimal(v) for v in payload},
+    'M': lambda payload: {k: _decode_value(v) for k, v in payload.items()},
+    'L': lambda payload: [_decode_value(v) for v in payload],
+}
+
+
+def _decode_value(value):
+    # Files written before the envelope kept strings, booleans and null bare
+    if not isinstance(value, dict):
+        return value
+    (kind, payload), = value.items()
+    return _DECODERS[kind](payload)
+
+
+class SQLiteStorage(ItemStore):
+    """
+    Items as JSON in one SQLite table keyed by (pk, sk), with the timestamp
+    attribute in its own indexed column for timestamp-index queries
+    """
+
+    def __init__(self, name, path=DEFAULT_SQLITE_PATH):
+        super().__init__(name)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            'pk TEXT NOT NULL, sk TEXT NOT NULL, ts REAL, item TEXT NOT NULL, '
+            'PRIMARY KEY (pk, sk))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS items_ts ON items (pk, ts)')
+
+    @staticmethod
+    def _decode(row):
+        return {k: _decode_value(v) for k, v in json.loads(row[0]).items()}
+
+    def _load(self, pk, sk):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT item FROM items WHERE pk = ? AND sk = ?', (pk, sk)
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def _save(self, item):
+        timestamp = item.get('timestamp')
+        encoded = json.dumps({k: _encode_value(v) for k, v in item.items()})
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO items (pk, sk, ts, item) VALUES (?, ?, ?, ?)',
+                (item['pk'], item['sk'],
+                 float(timestamp) if isinstance(timestamp, Decimal) else None, encoded)
+            )
+
+    def _remove(self, pk, sk):
+        with self._lock:
+            self._db.execute('DELETE FROM items WHERE pk = ? AND sk = ?', (pk, sk))
+
+    def _partition(self, pk, sort_field, low, high):
+        column = {'sk': 'sk', 'timestamp': 'ts'}[sort_field]
+        sql = f'SELECT item FROM items WHERE pk = ? AND {column} IS NOT NULL'
+        params = [pk]
+        if low is not None:
+            sql += f' AND {column} >= ?'
+            params.append(float(low) if column == 'ts' else low)
+        if high is not None:
+            sql += f' AND {column} <= ?'
+            params.append(float(high) if column == 'ts' else high)
+        sql += f' ORDER BY {column}, sk'
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _all(self, after=None):
+        # Keyset pages off the primary key; rows are decoded only when a
+        # scan keeps them (_materialize)
+        while True:
+            sql, params = 'SELECT pk, sk, item FROM items', ()
+            if after is not None:
+                sql, params = sql + ' WHERE (pk, sk) > (?, ?)', tuple(after)
+            with self._lock:
+                rows = self._db.execute(sql + ' ORDER BY pk, sk LIMIT ?',
+                                        params + (SCAN_CHUNK,)).fetchall()
+            yield from rows
+            if len(rows) < SCAN_CHUNK:
+                return
+            after = rows[-1][:2]
+
+    def _materialize(self, stored):
+        return self._decode((stored,))
+
+
+# One offline store per table (and file), shared by everything in the
+# process so read-modify-write calls serialize on the same lock
+_offline_stores = {}
+
+
+def storage_from_env(table_name=None):
+    """Table-API storage selected by STORAGE_BACKEND (dynamodb, sqlite or memory)"""
+    table_name = table_name or os.environ.get('DYNAMODB_TABLE', 'pokemon-tcg-analytics')
+    backend = os.environ.get('STORAGE_BACKEND', 'dynamodb')
+    if backend == 'memory':
+        if table_name not in _offline_stores:
+            _offline_stores[table_name] = MemoryStorage(table_name)
+        return _offline_stores[table_name]
+    if backend == 'sqlite':
+        path = os.environ.get('STORAGE_PATH', DEFAULT_SQLITE_PATH)
+        if (table_name, path) not in _offline_stores:
+            _offline_stores[(table_name, path)] = SQLiteStorage(table_name, path)
+        return _offline_stores[(table_name, path)]
+    if backend == 'dynamodb':
+        import boto3
+        return boto3.resource('dynamodb').Table(table_name)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
@@ -0,0 +1,284 @@
+"""
+DynamoDB stream processor - maintains the views derived from stored
+analyses, so the request path only writes the analysis row itself.
+
+For each batch of INSERTed ANALYSIS# rows it updates:
+  - the trending leaderboard (one merge of every new entry),
+  - hourly/daily rollups (one update per run of a set's records that fall
+    in the same hour, skipping records at or before the bucket's last
+    applied stream sequence number),
+  - the per-set latest pointer (pk='LATEST', sk='SET#<set_id>'), a
+    summary of the newest analysis, replaced only by a newer one.
+
+Every update is idempotent, so a redelivered batch is harmless. Failures
+are reported per record (ReportBatchItemFailures): when a set's update
+fails, that record and the set's later records are returned so Lambda
+retries from there without reprocessing the whole batch.
+
+Run locally against synthetic events:
+    python stream_processor.py event.json
+where event.json is a stream event ({"Records": [...]}); synthetic_record
+builds records from plain items.
+
+Sets whose rows were all written before the stream processor was
+deployed (including legacy rows with a JSON 'data' attribute) have no
+LATEST pointer, and the jobs that list sets from the pointers (archive,
+incremental export) would never see them. Run the backfill once:
+    python stream_processor.py --backfill
+It scans the ANALYSIS# rows (summary attributes only, in parallel
+segments) and points each set at its newest row; pointers only move
+forward, so it is safe to rerun.
+"""
+
+import base64
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from analysis_codec import decode_analysis
+from analysis_store import ANALYSIS_PK_PREFIX, LATEST_PK, SUMMARY_ATTRIBUTES
+from leaderboard import leaderboard_entry, update_leaderboard
+from rollups import bucket_key, record_rollup, rollup_values
+from storage import storage_from_env
+from write_behind import to_dynamo
+
+BACKFILL_SEGMENTS = 8
+
+# Stream sequence numbers are decimal strings of up to 40 digits;
+# zero-padded they compare correctly as strings
+SEQUENCE_WIDTH = 40
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+def sequence_key(sequence_number):
+    """Sequence number in a form that orders as a string"""
+    return str(sequence_number).zfill(SEQUENCE_WIDTH)
+
+
+def _deserialize(value):
+    # Stream events carry binary attributes base64-encoded
+    if isinstance(value.get('B'), str):
+        value = {'B': base64.b64decode(value['B'])}
+    return _deserializer.deserialize(value)
+
+
+def analysis_rows(records):
+    """(sequence number, row) for every INSERTed analysis row, in stream order"""
+    rows = []
+    for record in records:
+        if record.get('eventName') != 'INSERT':
+            continue
+        image = record['dynamodb'].get('NewImage') or {}
+        if not image.get('pk', {}).get('S', '').startswith(ANALYSIS_PK_PREFIX):
+            continue
+        row = {name: _deserialize(value) for name, value in image.items()}
+        rows.append((record['dynamodb']['SequenceNumber'], row))
+    rows.sort(key=lambda entry: sequence_key(entry[0]))
+    return rows
+
+
+def _rollup_groups(rows):
+    """
+    A set's rows split into runs that share an hour bucket, in stream order,
+    as (set_id, [(sequence, analysis, timestamp), ...])
+    """
+    groups = []
+    current = {}
+    for sequence, analysis, timestamp in rows:
+        set_id = analysis['set_id']
+        bucket = bucket_key('hour', timestamp)
+        group = current.get(set_id)
+        if group is None or group[0] != bucket:
+            group = (bucket, [])
+            current[set_id] = group
+            groups.append((set_id, group[1]))
+        group[1].append((sequence, analysis, timestamp))
+    return groups
+
+
+def latest_pointer(row):
+    """LATEST item summarizing a stored analysis row"""
+    set_id = row['pk'][len(ANALYSIS_PK_PREFIX):]
+    pointer = {name: row[name] for name in SUMMARY_ATTRIBUTES if name in row and name != 'pk'}
+    pointer.update({'pk': LATEST_PK, 'sk': f"SET#{set_id}", 'set_id': set_id,
+                    'analysis_pk': row['pk'], 'analysis_sk': row['sk']})
+    return to_dynamo(pointer)
+
+
+def update_latest(table, row):
+    """Point a set's LATEST item at row unless it already points at a newer one"""
+    from botocore.exceptions import ClientError
+
+    try:
+        table.put_item(
+            Item=latest_pointer(row),
+            ConditionExpression='attribute_not_exists(pk) OR #ts <= :ts',
+            ExpressionAttributeNames={'#ts': 'timestamp'},
+            ExpressionAttributeValues={':ts': row['timestamp']}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def process_rows(table, rows):
+    """
+    Apply analysis rows [(sequence number or None, row)] to the derived
+    views. Returns the sequence numbers that failed.
+    """
+    decoded = []
+    for sequence, row in rows:
+        try:
+            # Rows written before the binary codec keep the analysis as JSON in 'data'
+            analysis = decode_analysis(row['blob']) if 'blob' in row else json.loads(row['data'])
+            decoded.append((sequence, analysis, int(row['timestamp'])))
+        except Exception as e:
+            # A row that can't be decoded never will be - skip it rather than block the shard
+            print(f"Skipping undecodable analysis {row.get('pk')}/{row.get('sk')}: {str(e)}")
+    failed = set()
+
+    # Rollups - runs of a set are applied in order; after a failure the
+    # set's later runs wait for the retry
+    failed_sets = set()
+    for set_id, members in _rollup_groups(decoded):
+        sequences = [sequence for sequence, _, _ in members]
+        if set_id in failed_sets:
+            failed.update(sequences)
+            continue
+        try:
+            record_rollup(
+                table, set_id, [rollup_values(analysis) for _, analysis, _ in members],
+                timestamp=members[0][2],
+                sequences=[sequence_key(sequence) for sequence in sequences]
+                if sequences[0] is not None else None
+            )
+        except Exception as e:
+            print(f"Rollup update error for {set_id}: {str(e)}")
+            failed_sets.add(set_id)
+            failed.update(sequences)
+
+    # Latest pointers - the newest row per set
+    newest = {}
+    for sequence, row in rows:
+        set_id = row['pk'][len(ANALYSIS_PK_PREFIX):]
+        if set_id not in newest or row['timestamp'] >= newest[set_id][1]['timestamp']:
+            newest[set_id] = (sequence, row)
+    for set_id, (sequence, row) in newest.items():
+        try:
+            update_latest(table, row)
+        except Exception as e:
+            print(f"Latest pointer error for {set_id}: {str(e)}")
+            failed.update(s for s, r in rows if r['pk'] == row['pk'])
+
+    # Leaderboard - one merge for the whole batch
+    if decoded:
+        try:
+            update_leaderboard(table, [
+                leaderboard_entry(analysis, now=timestamp) for _, analysis, timestamp in decoded
+            ])
+        except Exception as e:
+            print(f"Leaderboard update error: {str(e)}")
+            failed.update(sequence for sequence, _, _ in decoded)
+
+    failed.discard(None)
+    return failed
+
+
+def _newest_rows(table, segment, total_segments):
+    """Newest analysis row (summary attributes) per set in one scan segment"""
+    names = {f'#a{i}': name for i, name in enumerate(SUMMARY_ATTRIBUTES)}
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+        'FilterExpression': 'begins_with(pk, :prefix)',
+        'ExpressionAttributeValues': {':prefix': ANALYSIS_PK_PREFIX}
+    }
+    newest = {}
+    while True:
+        response = table.scan(**kwargs)
+        for row in response.get('Items', []):
+            if 'timestamp' in row and (row['pk'] not in newest
+                                       or row['timestamp'] >= newest[row['pk']]['timestamp']):
+                newest[row['pk']] = row
+        if 'LastEvaluatedKey' not in response:
+            return newest
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill_latest_pointers(table, segments=BACKFILL_SEGMENTS):
+    """
+    Give every set with stored analyses a LATEST pointer, including sets
+    written before the stream processor existed. Returns the set IDs seen.
+    """
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        partials = list(executor.map(lambda segment: _newest_rows(table, segment, segments),
+                                     range(segments)))
+    # Segments split by partition key, so each set comes from exactly one of them
+    newest = {pk: row for partial in partials for pk, row in partial.items()}
+    for row in newest.values():
+        update_latest(table, row)
+    return sorted(pk[len(ANALYSIS_PK_PREFIX):] for pk in newest)
+
+
+def process_event(table, event):
+    """Stream event -> partial batch response"""
+    rows = analysis_rows(event.get('Records', []))
+    failed = process_rows(table, rows)
+    print(f"Processed {len(rows)} analysis records, {len(failed)} failed")
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': sequence}
+            for sequence in sorted(failed, key=sequence_key)
+        ]
+    }
+
+
+def synthetic_record(item, sequence_number, event_name='INSERT'):
+    """Stream record (JSON-ready) for a plain item, as DynamoDB Streams would deliver it"""
+    image = {name: _serializer.serialize(value) for name, value in item.items()}
+    for name, value in image.items():
+        if 'B' in value:
+            image[name] = {'B': base64.b64encode(bytes(value['B'])).decode('ascii')}
+    return {
+        'eventName': event_name,
+        'eventSource': 'aws:dynamodb',
+        'dynamodb': {
+            'Keys': {'pk': image['pk'], 'sk': image['sk']},
+            'NewImage': image,
+            'SequenceNumber': str(sequence_number),
+            'StreamViewType': 'NEW_AND_OLD_IMAGES'
+        }
+    }
+
+
+_table = None
+
+
+def get_table():
+    """Table the stream belongs to (created once per container)"""
+    global _table
+    if _table is None:
+        _table = storage_from_env()
+    return _table
+
+
+def lambda_handler(event, context):
+    """Stream processor Lambda handler"""
+    return process_event(get_table(), event)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--backfill']:
+        set_ids = backfill_latest_pointers(get_table())
+        print(f"Backfilled LATEST pointers for {len(set_ids)} sets")
+        sys.exit(0)
+    paths = sys.argv[1:]
+    events = [json.load(open(path)) for path in paths] if paths else [json.load(sys.stdin)]
+    for event in events:
+        print(json.dumps(process_event(get_table(), event), indent=2))
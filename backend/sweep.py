@@ -0,0 +1,137 @@
+"""
+Sensitivity sweep - evaluates the Open/Hold/Resell decision over a grid
+of sealed price, appreciation rate, packs per box and minimum card value
+with NumPy broadcasting.
+
+Grid axes are always in this order: sealed_price, appreciation,
+packs_per_box, min_card_value.
+"""
+
+import numpy as np
+
+from pack_model import card_rates, card_value, pack_layout
+from rarity import pull_rate_table
+
+AXES = ('sealed_price', 'appreciation', 'packs_per_box', 'min_card_value')
+
+# Recommendation codes, in the order determine_recommendation checks them
+RECOMMENDATIONS = ('OPEN', 'HOLD SEALED', 'RESELL SEALED NOW', 'HOLD SEALED (marginal)')
+
+MAX_SCENARIOS = 250000
+MAX_AXIS_STEPS = 500
+
+
+def parse_axis(spec, default):
+    """
+    Axis values from a request spec: a list of values, a single number, or
+    {'min': ..., 'max': ..., 'steps': ...}. Missing specs use the default.
+    """
+    if spec is None:
+        values = [default]
+    elif isinstance(spec, dict):
+        steps = int(spec.get('steps', 10))
+        if not 1 <= steps <= MAX_AXIS_STEPS:
+            raise ValueError(f"steps must be between 1 and {MAX_AXIS_STEPS}")
+        values = np.linspace(float(spec['min']), float(spec['max']), steps)
+    elif isinstance(spec, (list, tuple)):
+        values = spec
+    else:
+        values = [spec]
+
+    return np.asarray(values, dtype=np.float64)
+
+
+def ev_per_pack_by_min_value(catalog, set_id, min_card_values):
+    """
+    EV per pack for each minimum card value, from one sort of the catalog:
+    suffix sums of value * rate over value-sorted (card, price field) pulls.
+    """
+    pulls = [
+        (card_value(card, price_field), rate)
+        for card, rates in zip(catalog, card_rates(catalog, pull_rate_table(set_id),
+                                                   pack_layout(set_id)))
+        for price_field, rate in rates.items()
+    ]
+    values = np.array([value for value, _ in pulls], dtype=np.float64)
+    rates = np.array([rate for _, rate in pulls], dtype=np.float64)
+
+    order = np.argsort(values)
+    prices = values[order]
+    contributions = prices * rates[order]
+
+    # suffix[i] = sum of contributions of cards i.. (cards priced >= prices[i])
+    suffix = np.concatenate([np.cumsum(contributions[::-1])[::-1], [0.0]])
+    return suffix[np.searchsorted(prices, min_card_values, side='left')]
+
+
+def recommendation_grid(ev_open, sealed_price, appreciation):
+    """Recommendation codes for broadcast arrays - mirrors determine_recommendation"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi_open_pct = np.where(sealed_price > 0, (ev_open - sealed_price) / sealed_price * 100, 0.0)
+    roi_hold_pct = appreciation * 100
+
+    conditions = [
+        (roi_open_pct > 20) & (ev_open > sealed_price * 1.2),
+        (roi_hold_pct > roi_open_pct) & (ev_open < sealed_price),
+        sealed_price > ev_open * 1.3,
+    ]
+    return np.select(conditions, [0, 1, 2], default=3), roi_open_pct
+
+
+def run_sweep(catalog, set_id, sealed_prices, appreciations, packs_per_box, min_card_values):
+    """Evaluate the full scenario grid and return ROI surfaces and flip boundaries"""
+
+    shape = (len(sealed_prices), len(appreciations), len(packs_per_box), len(min_card_values))
+    scenarios = int(np.prod(shape))
+    if scenarios > MAX_SCENARIOS:
+        raise ValueError(f"Sweep has {scenarios} scenarios, limit is {MAX_SCENARIOS}")
+
+    ev_pack = ev_per_pack_by_min_value(catalog, set_id, min_card_values)
+
+    # Broadcast to (sealed_price, appreciation, packs, min_card_value)
+    sealed = sealed_prices[:, None, None, None]
+    growth = appreciations[None, :, None, None]
+    ev_open = packs_per_box[None, None, :, None] * ev_pack[None, None, None, :]
+
+    codes, roi_open_pct = recommendation_grid(ev_open, sealed, growth)
+    codes = np.broadcast_to(codes, shape)
+
+    # Flip boundaries: consecutive sealed prices with different recommendations
+    flips = []
+    changed = np.nonzero(codes[1:] != codes[:-1])
+    for s, a, p, m in zip(*changed):
+        flips.append({
+            'appreciation': round(float(appreciations[a]), 4),
+            'packs_per_box': float(packs_per_box[p]),
+            'min_card_value': round(float(min_card_values[m]), 2),
+            'sealed_price_from': round(float(sealed_prices[s]), 2),
+            'sealed_price_to': round(float(sealed_prices[s + 1]), 2),
+            'from': RECOMMENDATIONS[codes[s, a, p, m]],
+            'to': RECOMMENDATIONS[codes[s + 1, a, p, m]]
+        })
+
+    ev_grid = ev_open[0, 0]
+    return {
+        'axes': {
+            'sealed_price': sealed_prices.round(2).tolist(),
+            'appreciation': appreciations.round(4).tolist(),
+            'packs_per_box': packs_per_box.tolist(),
+            'min_card_value': min_card_values.round(2).tolist()
+        },
+        'scenarios': scenarios,
+        'recommendations': list(RECOMMENDATIONS),
+        # EV depends only on packs and min card value: [packs][min_card_value]
+        'ev_open': ev_grid.round(2).tolist(),
+        # Open ROI does not depend on appreciation: [sealed][packs][min_card_value]
+        'roi_open_percent': np.broadcast_to(roi_open_pct, shape)[:, 0].round(2).tolist(),
+        # Hold ROI is the appreciation rate: [appreciation]
+        'roi_hold_percent': (appreciations * 100).round(2).tolist(),
+        'recommendation_grid': codes.astype(np.int8).tolist(),
+        # Analytic sealed prices where open ROI is 0 / OPEN / RESELL thresholds
+        'break_even': {
+            'sealed_price_roi_zero': ev_grid.round(2).tolist(),
+            'sealed_price_open_below': (ev_grid / 1.2).round(2).tolist(),
+            'sealed_price_resell_above': (ev_grid * 1.3).round(2).tolist()
+        },
+        'flips': flips
+    }
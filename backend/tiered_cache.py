@@ -0,0 +1,288 @@
+"""
+Tiered cache - per-container memory LRU (L1), /tmp disk store (L2) and
+DynamoDB items with TTL (L3), behind one read-through get().
+
+Values must be JSON-serializable. A lookup walks the tiers in order; a hit
+in a lower tier is copied into the tiers above it with the remaining TTL.
+On a full miss the loader runs and its result is written to every tier.
+A loader returning None is cached too (negative caching), with a shorter
+TTL, so repeated lookups of missing keys stop hitting the backend.
+
+TTLs are per namespace and come from CACHE_TTL: either one number of
+seconds for every namespace, or 'default=3600,sets=86400,catalog=900'.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+DEFAULT_TTL = 3600
+NEGATIVE_TTL = 60
+
+L1_MAX_BYTES = 64 * 1024 * 1024
+L2_DIR = '/tmp/tiered-cache'
+
+CACHE_PK_PREFIX = 'CACHE#'
+
+# Stored in place of a loader's None result
+_NEGATIVE = {'__negative__': True}
+
+
+def parse_ttls(spec):
+    """Namespace TTLs from a CACHE_TTL value"""
+    ttls = {'default': DEFAULT_TTL}
+    spec = (spec or '').strip()
+    if not spec:
+        return ttls
+    if '=' not in spec:
+        ttls['default'] = int(spec)
+        return ttls
+    for part in spec.split(','):
+        namespace, _, seconds = part.partition('=')
+        ttls[namespace.strip()] = int(seconds)
+    return ttls
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+class MemoryTier:
+    """
+    L1 - LRU bounded by the encoded size of its values. Shared by the
+    request and worker threads, so every change runs under one lock
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=L1_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (expires, size, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._delete(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[2]
+
+    def set(self, key, value, expires):
+        # Encode outside the lock - values can be large
+        size = len(_encode(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._delete(key)
+            self._entries[key] = (expires, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.size -= entry[1]
+
+
+class DiskTier:
+    """L2 - one JSON file per key under /tmp, survives while the container lives"""
+
+    name = 'disk'
+
+    def __init__(self, directory=L2_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key, now):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires'] <= now:
+            self.delete(key)
+            return None
+        return entry['expires'], entry['value']
+
+    def set(self, key, value, expires):
+        path = self._path(key)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(_encode({'expires': expires, 'value': value}))
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Disk cache write error: {str(e)}")
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class DynamoTier:
+    """L3 - zlib-compressed items shared by every container, expired by table TTL"""
+
+    name = 'dynamodb'
+
+    def __init__(self, table):
+        self.table = table
+
+    @staticmethod
+    def _key(key):
+        namespace, _, name = key.partition(':')
+        return {'pk': CACHE_PK_PREFIX + namespace, 'sk': name}
+
+    def get(self, key, now):
+        item = self.table.get_item(Key=self._key(key)).get('Item')
+        if not item or int(item['expires']) <= now:
+            return None
+        blob = item['value']
+        blob = bytes(blob.value) if hasattr(blob, 'value') else bytes(blob)
+        return int(item['expires']), json.loads(zlib.decompress(blob))
+
+    def set(self, key, value, expires):
+        self.table.put_item(Item=dict(
+            self._key(key),
+            value=zlib.compress(_encode(value).encode('utf-8')),
+            expires=int(expires),
+            ttl=int(expires)
+        ))
+
+    def delete(self, key):
+        self.table.delete_item(Key=self._key(key))
+
+
+class TieredCache:
+    """Read-through cache over an ordered list of tiers"""
+
+    def __init__(self, tiers, ttls=None):
+        self.tiers = tiers
+        self.ttls = ttls or parse_ttls(os.environ.get('CACHE_TTL'))
+        self.metrics = {tier.name: {'hits': 0, 'misses': 0, 'errors': 0} for tier in tiers}
+        self.metrics['loader'] = {'loads': 0, 'negative': 0}
+
+    def ttl(self, namespace):
+        return self.ttls.get(namespace, self.ttls['default'])
+
+    def get(self, namespace, key, loader=None):
+        """
+        Cached value for (namespace, key). On a miss, loader() is called and
+        its result cached; without a loader a miss returns None.
+        """
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+
+        for level, tier in enumerate(self.tiers):
+            try:
+                found = tier.get(full_key, now)
+            except Exception as e:
+                print(f"Cache {tier.name} read error: {str(e)}")
+                self.metrics[tier.name]['errors'] += 1
+                found = None
+            if found is None:
+                self.metrics[tier.name]['misses'] += 1
+                continue
+
+            self.metrics[tier.name]['hits'] += 1
+            expires, value = found
+            for upper in self.tiers[:level]:
+                self._set_tier(upper, full_key, value, expires)
+            return None if value == _NEGATIVE else value
+
+        if loader is None:
+            return None
+
+        value = loader()
+        self.metrics['loader']['loads'] += 1
+        if value is None:
+            self.metrics['loader']['negative'] += 1
+            expires = now + min(NEGATIVE_TTL, self.ttl(namespace))
+            stored = _NEGATIVE
+        else:
+            expires = now + self.ttl(namespace)
+            stored = value
+        for tier in self.tiers:
+            self._set_tier(tier, full_key, stored, expires)
+        return value
+
+    def set(self, namespace, key, value, ttl=None):
+        """Write a value to every tier (for ttl seconds, default the namespace TTL)"""
+        expires = time.time() + (ttl or self.ttl(namespace))
+        for tier in self.tiers:
+            self._set_tier(tier, f"{namespace}:{key}", value, expires)
+
+    def update(self, namespace, key, fn):
+        """
+        Replace a cached value with fn(value) in every tier, keeping its
+        expiry. Returns the new value, or None when nothing is cached.
+        """
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        for tier in self.tiers:
+            try:
+                found = tier.get(full_key, now)
+            except Exception as e:
+                print(f"Cache {tier.name} read error: {str(e)}")
+                found = None
+            if found is not None:
+                break
+        else:
+            return None
+
+        expires, value = found
+        if value == _NEGATIVE:
+            return None
+        value = fn(value)
+        for tier in self.tiers:
+            self._set_tier(tier, full_key, value, expires)
+        return value
+
+    def invalidate(self, namespace, key):
+        """Remove a key from every tier"""
+        for tier in self.tiers:
+            try:
+                tier.delete(f"{namespace}:{key}")
+            except Exception as e:
+                print(f"Cache {tier.name} delete error: {str(e)}")
+
+    def _set_tier(self, tier, key, value, expires):
+        try:
+            tier.set(key, value, expires)
+        except Exception as e:
+            print(f"Cache {tier.name} write error: {str(e)}")
+            self.metrics[tier.name]['errors'] += 1
+
+    def stats(self):
+        """Hit/miss counters per tier, plus L1 size"""
+        stats = {name: dict(counts) for name, counts in self.metrics.items()}
+        for tier in self.tiers:
+            if isinstance(tier, MemoryTier):
+                stats[tier.name]['bytes'] = tier.size
+        return stats
+
+
+def default_cache(table=None):
+    """Memory -> /tmp -> DynamoDB cache (DynamoDB tier only with a table)"""
+    tiers = [MemoryTier(), DiskTier()]
+    if table is not None:
+        tiers.append(DynamoTier(table))
+    return TieredCache(tiers)
@@ -0,0 +1,18 @@
+"""
+Lambda entry point of the collector tools (PokemonToolsFunction):
+/portfolio and /completion.
+
+The routes live in app-simple.py, whose hyphenated name is not
+importable as a module, so it is loaded from its path once per
+container, during the init phase, and its lambda_handler is re-exported.
+"""
+
+import importlib.util
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    'app_simple', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app-simple.py'))
+app_simple = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app_simple)
+
+lambda_handler = app_simple.lambda_handler
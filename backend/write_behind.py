@@ -0,0 +1,146 @@
+"""
+Write-behind persistence - buffers DynamoDB puts in memory and writes them
+with BatchWriteItem from a background thread, off the response path.
+
+Unprocessed items are retried with exponential backoff. Work that cannot
+be batched (conditional read-modify-write updates) can be deferred to the
+same thread, in order with the queued puts.
+
+The handler does not wait for them: whatever is still queued when it
+returns is flushed at the start of the container's next invocation. The trade-off is durability. Lambda freezes a container once
+the handler returns and may reclaim it without running atexit hooks, so
+the writes queued by a container's last invocation can be lost. Analysis
+rows are an analytics record, not the response, so that is accepted by
+default; ANALYTICS_FLUSH=end makes the handler wait for the queue before
+it returns, trading the latency win for a per-invocation guarantee.
+"""
+
+import atexit
+import math
+import os
+import threading
+import time
+from decimal import Decimal
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.05
+FLUSH_TIMEOUT = 5.0
+
+FLUSH_AT_END = os.environ.get('ANALYTICS_FLUSH', 'background') == 'end'
+
+
+def to_dynamo(value):
+    """Convert floats (anywhere in a nested value) to Decimal for DynamoDB"""
+    if isinstance(value, float):
+        return Decimal(str(value)) if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    return value
+
+
+class _Task:
+    """Deferred call queued between puts"""
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        try:
+            self.fn(*self.args)
+        except Exception as e:
+            print(f"Deferred write error: {str(e)}")
+
+
+class WriteBehindWriter:
+    """Background BatchWriteItem writer for one table"""
+
+    def __init__(self, table, key_names=('pk', 'sk')):
+        self.table = table
+        self.key_names = key_names
+        self.written = 0
+        self.retried = 0
+        self.dropped = 0
+        self._buffer = []
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def put(self, item):
+        """Queue one item for writing; returns immediately"""
+        self._enqueue(to_dynamo(item))
+
+    def defer(self, fn, *args):
+        """Run fn(*args) on the writer thread after the puts queued before it"""
+        self._enqueue(_Task(fn, args))
+
+    def _enqueue(self, entry):
+        with self._cond:
+            self._buffer.append(entry)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Block until every queued item is written (or dropped). False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._buffer or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    self._cond.wait()
+                # A deferred task runs alone; otherwise take the puts up to the next task
+                size = 1 if isinstance(self._buffer[0], _Task) else next(
+                    (i for i, entry in enumerate(self._buffer[:BATCH_SIZE]) if isinstance(entry, _Task)),
+                    min(BATCH_SIZE, len(self._buffer))
+                )
+                batch = self._buffer[:size]
+                del self._buffer[:size]
+                self._in_flight += len(batch)
+            try:
+                if isinstance(batch[0], _Task):
+                    batch[0].run()
+                else:
+                    self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    self._cond.notify_all()
+
+    def _write_batch(self, items):
+        # BatchWriteItem rejects duplicate keys in one request - last write wins
+        latest = {tuple(item[k] for k in self.key_names): item for item in items}
+        requests = [{'PutRequest': {'Item': item}} for item in latest.values()]
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.table.meta.client.batch_write_item(
+                    RequestItems={self.table.name: requests}
+                )
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table.name, [])
+            except Exception as e:
+                print(f"Batch write error: {str(e)}")
+                unprocessed = requests
+
+            self.written += len(requests) - len(unprocessed)
+            if not unprocessed:
+                return
+            requests = unprocessed
+            self.retried += len(requests)
+            time.sleep(BACKOFF_BASE * (2 ** attempt))
+
+        self.dropped += len(requests)
+        print(f"Batch write gave up on {len(requests)} items after {MAX_RETRIES} retries")